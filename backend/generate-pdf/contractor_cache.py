@@ -0,0 +1,78 @@
+# Общий модуль zalupa и generate-pdf. Функции разворачиваются по отдельности и не видят код друг друга,
+# поэтому в каждой лежит одинаковая копия: правки вносятся в обе (сверяет backend/test_shared_modules.py)
+import time
+from typing import Dict, Any, Iterable
+from psycopg2.extras import RealDictCursor
+
+# Кэш контрагентов на время жизни тёплого инстанса функции: id -> строка contractors
+_cache: Dict[int, Dict[str, Any]] = {}
+
+# id -> когда строка последний раз сверялась с базой (time.monotonic)
+_checked_at: Dict[int, float] = {}
+
+MAX_ENTRIES = 5000
+
+# Строки, сверенные с базой меньше этого интервала назад, отдаются без запроса. Инстанс, который изменил
+# контрагента, сбрасывает его сразу (invalidate); остальные инстансы обеих функций могут отдавать
+# старую строку не дольше этого интервала
+REVALIDATE_SECONDS = 10
+
+
+def get_many(cursor, ids: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+    '''
+    Возвращает контрагентов по списку id не больше чем одним запросом
+    Если все id в кэше и сверены за последние REVALIDATE_SECONDS, запроса нет. Иначе для
+    закэшированных id передаётся их updated_at, и Postgres возвращает полные строки
+    только для отсутствующих в кэше или изменившихся записей
+    Args: cursor - курсор БД
+          ids - id контрагентов (None и повторы игнорируются)
+    Returns: dict id -> строка contractors (snake_case ключи)
+    '''
+    wanted = sorted({int(i) for i in ids if i is not None})
+    if not wanted:
+        return {}
+
+    now = time.monotonic()
+    to_check = [i for i in wanted if now - _checked_at.get(i, float('-inf')) >= REVALIDATE_SECONDS]
+    if not to_check:
+        return {i: _cache[i] for i in wanted}
+
+    cached_ids = [i for i in to_check if i in _cache]
+    cached_versions = [_cache[i]['updated_at'] for i in cached_ids]
+
+    dict_cursor = cursor.connection.cursor(cursor_factory=RealDictCursor)
+    dict_cursor.execute('''
+        SELECT c.*
+        FROM contractors c
+        WHERE c.id = ANY(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM unnest(%s::int[], %s::timestamp[]) AS k(id, updated_at)
+              WHERE k.id = c.id AND k.updated_at IS NOT DISTINCT FROM c.updated_at
+          )
+    ''', (to_check, cached_ids, cached_versions))
+
+    for row in dict_cursor.fetchall():
+        _cache.pop(row['id'], None)
+        _cache[row['id']] = dict(row)
+    dict_cursor.close()
+
+    # Не вернувшиеся закэшированные строки не изменились - они тоже считаются сверенными
+    for i in to_check:
+        if i in _cache:
+            _checked_at[i] = now
+
+    while len(_cache) > MAX_ENTRIES:
+        oldest = next(iter(_cache))
+        _cache.pop(oldest)
+        _checked_at.pop(oldest, None)
+
+    return {i: _cache[i] for i in wanted if i in _cache}
+
+
+def invalidate(contractor_id: Any) -> None:
+    '''Убирает контрагента из кэша после изменения или удаления'''
+    try:
+        _cache.pop(int(contractor_id), None)
+        _checked_at.pop(int(contractor_id), None)
+    except (TypeError, ValueError):
+        pass
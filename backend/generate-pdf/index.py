@@ -3,11 +3,44 @@ import os
 import base64
 import re
 from typing import Dict, Any
+import time
 import psycopg2
+from psycopg2 import OperationalError
 from psycopg2.extras import RealDictCursor
 from io import BytesIO
 from pypdf import PdfReader, PdfWriter
 import pikepdf
+from contractor_cache import get_many
+
+TEMPLATE_COLUMNS = ('id', 'name', 'file_name', 'file_data', 'field_mappings')
+
+# Токен read-your-writes из ответа на запись в zalupa (db_routing.py): до этого момента читаем с основной базы
+TOKEN_HEADER = 'X-Read-Primary-Until'
+
+PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS') or 10)
+
+
+def pinned_to_primary(event: dict) -> bool:
+    '''Передан ли действующий токен после недавней записи клиента'''
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    try:
+        until = int(headers.get(TOKEN_HEADER.lower()) or 0)
+    except ValueError:
+        return False
+    now = time.time() * 1000
+    return now < until <= now + PIN_SECONDS * 1000
+
+
+def connect(event: dict):
+    '''Данные для PDF только читаются: с реплики DATABASE_URL_REPLICA, если она задана и клиент недавно не писал'''
+    replica_dsn = os.environ.get('DATABASE_URL_REPLICA')
+    if replica_dsn and not pinned_to_primary(event):
+        try:
+            return psycopg2.connect(replica_dsn, connect_timeout=3)
+        except OperationalError as e:
+            print(f'replica unavailable, using primary: {e}')
+    return psycopg2.connect(os.environ.get('DATABASE_URL'))
+
 
 def handler(event: dict, context) -> dict:
     '''API для генерации PDF документов по шаблонам'''
@@ -19,7 +52,7 @@ def handler(event: dict, context) -> dict:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
+                'Access-Control-Allow-Headers': f'Content-Type, {TOKEN_HEADER}'
             },
             'body': '',
             'isBase64Encoded': False
@@ -56,18 +89,21 @@ def handler(event: dict, context) -> dict:
             }
         
         # Подключаемся к БД
-        dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+        conn = connect(event)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        # Загружаем шаблон
-        cursor.execute(
-            "SELECT id, name, file_name, file_data, field_mappings FROM templates WHERE id = %s",
-            (template_id,)
-        )
-        template = cursor.fetchone()
+        # Загружаем шаблон и договор одним запросом: колонки шаблона идут с префиксом template_
+        cursor.execute(f"""
+            SELECT {', '.join(f't.{column} AS template_{column}' for column in TEMPLATE_COLUMNS)}, c.*
+            FROM (SELECT %s::int AS template_id, %s::int AS contract_id) k
+            LEFT JOIN templates t ON t.id = k.template_id
+            LEFT JOIN contracts c ON c.id = k.contract_id
+        """, (template_id, contract_id))
+        row = cursor.fetchone()
+        template = {column: row[f'template_{column}'] for column in TEMPLATE_COLUMNS}
+        contract = {key: value for key, value in row.items() if not key.startswith('template_')}
         
-        if not template:
+        if template['id'] is None:
             cursor.close()
             conn.close()
             return {
@@ -94,14 +130,7 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        # Загружаем договор
-        cursor.execute(
-            "SELECT * FROM contracts WHERE id = %s",
-            (contract_id,)
-        )
-        contract = cursor.fetchone()
-        
-        if not contract:
+        if contract['id'] is None:
             cursor.close()
             conn.close()
             return {
@@ -114,23 +143,15 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        # Загружаем связанные данные контрагентов
-        related_data = {}
-        if contract.get('customer_id'):
-            cursor.execute("SELECT * FROM contractors WHERE id = %s", (contract['customer_id'],))
-            related_data['customer'] = cursor.fetchone()
-        
-        if contract.get('carrier_id'):
-            cursor.execute("SELECT * FROM contractors WHERE id = %s", (contract['carrier_id'],))
-            related_data['carrier'] = cursor.fetchone()
-        
-        if contract.get('loading_seller_id'):
-            cursor.execute("SELECT * FROM contractors WHERE id = %s", (contract['loading_seller_id'],))
-            related_data['loadingSeller'] = cursor.fetchone()
-        
-        if contract.get('unloading_buyer_id'):
-            cursor.execute("SELECT * FROM contractors WHERE id = %s", (contract['unloading_buyer_id'],))
-            related_data['unloadingBuyer'] = cursor.fetchone()
+        # Загружаем связанные данные контрагентов одним запросом через кэш
+        parties = {
+            'customer': contract.get('customer_id'),
+            'carrier': contract.get('carrier_id'),
+            'loadingSeller': contract.get('loading_seller_id'),
+            'unloadingBuyer': contract.get('unloading_buyer_id')
+        }
+        contractors = get_many(cursor, parties.values())
+        related_data = {key: contractors.get(contractor_id) for key, contractor_id in parties.items() if contractor_id}
         
         cursor.close()
         conn.close()
@@ -169,8 +190,26 @@ def handler(event: dict, context) -> dict:
 def generate_pdf(template: Dict[str, Any], contract: Dict[str, Any], related_data: Dict[str, Any]) -> bytes:
     '''Генерирует PDF заполняя поля формы из шаблона'''
     
-    # Получаем file_data из шаблона
-    file_data = template['file_data']
+    template_pdf_bytes = decode_file_data(template['file_data'])
+    
+    # Подготавливаем данные для замены
+    form_data = prepare_form_data(contract, related_data)
+    
+    print(f'[DEBUG] Data to fill: {form_data}')
+    
+    # Шаг 1: Заменяем плейсхолдеры {{field_name}}
+    try:
+        pdf_bytes = replace_placeholders(template_pdf_bytes, form_data)
+    except Exception as e:
+        print(f'[WARNING] Placeholder replacement failed: {e}, skipping')
+        pdf_bytes = template_pdf_bytes
+    
+    # Шаг 2: Заполняем поля формы (если они есть)
+    return fill_form_fields(pdf_bytes, form_data)
+
+
+def decode_file_data(file_data: Any) -> bytes:
+    '''Байты PDF из templates.file_data'''
     
     # PostgreSQL bytea возвращается как memoryview или bytes
     if isinstance(file_data, memoryview):
@@ -187,23 +226,13 @@ def generate_pdf(template: Dict[str, Any], contract: Dict[str, Any], related_dat
     if not template_pdf_bytes.startswith(b'%PDF'):
         raise ValueError(f'Invalid PDF header: {template_pdf_bytes[:20]}')
     
-    template_pdf = BytesIO(template_pdf_bytes)
-    
-    # Подготавливаем данные для замены
-    form_data = prepare_form_data(contract, related_data)
-    
-    print(f'[DEBUG] Data to fill: {form_data}')
-    
-    # Шаг 1: Заменяем плейсхолдеры {{field_name}}
-    try:
-        pdf_with_placeholders = replace_placeholders(template_pdf_bytes, form_data)
-        template_pdf = BytesIO(pdf_with_placeholders)
-    except Exception as e:
-        print(f'[WARNING] Placeholder replacement failed: {e}, skipping')
-        template_pdf = BytesIO(template_pdf_bytes)
+    return template_pdf_bytes
+
+
+def fill_form_fields(pdf_bytes: bytes, form_data: Dict[str, str]) -> bytes:
+    '''Заполняет поля AcroForm через pypdf и возвращает итоговый PDF'''
     
-    # Шаг 2: Заполняем поля формы (если они есть)
-    reader = PdfReader(template_pdf, strict=False)
+    reader = PdfReader(BytesIO(pdf_bytes), strict=False)
     writer = PdfWriter()
     writer.append(reader)
     
@@ -0,0 +1,133 @@
+from typing import Dict, Any, List, Tuple
+
+# Сообщение к отправке: (chat_id, текст)
+Outgoing = Tuple[int, str]
+
+WELCOME_TEXT = (
+    "👋 Добро пожаловать в Диантус!\n\n"
+    "Для подключения к системе вам нужна инвайт-ссылка от администратора.\n"
+    "Если у вас есть инвайт-ссылка, просто перейдите по ней."
+)
+
+HELP_TEXT = (
+    "📋 Доступные команды:\n\n"
+    "/start - Подключиться к системе\n"
+    "/help - Показать эту справку\n"
+    "/status - Проверить статус подключения"
+)
+
+
+def handle_message(cursor, conn, message: Dict[str, Any], config: Dict[str, Any]) -> List[Outgoing]:
+    '''
+    Обрабатывает сообщение пользователя бота, работая только с БД
+    Изменения не коммитятся: вызывающий фиксирует их одной транзакцией вместе с сохранёнными ответами
+    Args: message - объект message из update Telegram
+          config - строка telegram_config (bot_token, admin_telegram_id)
+    Returns: сообщения к отправке; первое - ответ отправителю
+    '''
+    chat_id = message['chat']['id']
+    text = message.get('text', '')
+    extra: List[Outgoing] = []
+
+    if text.startswith('/start'):
+        parts = text.split(' ')
+
+        if len(parts) == 1:
+            # Проверяем, может это админ без инвайта
+            cursor.execute('''
+                SELECT id, full_name, is_admin, telegram_id
+                FROM users
+                WHERE telegram_id = %s
+            ''', (chat_id,))
+            existing_user = cursor.fetchone()
+
+            if existing_user:
+                response_text = f"✅ Вы уже подключены к системе, {existing_user[1]}!"
+            elif config.get('admin_telegram_id') == chat_id:
+                # Это админ! Привязываем к первому admin аккаунту
+                cursor.execute('''
+                    UPDATE users
+                    SET telegram_id = %s
+                    WHERE is_admin = true AND telegram_id IS NULL
+                    RETURNING id, full_name
+                ''', (chat_id,))
+                admin_user = cursor.fetchone()
+
+                if admin_user:
+                    response_text = (
+                        f"✅ Отлично, {admin_user[1]}!\n\n"
+                        "Вы подключены как администратор системы.\n"
+                        "Теперь вы будете получать все уведомления."
+                    )
+                else:
+                    response_text = WELCOME_TEXT
+            else:
+                response_text = WELCOME_TEXT
+        else:
+            invite_code = parts[1]
+
+            # Проверка и захват инвайта одним запросом: параллельный /start с тем же кодом не пройдёт
+            cursor.execute('''
+                UPDATE users
+                SET telegram_id = %s, invite_used_at = NOW()
+                WHERE invite_code = %s AND invite_used_at IS NULL AND telegram_id IS NULL
+                RETURNING id, full_name
+            ''', (chat_id, invite_code))
+            claimed = cursor.fetchone()
+
+            if claimed:
+                user_name = claimed[1]
+
+                response_text = (
+                    f"✅ Отлично, {user_name}!\n\n"
+                    "Вы успешно подключены к системе Диантус.\n"
+                    "Теперь вы будете получать уведомления о важных событиях."
+                )
+
+                # Уведомление админу
+                if config.get('admin_telegram_id'):
+                    extra.append((config['admin_telegram_id'], (
+                        f"🎉 Новый пользователь подключился!\n\n"
+                        f"👤 {user_name}\n"
+                        f"📱 Telegram ID: {chat_id}"
+                    )))
+            else:
+                # Инвайт не захвачен - выясняем причину для ответа (редкий путь)
+                cursor.execute('''
+                    SELECT telegram_id, invite_used_at
+                    FROM users
+                    WHERE invite_code = %s
+                ''', (invite_code,))
+                user = cursor.fetchone()
+
+                if not user:
+                    response_text = "❌ Инвайт-ссылка недействительна."
+                elif user[1] is not None:
+                    response_text = "❌ Эта инвайт-ссылка уже использована."
+                else:
+                    response_text = "✅ Вы уже подключены к системе!"
+
+    elif text == '/help':
+        response_text = HELP_TEXT
+
+    elif text == '/status':
+        cursor.execute('''
+            SELECT full_name, email
+            FROM users
+            WHERE telegram_id = %s
+        ''', (chat_id,))
+        user = cursor.fetchone()
+
+        if user:
+            response_text = (
+                f"✅ Вы подключены к системе\n\n"
+                f"👤 {user[0]}\n"
+                f"📧 {user[1]}"
+            )
+        else:
+            response_text = "❌ Вы не подключены к системе. Используйте инвайт-ссылку для подключения."
+
+    else:
+        response_text = "Используйте /help для просмотра доступных команд."
+
+    return [(chat_id, response_text)] + extra
@@ -0,0 +1,95 @@
+'''
+Локальный фейковый Telegram Bot API для проверки poller.py без настоящего бота.
+
+Запуск:
+    python backend/telegram-bot/fake_telegram_api.py --port 8081
+
+Поддерживаются getUpdates (long polling по offset), sendMessage и deleteWebhook для любого токена.
+Управление:
+    POST /_updates  - добавить update или список update (update_id проставляется, если не задан)
+    POST /_fail     - {"sendMessage": N}: следующие N вызовов sendMessage вернут ok=false
+    GET  /_sent     - сообщения, отправленные ботом через sendMessage
+
+В тестах приложение поднимается в том же процессе: create_app()['fake'] - состояние сервера.
+'''
+import argparse
+import asyncio
+from typing import Dict, Any, List
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.updates: List[Dict[str, Any]] = []
+        self.sent: List[Dict[str, Any]] = []
+        self.next_update_id = 1
+        self.fail_sends = 0
+        self.changed = asyncio.Event()
+
+    def add(self, updates: List[Dict[str, Any]]) -> None:
+        for update in updates:
+            update.setdefault('update_id', self.next_update_id)
+            self.next_update_id = max(self.next_update_id, update['update_id']) + 1
+            self.updates.append(update)
+        self.changed.set()
+
+    async def bot_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        payload = await request.json() if request.can_read_body else {}
+
+        if method == 'getUpdates':
+            offset = int(payload.get('offset') or 0)
+            timeout = min(float(payload.get('timeout') or 0), 5)
+            pending = [u for u in self.updates if u['update_id'] >= offset]
+            if not pending and timeout:
+                self.changed.clear()
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                pending = [u for u in self.updates if u['update_id'] >= offset]
+            return web.json_response({'ok': True, 'result': pending[:100]})
+
+        if method == 'sendMessage':
+            if self.fail_sends > 0:
+                self.fail_sends -= 1
+                return web.json_response({'ok': False, 'error_code': 429, 'description': 'Too Many Requests'}, status=429)
+            message = {'chat_id': payload.get('chat_id'), 'text': payload.get('text'), 'parse_mode': payload.get('parse_mode')}
+            self.sent.append(message)
+            return web.json_response({'ok': True, 'result': {'message_id': len(self.sent), **message}})
+
+        if method == 'deleteWebhook':
+            return web.json_response({'ok': True, 'result': True})
+
+        return web.json_response({'ok': False, 'error_code': 404, 'description': f'Not Found: {method}'}, status=404)
+
+    async def add_updates(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.add(body if isinstance(body, list) else [body])
+        return web.json_response({'ok': True, 'count': len(self.updates)})
+
+    async def set_failures(self, request: web.Request) -> web.Response:
+        self.fail_sends = int((await request.json()).get('sendMessage') or 0)
+        return web.json_response({'ok': True})
+
+    async def list_sent(self, request: web.Request) -> web.Response:
+        return web.json_response(self.sent)
+
+
+def create_app() -> web.Application:
+    fake = FakeTelegram()
+    app = web.Application()
+    app['fake'] = fake
+    app.router.add_post('/bot{token}/{method}', fake.bot_method)
+    app.router.add_post('/_updates', fake.add_updates)
+    app.router.add_post('/_fail', fake.set_failures)
+    app.router.add_get('/_sent', fake.list_sent)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API for local testing')
+    parser.add_argument('--port', type=int, default=8081)
+    args = parser.parse_args()
+    web.run_app(create_app(), port=args.port)
@@ -0,0 +1,161 @@
+import os
+import json
+import requests
+from typing import Dict, Any, List, Optional, Tuple
+from commands import handle_message, Outgoing
+from telegram_config import get_config
+
+BATCH_SIZE = 50
+
+MAX_ATTEMPTS = 5
+
+# update в статусе processing дольше этого интервала считается брошенным упавшим обработчиком
+STALE_INTERVAL = '2 minutes'
+
+# Переопределяется для локального фейкового Bot API (fake_telegram_api.py)
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+
+def load_config(cursor) -> Optional[Dict[str, Any]]:
+    '''Настройки бота из кэша telegram_config; None, если бот не подключён'''
+    config = get_config(cursor)
+    if not config.get('bot_token'):
+        return None
+    return config
+
+
+def store_update(cursor, conn, update: Dict[str, Any]) -> bool:
+    '''Сохраняет update во входящие; False - этот update_id уже получен (повторная доставка)'''
+    cursor.execute('''
+        INSERT INTO telegram_inbox (update_id, payload, status, claimed_at)
+        VALUES (%s, %s, 'processing', CURRENT_TIMESTAMP)
+        ON CONFLICT (update_id) DO NOTHING
+        RETURNING update_id
+    ''', (update['update_id'], json.dumps(update)))
+    stored = cursor.fetchone() is not None
+    conn.commit()
+    return stored
+
+
+def mark_done(cursor, conn, update_id: int) -> None:
+    cursor.execute('''
+        UPDATE telegram_inbox SET status = 'done', error = NULL, processed_at = CURRENT_TIMESTAMP
+        WHERE update_id = %s
+    ''', (update_id,))
+    conn.commit()
+
+
+def mark_failed(cursor, conn, update_id: int, error: str) -> None:
+    '''Возвращает update в очередь для process_inbox; после MAX_ATTEMPTS попыток - failed'''
+    cursor.execute('''
+        UPDATE telegram_inbox
+        SET attempts = attempts + 1,
+            status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END,
+            error = %s
+        WHERE update_id = %s
+    ''', (MAX_ATTEMPTS, error, update_id))
+    conn.commit()
+
+
+def process_update(cursor, conn, update: Dict[str, Any], config: Dict[str, Any]) -> List[Outgoing]:
+    '''Ответы на update; update без message (редактирования, callback и т.п.) игнорируются'''
+    message = update.get('message')
+    if not message:
+        return []
+    return handle_message(cursor, conn, message, config)
+
+
+def prepare_replies(cursor, conn, update: Dict[str, Any], config: Dict[str, Any]) -> List[Outgoing]:
+    '''
+    Ответы на update, сохранённые в telegram_inbox.replies
+    Команда выполняется один раз: её изменения и ответы коммитятся одной транзакцией,
+    а при повторной обработке (ошибка отправки, брошенный update) ответы берутся из replies
+    '''
+    cursor.execute('SELECT replies FROM telegram_inbox WHERE update_id = %s', (update['update_id'],))
+    row = cursor.fetchone()
+    if row and row[0] is not None:
+        return [(chat_id, text) for chat_id, text in row[0]]
+
+    replies = process_update(cursor, conn, update, config)
+    cursor.execute('''
+        UPDATE telegram_inbox SET replies = %s WHERE update_id = %s
+    ''', (json.dumps(replies, ensure_ascii=False), update['update_id']))
+    conn.commit()
+    return replies
+
+
+def pending_replies(cursor, conn, update: Dict[str, Any], config: Dict[str, Any]) -> List[Tuple[int, Outgoing]]:
+    '''
+    Ещё не доставленные ответы на update с их номерами в replies
+    Доставленные отмечаются mark_reply_sent, update закрывается mark_done только после доставки всех
+    '''
+    replies = prepare_replies(cursor, conn, update, config)
+    cursor.execute('SELECT replies_sent FROM telegram_inbox WHERE update_id = %s', (update['update_id'],))
+    row = cursor.fetchone()
+    conn.commit()
+    return list(enumerate(replies))[row[0] if row else 0:]
+
+
+def mark_reply_sent(cursor, conn, update_id: int, index: int) -> None:
+    cursor.execute('''
+        UPDATE telegram_inbox SET replies_sent = GREATEST(replies_sent, %s) WHERE update_id = %s
+    ''', (index + 1, update_id))
+    conn.commit()
+
+
+def send_message(session, bot_token: str, chat_id: int, text: str, api_url: str = TELEGRAM_API_URL) -> bool:
+    response = session.post(
+        f'{api_url}/bot{bot_token}/sendMessage',
+        json={
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': 'HTML'
+        },
+        timeout=5
+    )
+    return bool(response.json().get('ok'))
+
+
+def process_inbox(cursor, conn, limit: int = BATCH_SIZE, api_url: str = TELEGRAM_API_URL) -> Dict[str, int]:
+    '''
+    Обрабатывает накопившиеся update пачкой: необработанные в вебхуке, упавшие или брошенные
+    Пачка забирается через SKIP LOCKED, поэтому параллельные запуски не берут одни и те же update;
+    для update с сохранёнными ответами команда не повторяется - отправляются только недоставленные ответы
+    Returns: счётчики обработанных и упавших update
+    '''
+    config = load_config(cursor)
+    if not config:
+        return {'processed': 0, 'failed': 0}
+
+    cursor.execute(f'''
+        UPDATE telegram_inbox
+        SET status = 'processing', claimed_at = CURRENT_TIMESTAMP
+        WHERE update_id IN (
+            SELECT update_id FROM telegram_inbox
+            WHERE status = 'pending'
+               OR (status = 'processing' AND claimed_at < CURRENT_TIMESTAMP - interval '{STALE_INTERVAL}')
+            ORDER BY update_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING update_id, payload
+    ''', (limit,))
+    batch = sorted(cursor.fetchall())
+    conn.commit()
+
+    processed = failed = 0
+    with requests.Session() as session:
+        for update_id, payload in batch:
+            try:
+                for index, (chat_id, text) in pending_replies(cursor, conn, payload, config):
+                    if not send_message(session, config['bot_token'], chat_id, text, api_url):
+                        raise RuntimeError('Telegram API returned ok=false')
+                    mark_reply_sent(cursor, conn, update_id, index)
+                mark_done(cursor, conn, update_id)
+                processed += 1
+            except Exception as e:
+                conn.rollback()
+                mark_failed(cursor, conn, update_id, str(e))
+                failed += 1
+
+    return {'processed': processed, 'failed': failed}
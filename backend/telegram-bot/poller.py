@@ -0,0 +1,251 @@
+'''
+Long-polling обработчик бота через getUpdates - альтернатива вебхуку для локальной и staging среды
+и запасной вариант, когда URL вебхука недоступен.
+
+Запуск (aiohttp нужен только поллеру и не входит в requirements.txt функции):
+    pip install aiohttp
+    DATABASE_URL=postgresql://... python backend/telegram-bot/poller.py --delete-webhook
+    DATABASE_URL=postgresql://... python backend/telegram-bot/poller.py --api-url http://localhost:8081 --once
+
+Update проходят тот же путь, что и в вебхуке: telegram_inbox (идемпотентность по update_id)
+и commands.handle_message. Смещение getUpdates - max(update_id) + 1 из telegram_inbox,
+поэтому после перезапуска обработка продолжается с места остановки.
+Сообщения разных чатов обрабатываются параллельно, сообщения одного чата - по порядку.
+Update закрывается (done) только после доставки всех ответов; упавшие, брошенные и с недоставленными
+ответами раз в PROCESS_INTERVAL_SECONDS дообрабатывает inbox.process_inbox без повтора команды.
+'''
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import aiohttp
+from psycopg2.pool import ThreadedConnectionPool
+
+from inbox import (
+    TELEGRAM_API_URL, load_config, store_update, mark_done, mark_failed, mark_reply_sent, pending_replies, process_inbox
+)
+from commands import Outgoing
+
+POLL_TIMEOUT = 30
+
+CONCURRENCY = 10
+
+# Сколько раз подряд пачка с необработанными update запрашивается заново, прежде чем смещение сдвинется дальше
+MAX_BATCH_RETRIES = 3
+
+RETRY_DELAY_SECONDS = 5
+
+# Как часто поллер дообрабатывает отложенные update из telegram_inbox (process_inbox)
+PROCESS_INTERVAL_SECONDS = 30
+
+
+def _with_connection(pool: ThreadedConnectionPool, fn, *args):
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        try:
+            return fn(cursor, conn, *args)
+        finally:
+            cursor.close()
+    finally:
+        pool.putconn(conn)
+
+
+def _next_offset(cursor, conn) -> int:
+    cursor.execute('SELECT COALESCE(max(update_id), -1) + 1 FROM telegram_inbox')
+    offset = cursor.fetchone()[0]
+    conn.commit()
+    return offset
+
+
+def _handle_update(cursor, conn, update: Dict[str, Any]) -> Optional[List[Tuple[int, Outgoing]]]:
+    '''
+    Синхронная часть обработки одного update (выполняется в потоке из пула)
+    Returns: ответы к доставке; None - update уже получен раньше или команда упала (его дообработает process_inbox)
+    '''
+    config = load_config(cursor)
+    if not config or not store_update(cursor, conn, update):
+        return None
+    try:
+        return pending_replies(cursor, conn, update, config)
+    except Exception as e:
+        conn.rollback()
+        mark_failed(cursor, conn, update['update_id'], str(e))
+        return None
+
+
+class Poller:
+    def __init__(self, pool: ThreadedConnectionPool, session: aiohttp.ClientSession, api_url: str, bot_token: str,
+                 concurrency: int):
+        self.pool = pool
+        self.session = session
+        self.api_url = api_url
+        self.bot_url = f'{api_url}/bot{bot_token}'
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.processed_at = 0.0
+
+    async def db(self, fn, *args):
+        return await asyncio.to_thread(_with_connection, self.pool, fn, *args)
+
+    async def call(self, method: str, payload: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
+        async with self.session.post(
+            f'{self.bot_url}/{method}',
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            return await response.json()
+
+    async def handle_chat(self, updates: List[Dict[str, Any]]) -> List[int]:
+        '''Обрабатывает update одного чата по порядку; Returns: update_id, которые не удалось сохранить и обработать'''
+        failed = []
+        async with self.semaphore:
+            for update in updates:
+                update_id = update['update_id']
+                try:
+                    replies = await self.db(_handle_update, update)
+                except Exception as e:
+                    # Ошибки команд уже записаны в telegram_inbox (mark_failed); сюда доходят сбои БД и пула
+                    print(f'update {update_id} failed: {e}')
+                    failed.append(update_id)
+                    continue
+                if replies is not None:
+                    await self.deliver(update_id, replies)
+        return failed
+
+    async def deliver(self, update_id: int, replies: List[Tuple[int, Outgoing]]) -> None:
+        '''Отправляет ответы по порядку; при ошибке update возвращается в очередь с недоставленными ответами'''
+        try:
+            for index, (chat_id, text) in replies:
+                data = await self.call('sendMessage', {'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'})
+                if not data.get('ok'):
+                    raise RuntimeError(f'sendMessage failed: {data}')
+                await self.db(mark_reply_sent, update_id, index)
+            await self.db(mark_done, update_id)
+        except Exception as e:
+            print(f'Ошибка отправки в Telegram, update {update_id}: {e}')
+            try:
+                await self.db(mark_failed, update_id, str(e))
+            except Exception as db_error:
+                # Update останется в processing и будет взят process_inbox как брошенный
+                print(f'update {update_id}: mark_failed failed: {db_error}')
+
+    async def process_pending(self) -> None:
+        '''Дообработка отложенных update не чаще раза в PROCESS_INTERVAL_SECONDS'''
+        if time.monotonic() - self.processed_at < PROCESS_INTERVAL_SECONDS:
+            return
+        self.processed_at = time.monotonic()
+        try:
+            stats = await self.db(lambda cursor, conn: process_inbox(cursor, conn, api_url=self.api_url))
+        except Exception as e:
+            print(f'process_inbox failed: {e!r}')
+            return
+        if stats['processed'] or stats['failed']:
+            print(f'inbox: {stats}')
+
+    async def dispatch(self, updates: List[Dict[str, Any]]) -> List[int]:
+        '''Чаты обрабатываются параллельно; сбой одного чата не прерывает остальные. Returns: необработанные update_id'''
+        by_chat: Dict[Any, List[Dict[str, Any]]] = {}
+        for update in sorted(updates, key=lambda u: u['update_id']):
+            chat_id = ((update.get('message') or {}).get('chat') or {}).get('id')
+            by_chat.setdefault(chat_id, []).append(update)
+        results = await asyncio.gather(
+            *(self.handle_chat(chat_updates) for chat_updates in by_chat.values()),
+            return_exceptions=True
+        )
+
+        failed = []
+        for (chat_id, chat_updates), result in zip(by_chat.items(), results):
+            if isinstance(result, BaseException):
+                print(f'chat {chat_id} failed: {result!r}')
+                failed.extend(u['update_id'] for u in chat_updates)
+            else:
+                failed.extend(result)
+        return failed
+
+    async def run(self, offset: int, once: bool) -> None:
+        '''
+        Цикл getUpdates. Пачка с необработанными update запрашивается заново с первого из них
+        (уже сохранённые отсеются по update_id в telegram_inbox), но не больше MAX_BATCH_RETRIES раз подряд,
+        чтобы один update не остановил смещение
+        '''
+        retries = 0
+        while True:
+            await self.process_pending()
+            try:
+                data = await self.call(
+                    'getUpdates',
+                    {'offset': offset, 'timeout': POLL_TIMEOUT, 'allowed_updates': ['message']},
+                    timeout=POLL_TIMEOUT + 10
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f'getUpdates failed: {e}')
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+                continue
+
+            if not data.get('ok'):
+                print(f'getUpdates error: {data}')
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+                continue
+
+            updates = data.get('result') or []
+            if updates:
+                try:
+                    failed = await self.dispatch(updates)
+                except Exception as e:
+                    print(f'dispatch failed: {e!r}')
+                    failed = [u['update_id'] for u in updates]
+
+                if failed and retries < MAX_BATCH_RETRIES:
+                    retries += 1
+                    offset = min(failed)
+                    print(f'{len(failed)} updates failed, retry {retries} from offset {offset}')
+                    await asyncio.sleep(RETRY_DELAY_SECONDS)
+                else:
+                    if failed:
+                        print(f'skipping updates after {MAX_BATCH_RETRIES} retries: {failed}')
+                    retries = 0
+                    offset = max(u['update_id'] for u in updates) + 1
+            if once:
+                return
+
+
+async def main_async(args) -> None:
+    pool = ThreadedConnectionPool(1, args.concurrency + 1, args.database_url)
+    try:
+        config = await asyncio.to_thread(_with_connection, pool, lambda cursor, conn: load_config(cursor))
+        if not config:
+            sys.exit('Бот не подключён: в telegram_config нет bot_token')
+        offset = await asyncio.to_thread(_with_connection, pool, _next_offset)
+
+        async with aiohttp.ClientSession() as session:
+            poller = Poller(pool, session, args.api_url, config['bot_token'], args.concurrency)
+            if args.delete_webhook:
+                # getUpdates не работает, пока у бота установлен вебхук
+                await poller.call('deleteWebhook', {'drop_pending_updates': False})
+            print(f'polling from offset {offset}')
+            await poller.run(offset, args.once)
+    finally:
+        pool.closeall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Telegram bot long-polling runner')
+    parser.add_argument('--api-url', default=TELEGRAM_API_URL,
+                        help='Bot API base URL (a local fake server for tests)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='chats handled in parallel')
+    parser.add_argument('--delete-webhook', action='store_true', help='remove the webhook before polling')
+    parser.add_argument('--once', action='store_true', help='process one getUpdates batch and exit')
+    args = parser.parse_args()
+
+    args.database_url = os.environ.get('DATABASE_URL')
+    if not args.database_url:
+        sys.exit('DATABASE_URL is not set')
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
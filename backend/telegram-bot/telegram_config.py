@@ -0,0 +1,47 @@
+import time
+from typing import Dict, Any
+
+# Не чаще этого интервала проверяется, не изменилась ли строка telegram_config (по updated_at)
+REVALIDATE_SECONDS = 30
+
+COLUMNS = ('bot_token', 'bot_username', 'admin_telegram_id', 'is_connected', 'updated_at')
+
+# Настройки бота на время жизни тёплого инстанса функции
+_state: Dict[str, Any] = {'config': None, 'checked_at': 0.0}
+
+
+def get_config(cursor) -> Dict[str, Any]:
+    '''
+    Строка telegram_config (id = 1) из кэша
+    В пределах REVALIDATE_SECONDS запросов к БД нет, затем сверяется updated_at,
+    и строка перечитывается только если её изменили
+    Returns: dict с ключами COLUMNS (пустой dict, если строки нет)
+    '''
+    now = time.monotonic()
+    config = _state['config']
+    if config is not None and now - _state['checked_at'] < REVALIDATE_SECONDS:
+        return config
+
+    # Отдельный обычный курсор: вызывающий может передать RealDictCursor
+    plain = cursor.connection.cursor()
+    try:
+        if config:
+            plain.execute('SELECT updated_at FROM telegram_config WHERE id = 1')
+            row = plain.fetchone()
+            if row and row[0] == config['updated_at']:
+                _state['checked_at'] = now
+                return config
+
+        plain.execute(f"SELECT {', '.join(COLUMNS)} FROM telegram_config WHERE id = 1")
+        row = plain.fetchone()
+    finally:
+        plain.close()
+
+    _state['config'] = dict(zip(COLUMNS, row)) if row else {}
+    _state['checked_at'] = now
+    return _state['config']
+
+
+def invalidate() -> None:
+    '''Сбрасывает кэш после изменения telegram_config в этом инстансе'''
+    _state['config'] = None
@@ -0,0 +1,109 @@
+'''
+Проверка poller.py через fake_telegram_api.py на временном Postgres (как bench_endpoints.py --local-postgres)
+
+Запуск:
+    python -m pytest backend/telegram-bot/test_poller.py
+
+Нужны aiohttp, psycopg2, requests и initdb/pg_ctl в PATH; без них тест пропускается.
+'''
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+psycopg2 = pytest.importorskip('psycopg2')
+pytest.importorskip('requests')
+if not shutil.which('initdb'):
+    pytest.skip('initdb не найден', allow_module_level=True)
+
+from aiohttp.test_utils import TestServer
+from psycopg2.extensions import make_dsn
+from psycopg2.pool import ThreadedConnectionPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'benchmarks'))
+
+from bench_endpoints import local_postgres, apply_migrations, SCHEMA
+import fake_telegram_api
+import poller
+
+BOT_TOKEN = 'test-token'
+ADMIN_CHAT = 100
+USER_CHAT = 200
+
+
+@pytest.fixture(scope='module')
+def dsn():
+    with local_postgres() as base_dsn:
+        dsn = make_dsn(base_dsn, options=f'-c search_path={SCHEMA},public')
+        apply_migrations(dsn)
+        conn = psycopg2.connect(dsn)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE telegram_config SET bot_token = %s, admin_telegram_id = %s, is_connected = true WHERE id = 1
+        ''', (BOT_TOKEN, ADMIN_CHAT))
+        cursor.execute('''
+            INSERT INTO users (username, email, full_name, invite_code, invite_created_at)
+            VALUES ('ivanov', 'ivanov@example.com', 'Иван Иванов', 'INV1', CURRENT_TIMESTAMP)
+        ''')
+        conn.commit()
+        conn.close()
+        yield dsn
+
+
+def inbox_row(dsn: str, update_id: int):
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, replies_sent FROM telegram_inbox WHERE update_id = %s', (update_id,))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+async def run_scenario(dsn: str) -> None:
+    app = fake_telegram_api.create_app()
+    fake = app['fake']
+    server = TestServer(app)
+    await server.start_server()
+    pool = ThreadedConnectionPool(1, 4, dsn)
+    try:
+        async with aiohttp.ClientSession() as session:
+            bot = poller.Poller(pool, session, str(server.make_url('')).rstrip('/'), BOT_TOKEN, 2)
+
+            # Ответ пользователю не доставлен: update не закрывается, команда уже выполнена
+            fake.fail_sends = 1
+            fake.add([{'message': {'chat': {'id': USER_CHAT}, 'text': '/start INV1'}}])
+            await bot.run(0, once=True)
+            assert fake.sent == []
+            assert inbox_row(dsn, 1) == ('pending', 0)
+
+            # process_inbox из цикла поллера досылает сохранённые ответы, а не выполняет /start заново
+            bot.processed_at = 0.0
+            await bot.process_pending()
+            assert [(m['chat_id'], m['text'].split('\n')[0]) for m in fake.sent] == [
+                (USER_CHAT, '✅ Отлично, Иван Иванов!'),
+                (ADMIN_CHAT, '🎉 Новый пользователь подключился!')
+            ]
+            assert inbox_row(dsn, 1) == ('done', 2)
+
+            # Повторная доставка того же update ничего не отправляет
+            await bot.run(0, once=True)
+            assert len(fake.sent) == 2
+
+            # Обычный update обрабатывается и закрывается после отправки
+            fake.add([{'message': {'chat': {'id': USER_CHAT}, 'text': '/help'}}])
+            await bot.run(2, once=True)
+            assert fake.sent[-1]['text'].startswith('📋 Доступные команды')
+            assert inbox_row(dsn, 2) == ('done', 1)
+    finally:
+        pool.closeall()
+        await server.close()
+
+
+def test_poller_delivers_and_retries_through_fake_api(dsn):
+    asyncio.run(run_scenario(dsn))
@@ -0,0 +1,28 @@
+'''
+Общие модули функций: каждая функция разворачивается отдельно, поэтому модуль лежит копией
+в нескольких каталогах backend/ и копии должны совпадать байт в байт
+
+Запуск:
+    python -m pytest backend/test_shared_modules.py
+'''
+import os
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Модуль -> функции, в которых лежат его копии
+SHARED_MODULES = {
+    'contractor_cache.py': ('zalupa', 'generate-pdf'),
+    'telegram_config.py': ('zalupa', 'telegram-bot'),
+}
+
+
+@pytest.mark.parametrize('module', sorted(SHARED_MODULES))
+def test_copies_are_identical(module):
+    first, *others = SHARED_MODULES[module]
+    with open(os.path.join(BACKEND, first, module), 'rb') as f:
+        expected = f.read()
+    for function in others:
+        with open(os.path.join(BACKEND, function, module), 'rb') as f:
+            assert f.read() == expected, f'{function}/{module} отличается от {first}/{module}'
@@ -0,0 +1,241 @@
+import os
+import hmac
+import json
+import hashlib
+import time
+from typing import Dict, Any, Optional, Tuple
+from http_cache import get_header
+from serializer import dumps
+
+# Ресурсы, доступ к которым настраивается в ролях (список совпадает с RESOURCES в AddRoles.tsx)
+PROTECTED_RESOURCES = ('contracts', 'contractors', 'drivers', 'vehicles', 'orders', 'roles', 'users')
+
+# Ресурсы только для администраторов: доступ по секрету DIAGNOSTICS_TOKEN в заголовке X-Auth-Token.
+# X-User-Id здесь не учитывается - его может подставить любой клиент
+ADMIN_RESOURCES = ('diagnostics',)
+
+ADMIN_TOKEN_HEADER = 'X-Auth-Token'
+
+# Личность пользователя: токен "<user_id>.<expires>.<hmac>", подписанный секретом AUTH_SECRET.
+# Без AUTH_SECRET личность не проверить, и X-User-Id принимается только при AUTH_REQUIRED=0
+USER_TOKEN_HEADER = 'X-User-Token'
+
+USER_TOKEN_TTL_DAYS = 30
+
+# Сводные ресурсы: доступ есть, только если то же действие разрешено на всех исходных ресурсах
+COMPOSITE_RESOURCES = {
+    'stats': ('contracts', 'orders')
+}
+
+METHOD_PERMISSIONS = {
+    'GET': 'read',
+    'POST': 'create',
+    'PUT': 'update',
+    'DELETE': 'remove'
+}
+
+# Права пользователя перечитываются не реже этого интервала, даже если версия не менялась
+CACHE_TTL_SECONDS = 60
+
+MAX_ENTRIES = 1000
+
+# user_id -> {'version', 'loaded_at', 'is_active', 'is_admin', 'permissions': {resource: {read, create, update, remove}}}
+_cache: Dict[int, Dict[str, Any]] = {}
+
+
+def auth_required() -> bool:
+    '''Отклонять ли запросы без подтверждённой личности; по умолчанию да, отключается только явно (AUTH_REQUIRED=0)'''
+    return os.environ.get('AUTH_REQUIRED', '').lower() not in ('0', 'false', 'no')
+
+
+def _sign(payload: str, secret: str) -> str:
+    return hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def issue_user_token(user_id: int, ttl_days: int = USER_TOKEN_TTL_DAYS) -> str:
+    '''Подписанный токен пользователя для заголовка X-User-Token'''
+    secret = os.environ.get('AUTH_SECRET') or ''
+    if not secret:
+        raise ValueError('Не задан AUTH_SECRET')
+    payload = f'{user_id}.{int(time.time()) + ttl_days * 86400}'
+    return f'{payload}.{_sign(payload, secret)}'
+
+
+def _user_id(event: Dict[str, Any]) -> Tuple[Optional[int], Optional[str]]:
+    '''
+    Личность текущего пользователя
+    Returns: (user_id, None), (None, None) - личность не передана, или (None, текст ошибки)
+    '''
+    secret = os.environ.get('AUTH_SECRET') or ''
+    if secret:
+        token = get_header(event, USER_TOKEN_HEADER)
+        if not token:
+            return None, None
+        parts = token.split('.')
+        if len(parts) != 3 or not hmac.compare_digest(_sign(f'{parts[0]}.{parts[1]}', secret), parts[2]):
+            return None, f'Неверный {USER_TOKEN_HEADER}'
+        try:
+            user_id, expires = int(parts[0]), int(parts[1])
+        except ValueError:
+            return None, f'Неверный {USER_TOKEN_HEADER}'
+        if expires < time.time():
+            return None, f'Срок действия {USER_TOKEN_HEADER} истёк'
+        return user_id, None
+
+    # Без секрета X-User-Id может подставить любой клиент: доверяем ему только при явном AUTH_REQUIRED=0
+    raw_user_id = get_header(event, 'X-User-Id')
+    if not raw_user_id:
+        return None, None
+    if auth_required():
+        return None, f'Не задан AUTH_SECRET: X-User-Id не принимается, нужен {USER_TOKEN_HEADER}'
+    try:
+        return int(raw_user_id), None
+    except ValueError:
+        return None, 'Некорректный X-User-Id'
+
+
+def _load(cursor, user_id: int) -> Dict[str, Any]:
+    '''Версия прав, флаги пользователя и права по ресурсам, объединённые по всем ролям, одним запросом'''
+    cursor.execute('''
+        SELECT v.version, u.id, u.is_active, COALESCE(u.is_admin, false), rp.resource,
+               bool_or(rp.can_read), bool_or(rp.can_create), bool_or(rp.can_update), bool_or(rp.can_remove)
+        FROM authz_version v
+        LEFT JOIN users u ON u.id = %s
+        LEFT JOIN user_roles ur ON ur.user_id = u.id
+        LEFT JOIN role_permissions rp ON rp.role_id = ur.role_id
+        WHERE v.id = 1
+        GROUP BY v.version, u.id, u.is_active, u.is_admin, rp.resource
+    ''', (user_id,))
+    rows = cursor.fetchall()
+
+    version, found_id, is_active, is_admin = rows[0][:4]
+    permissions = {
+        row[4]: {'read': row[5], 'create': row[6], 'update': row[7], 'remove': row[8]}
+        for row in rows if row[4]
+    }
+    return {
+        'version': version,
+        'loaded_at': time.monotonic(),
+        'exists': found_id is not None,
+        'is_active': bool(is_active),
+        'is_admin': is_admin,
+        'permissions': permissions
+    }
+
+
+def resolve(cursor, user_id: int) -> Dict[str, Any]:
+    '''
+    Права пользователя из кэша тёплого инстанса
+    При попадании в кэш выполняется только чтение версии из authz_version;
+    если версия сменилась (триггеры на ролях, правах и user_roles) - кэш сбрасывается целиком
+    '''
+    entry = _cache.get(user_id)
+    if entry and time.monotonic() - entry['loaded_at'] < CACHE_TTL_SECONDS:
+        cursor.execute('SELECT version FROM authz_version WHERE id = 1')
+        if cursor.fetchone()[0] == entry['version']:
+            return entry
+        _cache.clear()
+
+    entry = _load(cursor, user_id)
+    _cache.pop(user_id, None)
+    _cache[user_id] = entry
+    while len(_cache) > MAX_ENTRIES:
+        _cache.pop(next(iter(_cache)))
+    return entry
+
+
+def _admin_access(event: Dict[str, Any]) -> Optional[Tuple[int, str]]:
+    '''Проверяет секрет администратора; без DIAGNOSTICS_TOKEN ресурсы закрыты для всех'''
+    token = get_header(event, ADMIN_TOKEN_HEADER) or ''
+    if not token:
+        return (401, f'Требуется {ADMIN_TOKEN_HEADER}')
+    secret = os.environ.get('DIAGNOSTICS_TOKEN') or ''
+    if not secret:
+        return (403, 'Диагностика отключена: не задан DIAGNOSTICS_TOKEN')
+    if not hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8')):
+        return (403, f'Неверный {ADMIN_TOKEN_HEADER}')
+    return None
+
+
+def check_access(event: Dict[str, Any], cursor, resource: str, method: str) -> Optional[Tuple[int, str]]:
+    '''
+    Проверяет право текущего пользователя (X-User-Token, без AUTH_SECRET - X-User-Id) на действие с ресурсом
+    Returns: None, если доступ разрешён, иначе (HTTP статус, текст ошибки)
+    '''
+    if resource in ADMIN_RESOURCES:
+        return _admin_access(event)
+    if resource in COMPOSITE_RESOURCES:
+        for source in COMPOSITE_RESOURCES[resource]:
+            denied = check_access(event, cursor, source, method)
+            if denied:
+                return denied
+        return None
+    if resource not in PROTECTED_RESOURCES or method not in METHOD_PERMISSIONS:
+        return None
+
+    user_id, error = _user_id(event)
+    if error:
+        return (401, error)
+    if user_id is None:
+        return (401, 'Требуется авторизация') if auth_required() else None
+
+    entry = resolve(cursor, user_id)
+    if not entry['exists'] or not entry['is_active']:
+        return (401, 'Пользователь не найден или отключён')
+    if entry['is_admin']:
+        return None
+
+    action = METHOD_PERMISSIONS[method]
+    if entry['permissions'].get(resource, {}).get(action):
+        return None
+    return (403, f'Недостаточно прав: {action} для {resource}')
+
+
+def handle_user_token(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Выдача X-User-Token пользователю (resource=diagnostics, action=user_token, только с X-Auth-Token)
+    POST body: {"userId": 1, "days": 30}
+    '''
+    if method != 'POST':
+        return {
+            'statusCode': 405,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    body = json.loads(event.get('body') or '{}')
+    user_id = body.get('userId')
+    days = body.get('days', USER_TOKEN_TTL_DAYS)
+    if isinstance(user_id, bool) or not isinstance(user_id, int) or isinstance(days, bool) \
+            or not isinstance(days, int) or days < 1:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'userId и days должны быть целыми числами, days >= 1'}),
+            'isBase64Encoded': False
+        }
+    if not os.environ.get('AUTH_SECRET'):
+        return {
+            'statusCode': 403,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Не задан AUTH_SECRET'}),
+            'isBase64Encoded': False
+        }
+
+    cursor.execute('SELECT is_active FROM users WHERE id = %s', (user_id,))
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return {
+            'statusCode': 404,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Пользователь не найден или отключён'}),
+            'isBase64Encoded': False
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({'userId': user_id, 'days': days, 'token': issue_user_token(user_id, days)}),
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,398 @@
+import io
+import re
+import csv
+import json
+import base64
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict, Any, List, Tuple
+from serializer import dumps
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+MAX_ROWS = 5000
+
+# Колонка импорта: (колонка БД, camelCase ключ API, тип, заголовок в таблице)
+# Тип повторяет колонку БД: text, text(20) для VARCHAR(20), date, int, decimal(10,2)
+ImportColumns = List[Tuple[str, str, str, str]]
+
+KIND_RE = re.compile(r'^(\w+)(?:\((\d+)(?:,\s*(\d+))?\))?$')
+
+# Диапазон INTEGER в Postgres
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _error(status: int, message: str, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': cors_headers,
+        'body': dumps({'error': message}),
+        'isBase64Encoded': False
+    }
+
+
+def _decode_text(raw: bytes) -> str:
+    '''CSV из Excel для русской локали приходит в cp1251, остальные - в UTF-8 (с BOM или без)'''
+    try:
+        return raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return raw.decode('cp1251')
+
+
+def read_rows(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''
+    Достаёт строки из тела запроса
+    format=json - массив объектов в rows
+    format=csv|xlsx - файл в base64 в fileData, первая строка - заголовки
+    Returns: список dict заголовок -> значение; при ошибке бросает ValueError
+    '''
+    data_format = (body.get('format') or 'json').lower()
+
+    if data_format == 'json':
+        rows = body.get('rows')
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise ValueError('rows должен быть массивом объектов')
+        return rows
+
+    if not body.get('fileData'):
+        raise ValueError('Не передан fileData')
+    try:
+        raw = base64.b64decode(body['fileData'])
+    except Exception:
+        raise ValueError('fileData должен быть в base64')
+
+    if data_format == 'csv':
+        text = _decode_text(raw)
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        return [row for row in csv.DictReader(io.StringIO(text), dialect=dialect)]
+
+    if data_format == 'xlsx':
+        if openpyxl is None:
+            raise ValueError('Импорт XLSX недоступен: не установлен openpyxl')
+        try:
+            workbook = openpyxl.load_workbook(io.BytesIO(raw), read_only=True, data_only=True)
+        except Exception:
+            raise ValueError('Не удалось прочитать XLSX файл')
+        sheet_rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else '' for h in next(sheet_rows, ())]
+        rows = []
+        for values in sheet_rows:
+            if all(v is None or v == '' for v in values):
+                continue
+            rows.append(dict(zip(headers, values)))
+        workbook.close()
+        return rows
+
+    raise ValueError(f'Неизвестный формат: {data_format}')
+
+
+def _header_map(columns: ImportColumns) -> Dict[str, str]:
+    '''Заголовок (ключ API, колонка БД или подпись, без учёта регистра) -> колонка БД'''
+    mapping = {}
+    for column, key, _, label in columns:
+        for alias in (column, key, label):
+            mapping[alias.lower()] = column
+    return mapping
+
+
+def _convert(value: Any, kind: str) -> Any:
+    '''
+    Приводит значение ячейки к типу колонки; пустое -> None, ошибка -> ValueError
+    Длина строк и разрядность чисел проверяются здесь: иначе одна неподходящая ячейка
+    роняет COPY всего файла вместо ошибки в своей строке
+    '''
+    match = KIND_RE.match(kind)
+    kind = match.group(1)
+    size = int(match.group(2)) if match.group(2) else None
+    scale = int(match.group(3) or 0)
+
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+
+    if kind == 'text':
+        # Excel хранит телефоны и номера как числа: 79161234567.0 -> '79161234567'
+        if isinstance(value, float) and value.is_integer():
+            value = str(int(value))
+        value = str(value)
+        if size is not None and len(value) > size:
+            raise ValueError(f'длиннее {size} символов: {value}')
+        return value
+
+    if kind == 'date':
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        for pattern in ('%Y-%m-%d', '%d.%m.%Y'):
+            try:
+                return datetime.strptime(str(value), pattern).date()
+            except ValueError:
+                pass
+        raise ValueError(f'некорректная дата: {value}')
+
+    if kind == 'int':
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'ожидается целое число: {value}')
+        if not INT_MIN <= number <= INT_MAX:
+            raise ValueError(f'слишком большое число: {value}')
+        return number
+
+    if kind == 'decimal':
+        try:
+            number = Decimal(str(value).replace(',', '.').replace(' ', ''))
+        except InvalidOperation:
+            raise ValueError(f'ожидается число: {value}')
+        if not number.is_finite():
+            raise ValueError(f'ожидается число: {value}')
+        if size is not None:
+            # Postgres округляет до scale знаков, а лишние разряды целой части - ошибка
+            number = number.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+            if abs(number) >= Decimal(10) ** (size - scale):
+                raise ValueError(f'больше {size - scale} знаков до запятой: {value}')
+        return number
+
+    return value
+
+
+def validate_rows(rows: List[Dict[str, Any]], spec: Dict[str, Any], defaults: Dict[str, Any]) -> Tuple[List[Tuple[int, List[Any]]], List[Dict[str, Any]]]:
+    '''
+    Проверяет и нормализует строки в памяти, до обращения к БД
+    Повтор ключа дубликата внутри файла - ошибка для всех повторов кроме первого
+    Returns: (валидные строки [(номер, значения по spec['columns'])], ошибки [{row, errors}])
+    '''
+    columns: ImportColumns = spec['columns']
+    mapping = _header_map(columns)
+    names = [column for column, _, _, _ in columns]
+    labels = {column: label for column, _, _, label in columns}
+    kinds = {column: kind for column, _, kind, _ in columns}
+    normalize = spec.get('normalize', {})
+
+    valid: List[Tuple[int, List[Any]]] = []
+    errors: List[Dict[str, Any]] = []
+    seen: Dict[Tuple[Any, ...], int] = {}
+
+    for row_num, raw in enumerate(rows, start=1):
+        values: Dict[str, Any] = dict(defaults)
+        row_errors = []
+
+        for header, value in raw.items():
+            column = mapping.get(str(header).strip().lower()) if header is not None else None
+            if not column:
+                continue
+            try:
+                converted = _convert(value, kinds[column])
+            except ValueError as e:
+                row_errors.append(f'{labels[column]}: {e}')
+                continue
+            if converted is not None or column not in values:
+                values[column] = converted
+
+        for column in spec['required']:
+            if values.get(column) is None:
+                row_errors.append(f'{labels[column]}: обязательное поле')
+
+        if not row_errors:
+            for key_columns in spec['unique']:
+                key = tuple(
+                    normalize[c](values[c]) if c in normalize and values.get(c) is not None else values.get(c)
+                    for c in key_columns
+                )
+                # Как в уникальном индексе БД: ключ с NULL в любой части не совпадает ни с каким другим
+                if any(part is None for part in key):
+                    continue
+                key = (key_columns,) + key
+                if key in seen:
+                    row_errors.append(f'дубликат строки {seen[key]} в файле')
+                    break
+                seen[key] = row_num
+
+        if row_errors:
+            errors.append({'row': row_num, 'errors': row_errors})
+        else:
+            valid.append((row_num, [values.get(name) for name in names]))
+
+    return valid, errors
+
+
+def check_references(cursor, spec: Dict[str, Any], valid: List[Tuple[int, List[Any]]],
+                     errors: List[Dict[str, Any]]) -> List[Tuple[int, List[Any]]]:
+    '''
+    Проверяет ссылки spec['references'] ({колонка: (таблица, название)}) одним запросом на колонку
+    Строки с несуществующим id переносятся в errors; Returns: оставшиеся валидные строки
+    '''
+    names = [column for column, _, _, _ in spec['columns']]
+    labels = {column: label for column, _, _, label in spec['columns']}
+    for column, (table, title) in spec.get('references', {}).items():
+        index = names.index(column)
+        ids = sorted({values[index] for _, values in valid if values[index] is not None})
+        if not ids:
+            continue
+        cursor.execute(f'SELECT id FROM {table} WHERE id = ANY(%s)', (ids,))
+        known = {row[0] for row in cursor.fetchall()}
+        kept = []
+        for row_num, values in valid:
+            if values[index] is None or values[index] in known:
+                kept.append((row_num, values))
+            else:
+                errors.append({'row': row_num, 'errors': [f'{labels[column]}: {title} {values[index]} не найден']})
+        valid = kept
+    errors.sort(key=lambda error: error['row'])
+    return valid
+
+
+def _copy_to_staging(cursor, spec: Dict[str, Any], valid: List[Tuple[int, List[Any]]]) -> None:
+    '''Создаёт временную таблицу с типами колонок целевой таблицы и заливает в неё строки через COPY'''
+    names = ', '.join(column for column, _, _, _ in spec['columns'])
+    cursor.execute(f'''
+        CREATE TEMP TABLE import_staging ON COMMIT DROP AS
+        SELECT 0 AS row_num, id, {names} FROM {spec['table']} WITH NO DATA
+    ''')
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row_num, values in valid:
+        # None пишется пустым полем без кавычек - в FORMAT csv это NULL
+        writer.writerow([row_num, None] + values)
+    buffer.seek(0)
+
+    cursor.copy_expert(f'COPY import_staging (row_num, id, {names}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def merge_staging(cursor, spec: Dict[str, Any], on_duplicate: str) -> Dict[int, Tuple[int, str]]:
+    '''
+    Сопоставляет строки staging с существующими записями по spec['match'] и сливает их в целевую таблицу
+    Новые строки получают id из последовательности заранее, чтобы номер строки файла связать с id
+    Returns: номер строки -> (id записи, inserted|updated|duplicate)
+    '''
+    table = spec['table']
+    names = [column for column, _, _, _ in spec['columns']]
+
+    # Каждое условие - отдельный join (UNION ALL вместо OR, чтобы работали индексы и hash join)
+    matches = ' UNION ALL '.join(
+        f'SELECT s.row_num, d.id FROM import_staging s JOIN {table} d ON {condition}'
+        for condition in spec['match']
+    )
+    cursor.execute(f'''
+        CREATE TEMP TABLE import_matches ON COMMIT DROP AS
+        SELECT DISTINCT ON (row_num) row_num, id FROM ({matches}) m
+        ORDER BY row_num, id
+    ''')
+
+    cursor.execute(f'''
+        UPDATE import_staging s
+        SET id = nextval(pg_get_serial_sequence('{table}', 'id'))
+        WHERE NOT EXISTS (SELECT 1 FROM import_matches m WHERE m.row_num = s.row_num)
+        RETURNING s.row_num, s.id
+    ''')
+    outcome = {row_num: (record_id, 'inserted') for row_num, record_id in cursor.fetchall()}
+
+    cursor.execute(f'''
+        INSERT INTO {table} (id, {', '.join(names)})
+        SELECT id, {', '.join(names)} FROM import_staging
+        WHERE id IS NOT NULL
+        ORDER BY row_num
+    ''')
+
+    cursor.execute('SELECT row_num, id FROM import_matches')
+    matched = cursor.fetchall()
+
+    if on_duplicate == 'update' and matched:
+        assignments = ', '.join(f'{name} = COALESCE(s.{name}, d.{name})' for name in names)
+        # Если несколько строк файла совпали с одной записью, применяется первая из них
+        cursor.execute(f'''
+            UPDATE {table} d
+            SET {assignments}, updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT DISTINCT ON (m.id) m.id AS target_id, s.*
+                FROM import_matches m JOIN import_staging s ON s.row_num = m.row_num
+                ORDER BY m.id, m.row_num
+            ) s
+            WHERE d.id = s.target_id
+        ''')
+        status = 'updated'
+    else:
+        status = 'duplicate'
+
+    for row_num, record_id in matched:
+        outcome[row_num] = (record_id, status)
+    return outcome
+
+
+def import_rows(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str], spec: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Массовый импорт: POST ?resource=<ресурс>&action=import
+    Body: {"format": "json"|"csv"|"xlsx", "rows": [...] | "fileData": "<base64>",
+           "onDuplicate": "skip"|"update", "companyId": N}
+    Все строки проверяются заранее, валидные загружаются через COPY во временную таблицу
+    и сливаются с таблицей ресурса одной транзакцией; по невалидным строкам возвращается отчёт
+    '''
+    try:
+        body = json.loads(event.get('body') or '{}')
+        rows = read_rows(body)
+    except json.JSONDecodeError:
+        return _error(400, 'Некорректный JSON', cors_headers)
+    except ValueError as e:
+        return _error(400, str(e), cors_headers)
+
+    if not rows:
+        return _error(400, 'Нет строк для импорта', cors_headers)
+    if len(rows) > MAX_ROWS:
+        return _error(400, f'Не больше {MAX_ROWS} строк за один импорт', cors_headers)
+
+    on_duplicate = body.get('onDuplicate') or 'skip'
+    if on_duplicate not in ('skip', 'update'):
+        return _error(400, 'onDuplicate должен быть skip или update', cors_headers)
+
+    defaults: Dict[str, Any] = {}
+    if body.get('companyId') is not None:
+        reference = spec.get('references', {}).get('company_id')
+        try:
+            if isinstance(body['companyId'], bool) or reference is None:
+                raise ValueError
+            company_id = _convert(body['companyId'], 'int')
+        except ValueError:
+            return _error(400, 'companyId должен быть id контрагента', cors_headers)
+        cursor.execute(f'SELECT 1 FROM {reference[0]} WHERE id = %s', (company_id,))
+        if not cursor.fetchone():
+            return _error(400, f'companyId: {reference[1]} {company_id} не найден', cors_headers)
+        defaults['company_id'] = company_id
+
+    valid, errors = validate_rows(rows, spec, defaults)
+    valid = check_references(cursor, spec, valid, errors)
+
+    outcome: Dict[int, Tuple[int, str]] = {}
+    if valid:
+        _copy_to_staging(cursor, spec, valid)
+        outcome = merge_staging(cursor, spec, on_duplicate)
+    conn.commit()
+
+    statuses = [status for _, status in outcome.values()]
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({
+            'total': len(rows),
+            'inserted': statuses.count('inserted'),
+            'updated': statuses.count('updated'),
+            'duplicates': statuses.count('duplicate'),
+            'failed': len(errors),
+            'rows': [
+                {'row': row_num, 'id': record_id, 'status': status}
+                for row_num, (record_id, status) in sorted(outcome.items())
+            ],
+            'errors': errors
+        }),
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,241 @@
+from typing import Dict, Any, List, Tuple
+from psycopg2.extras import RealDictCursor
+from serializer import dumps
+from pg_json import JsonFields
+from drivers import DRIVER_JSON_FIELDS
+from vehicles import VEHICLE_JSON_FIELDS
+from contractors import CONTRACTOR_JSON_FIELDS
+from contracts import to_camelcase, attach_contractor_names, CONTRACT_FULL_COLUMNS, FULL_PARTIES
+from orders import fetch_orders_by_ids
+from authz import check_access
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+# Сколько дней хранится журнал по умолчанию при очистке (action=change_log)
+PRUNE_DAYS = 30
+
+# Отдаются только записи транзакций с txid ниже xmin текущего снимка - все они уже завершены.
+# id (BIGSERIAL) выдаётся при вставке, а не при коммите, поэтому курсор - пара (txid, id):
+# транзакция, открытая дольше остальных, не закоммитит запись позади уже выданного курсора
+FINISHED_SQL = 'txid < txid_snapshot_xmin(txid_current_snapshot())'
+
+FIELD_TABLES: Dict[str, JsonFields] = {
+    'drivers': DRIVER_JSON_FIELDS,
+    'vehicles': VEHICLE_JSON_FIELDS,
+    'contractors': CONTRACTOR_JSON_FIELDS
+}
+
+# Таблица change_log -> ресурс, право read на который нужно, чтобы получать её изменения
+TABLE_RESOURCES = {
+    'orders': 'orders',
+    'contracts': 'contracts',
+    'contractors': 'contractors',
+    'drivers': 'drivers',
+    'vehicles': 'vehicles'
+}
+
+
+def parse_cursor(value: str) -> Tuple[int, int]:
+    '''Курсор "<txid>:<id>"; ValueError для некорректного'''
+    txid, _, log_id = value.partition(':')
+    return int(txid), int(log_id)
+
+
+def format_cursor(txid: int, log_id: int) -> str:
+    return f'{txid}:{log_id}'
+
+
+def _gone(cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'statusCode': 410,
+        'headers': cors_headers,
+        'body': dumps({'error': 'Курсор устарел: журнал изменений очищен, нужна полная загрузка'}),
+        'isBase64Encoded': False
+    }
+
+
+def handle_changes(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Лента изменений для инкрементальной синхронизации клиента
+    GET ?resource=changes - текущий курсор без изменений (точка отсчёта после полной загрузки)
+    GET ?resource=changes&since=<cursor>&limit=N - upsert-ы с актуальными данными и tombstone-ы по порядку
+    410 - курсор старше очищенной части журнала (prune_change_log) или старого формата: нужна полная загрузка
+    Отдаются только изменения ресурсов, на которые у X-User-Id есть право read (authz.check_access)
+    '''
+    if method != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    params = event.get('queryStringParameters') or {}
+    since = params.get('since')
+
+    if since and since.isdigit():
+        # Курсор до перехода на (txid, id) - по нему нельзя продолжить без пропусков
+        return _gone(cors_headers)
+
+    try:
+        since_key = parse_cursor(since) if since else None
+        limit = max(1, min(int(params.get('limit') or DEFAULT_LIMIT), MAX_LIMIT))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Некорректный since или limit'}),
+            'isBase64Encoded': False
+        }
+
+    if since_key is None:
+        cursor.execute(f'''
+            SELECT txid, id FROM change_log
+            WHERE {FINISHED_SQL}
+            ORDER BY txid DESC, id DESC
+            LIMIT 1
+        ''')
+        last = cursor.fetchone() or (0, 0)
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': dumps({'changes': [], 'cursor': format_cursor(*last), 'hasMore': False}),
+            'isBase64Encoded': False
+        }
+
+    cursor.execute('SELECT txid, log_id FROM change_log_horizon WHERE id = 1')
+    horizon = cursor.fetchone()
+    if horizon and since_key < tuple(horizon):
+        return _gone(cors_headers)
+
+    cursor.execute(f'''
+        SELECT id, txid, table_name, record_id, op
+        FROM change_log
+        WHERE (txid, id) > (%s, %s) AND {FINISHED_SQL}
+        ORDER BY txid, id
+        LIMIT %s
+    ''', (since_key[0], since_key[1], limit + 1))
+    rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = format_cursor(rows[-1][1], rows[-1][0]) if rows else since
+
+    # Несколько изменений одной записи в пачке схлопываются в последнее
+    latest: Dict[tuple, tuple] = {}
+    for seq, _, table, record_id, op in rows:
+        latest.pop((table, record_id), None)
+        latest[(table, record_id)] = (seq, op)
+
+    # Записи таблиц, которые пользователь не может читать, пропускаются; курсор при этом всё равно сдвигается
+    readable = {
+        table for table in {table for table, _ in latest}
+        if table in TABLE_RESOURCES and check_access(event, cursor, TABLE_RESOURCES[table], 'GET') is None
+    }
+    latest = {key: value for key, value in latest.items() if key[0] in readable}
+
+    upsert_ids: Dict[str, List[int]] = {}
+    for (table, record_id), (_, op) in latest.items():
+        if op == 'upsert':
+            upsert_ids.setdefault(table, []).append(record_id)
+
+    records: Dict[tuple, Dict[str, Any]] = {}
+    for table, ids in upsert_ids.items():
+        for record in load_records(cursor, conn, table, ids):
+            records[(table, record['id'])] = record
+
+    changes = []
+    for (table, record_id), (seq, op) in latest.items():
+        if (table, record_id) in records:
+            changes.append({'seq': seq, 'resource': table, 'id': record_id, 'op': 'upsert', 'data': records[(table, record_id)]})
+        else:
+            # Записи уже нет: её удаление могло попасть в журнал раньше по порядку txid, чем эта вставка
+            changes.append({'seq': seq, 'resource': table, 'id': record_id, 'op': 'delete'})
+
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({'changes': changes, 'cursor': next_cursor, 'hasMore': has_more}),
+        'isBase64Encoded': False
+    }
+
+
+def load_records(cursor, conn, table: str, ids: List[int]) -> List[Dict[str, Any]]:
+    '''Загружает актуальное состояние записей одной таблицы одним запросом по ANY(ids)'''
+    if table in FIELD_TABLES:
+        fields = FIELD_TABLES[table]
+        cursor.execute(
+            f"SELECT {', '.join(expr for _, expr in fields)} FROM {table} t WHERE t.id = ANY(%s)",
+            (ids,)
+        )
+        keys = [key for key, _ in fields]
+        return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    if table == 'contracts':
+        dict_cursor = conn.cursor(cursor_factory=RealDictCursor)
+        dict_cursor.execute(f'''
+            SELECT {CONTRACT_FULL_COLUMNS}
+            FROM contracts c
+            WHERE c.id = ANY(%s)
+        ''', (ids,))
+        contracts = dict_cursor.fetchall()
+        attach_contractor_names(cursor, contracts, FULL_PARTIES)
+        return [to_camelcase(dict(c)) for c in contracts]
+
+    if table == 'orders':
+        return fetch_orders_by_ids(cursor, ids)
+
+    return []
+
+
+def prune_change_log(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    DELETE ?resource=diagnostics&action=change_log&days=30 - удалить завершённые записи журнала старше days дней
+    Граница удалённого сохраняется в change_log_horizon: клиент с более старым курсором получит 410
+    '''
+    params = event.get('queryStringParameters') or {}
+    if method != 'DELETE':
+        return {
+            'statusCode': 405,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    try:
+        days = max(1, int(params.get('days') or PRUNE_DAYS))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'days должен быть числом'}),
+            'isBase64Encoded': False
+        }
+
+    cursor.execute(f'''
+        WITH deleted AS (
+            DELETE FROM change_log
+            WHERE changed_at < CURRENT_TIMESTAMP - make_interval(days => %s) AND {FINISHED_SQL}
+            RETURNING txid, id
+        ),
+        last AS (
+            SELECT txid, id FROM deleted ORDER BY txid DESC, id DESC LIMIT 1
+        ),
+        horizon AS (
+            INSERT INTO change_log_horizon (id, txid, log_id, pruned_at)
+            SELECT 1, txid, id, CURRENT_TIMESTAMP FROM last
+            ON CONFLICT (id) DO UPDATE
+            SET txid = EXCLUDED.txid, log_id = EXCLUDED.log_id, pruned_at = EXCLUDED.pruned_at
+            WHERE (EXCLUDED.txid, EXCLUDED.log_id) > (change_log_horizon.txid, change_log_horizon.log_id)
+        )
+        SELECT count(*) FROM deleted
+    ''', (days,))
+    deleted = cursor.fetchone()[0]
+    conn.commit()
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({'deleted': deleted}),
+        'isBase64Encoded': False
+    }
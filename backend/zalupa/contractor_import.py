@@ -0,0 +1,419 @@
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from psycopg2.extras import execute_values
+from serializer import dumps
+from bulk_import import read_rows
+from dadata_service import find_party_by_inn
+from request_metrics import phase
+
+MAX_INNS = 5000
+
+# Размер пачки ИНН, которая обогащается и вставляется за один шаг
+BATCH_SIZE = 50
+
+# Одновременных запросов к DaData в пределах пачки
+DADATA_CONCURRENCY = 5
+
+# Сколько секунд один вызов обрабатывает ИНН (запас до таймаута функции). Дедлайн проверяется перед
+# каждым запросом к DaData, поэтому вызов может превысить бюджет только на таймаут одного запроса (10 с)
+RUN_BUDGET_SECONDS = 20
+
+MAX_ATTEMPTS = 3
+
+# Пауза перед повтором ИНН после ошибки: RETRY_BASE_SECONDS * 2^(attempts-1) - 30 с, 60 с, ...
+RETRY_BASE_SECONDS = 30
+
+# Пачка в статусе running дольше этого интервала считается брошенной упавшим вызовом и берётся заново;
+# задание, которое никто не продвигал дольше этого интервала, дообрабатывают другие вызовы импорта
+STALE_INTERVAL = '5 minutes'
+
+# Результат обогащения для ИНН, до которого не дошла очередь до дедлайна: возвращается в pending без попытки
+_DEFERRED = object()
+
+INN_HEADERS = ('inn', 'инн')
+
+
+def _inn_text(value: Any) -> str:
+    '''
+    ИНН из ячейки как строка
+    Числовая ячейка XLSX (или число в JSON) теряет ведущий ноль: 9 и 11 цифр дополняются до 10 и 12
+    '''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        inn = str(int(value))
+        return inn.zfill(len(inn) + 1) if len(inn) in (9, 11) else inn
+    return str(value)
+
+
+def _error(status: int, message: str, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': cors_headers,
+        'body': dumps({'error': message}),
+        'isBase64Encoded': False
+    }
+
+
+def _extract_inns(body: Dict[str, Any]) -> List[str]:
+    '''Список ИНН из body.inns или из колонки ИНН таблицы (format=csv|xlsx)'''
+    if 'inns' in body:
+        if not isinstance(body['inns'], list):
+            raise ValueError('inns должен быть массивом')
+        return [_inn_text(inn) for inn in body['inns']]
+
+    inns = []
+    for row in read_rows(body):
+        for header, value in row.items():
+            if header is not None and str(header).strip().lower() in INN_HEADERS and value not in (None, ''):
+                inns.append(_inn_text(value))
+                break
+    return inns
+
+
+def create_job(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    POST ?resource=contractors&action=import
+    Body: {"inns": [...]} или {"format": "csv"|"xlsx", "fileData": "<base64>"} + isSeller/isBuyer/isCarrier
+    Создаёт задание: ИНН чистятся и дедуплицируются, уже существующие в contractors отмечаются сразу;
+    дальше задание обрабатывается в пределах RUN_BUDGET_SECONDS
+    '''
+    try:
+        body = json.loads(event.get('body') or '{}')
+        raw_inns = _extract_inns(body)
+    except json.JSONDecodeError:
+        return _error(400, 'Некорректный JSON', cors_headers)
+    except ValueError as e:
+        return _error(400, str(e), cors_headers)
+
+    inns: List[str] = []
+    invalid: List[str] = []
+    for raw in raw_inns:
+        inn = re.sub(r'\s', '', raw)
+        if not re.fullmatch(r'\d{10}|\d{12}', inn):
+            invalid.append(raw)
+        elif inn not in inns:
+            inns.append(inn)
+
+    if not inns:
+        return _error(400, 'Нет корректных ИНН для импорта', cors_headers)
+    if len(inns) > MAX_INNS:
+        return _error(400, f'Не больше {MAX_INNS} ИНН за один импорт', cors_headers)
+
+    cursor.execute('''
+        INSERT INTO contractor_import_jobs (is_seller, is_buyer, is_carrier, total)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id
+    ''', (bool(body.get('isSeller')), bool(body.get('isBuyer')), bool(body.get('isCarrier')), len(inns)))
+    job_id = cursor.fetchone()[0]
+
+    execute_values(
+        cursor,
+        'INSERT INTO contractor_import_items (job_id, inn) VALUES %s',
+        [(job_id, inn) for inn in inns],
+        page_size=1000
+    )
+
+    # Дедупликация с существующими контрагентами одним запросом
+    cursor.execute('''
+        UPDATE contractor_import_items i
+        SET status = 'exists', contractor_id = c.id, updated_at = CURRENT_TIMESTAMP
+        FROM contractors c
+        WHERE i.job_id = %s AND c.inn = i.inn
+    ''', (job_id,))
+    conn.commit()
+
+    # Первая порция обрабатывается сразу: небольшой импорт завершается без отдельных вызовов import_run
+    run_job(cursor, conn, job_id)
+
+    progress = job_progress(cursor, job_id)
+    progress['invalid'] = invalid
+    return {
+        'statusCode': 202,
+        'headers': cors_headers,
+        'body': dumps(progress),
+        'isBase64Encoded': False
+    }
+
+
+def _claim_batch(cursor, conn, job_id: int) -> List[Tuple[int, str, int]]:
+    '''Забирает пачку ИНН в работу; SKIP LOCKED позволяет параллельным вызовам не мешать друг другу'''
+    cursor.execute(f'''
+        UPDATE contractor_import_items
+        SET status = 'running', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM contractor_import_items
+            WHERE job_id = %s
+              AND ((status = 'pending' AND (next_attempt_at IS NULL OR next_attempt_at <= CURRENT_TIMESTAMP))
+                   OR (status = 'running' AND updated_at < CURRENT_TIMESTAMP - interval '{STALE_INTERVAL}'))
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, inn, attempts
+    ''', (job_id, BATCH_SIZE))
+    batch = cursor.fetchall()
+    conn.commit()
+    return batch
+
+
+def _enrich(inns: List[str], deadline: float) -> Dict[str, Any]:
+    '''
+    Запрашивает DaData по пачке ИНН с ограниченной параллельностью: ИНН -> данные, None, исключение
+    или _DEFERRED, если к моменту запроса дедлайн уже наступил
+    '''
+    import requests
+
+    def fetch(inn: str) -> Any:
+        if time.monotonic() >= deadline:
+            return _DEFERRED
+        try:
+            return find_party_by_inn(inn, session)
+        except Exception as e:
+            return e
+
+    # Потоки пула не видят замеры запроса, поэтому в фазу http засчитывается вся пачка целиком
+    with phase('http'), requests.Session() as session:
+        with ThreadPoolExecutor(max_workers=DADATA_CONCURRENCY) as pool:
+            return dict(zip(inns, pool.map(fetch, inns)))
+
+
+def _process_batch(cursor, conn, job: Dict[str, Any], batch: List[Tuple[int, str, int]], deadline: float) -> None:
+    '''Обогащает пачку и вставляет найденных контрагентов одним INSERT'''
+    results = _enrich([inn for _, inn, _ in batch], deadline)
+
+    found = []
+    not_found = []
+    failed = []
+    deferred = []
+    for item_id, inn, attempts in batch:
+        result = results[inn]
+        if result is _DEFERRED:
+            deferred.append(item_id)
+        elif isinstance(result, Exception):
+            # Ошибка сети или лимит DaData: ИНН возвращается в очередь не раньше паузы, после MAX_ATTEMPTS - failed
+            failed.append((
+                item_id, 'failed' if attempts >= MAX_ATTEMPTS else 'pending', str(result),
+                RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            ))
+        elif result is None:
+            not_found.append(item_id)
+        else:
+            found.append((
+                item_id, result['name'] or inn, inn, result['kpp'] or None, result['ogrn'] or None,
+                result['director'] or None, result['legalAddress'] or None,
+                job['is_seller'], job['is_buyer'], job['is_carrier']
+            ))
+
+    if found:
+        # Уникального индекса по contractors.inn нет (вручную дубли заводить можно), поэтому параллельные
+        # задания с одним ИНН сериализуются блокировкой на ИНН до конца транзакции. Порядок захвата
+        # одинаковый во всех вызовах, чтобы не было взаимоблокировок. Следующий запрос видит контрагентов,
+        # вставленных заданием, которое держало блокировку, и не вставляет ИНН повторно
+        cursor.execute('''
+            SELECT pg_advisory_xact_lock(hashtext('contractors.inn'), key)
+            FROM (SELECT DISTINCT hashtext(inn) AS key FROM unnest(%s::text[]) AS inn) keys
+            ORDER BY key
+        ''', ([row[2] for row in found],))
+        execute_values(cursor, '''
+            WITH batch (item_id, name, inn, kpp, ogrn, director, legal_address, is_seller, is_buyer, is_carrier) AS (
+                VALUES %s
+            ),
+            inserted AS (
+                INSERT INTO contractors (name, inn, kpp, ogrn, director, legal_address, is_seller, is_buyer, is_carrier)
+                SELECT name, inn, kpp, ogrn, director, legal_address, is_seller, is_buyer, is_carrier
+                FROM batch b
+                WHERE NOT EXISTS (SELECT 1 FROM contractors c WHERE c.inn = b.inn)
+                RETURNING id, inn
+            )
+            UPDATE contractor_import_items i
+            SET status = CASE WHEN ins.id IS NOT NULL THEN 'created' ELSE 'exists' END,
+                contractor_id = COALESCE(ins.id, (SELECT c.id FROM contractors c WHERE c.inn = b.inn ORDER BY c.id LIMIT 1)),
+                updated_at = CURRENT_TIMESTAMP
+            FROM batch b
+            LEFT JOIN inserted ins ON ins.inn = b.inn
+            WHERE i.id = b.item_id
+        ''', found)
+
+    if not_found:
+        cursor.execute('''
+            UPDATE contractor_import_items
+            SET status = 'not_found', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ANY(%s)
+        ''', (not_found,))
+
+    if failed:
+        execute_values(cursor, '''
+            UPDATE contractor_import_items i
+            SET status = v.status, error = v.error, updated_at = CURRENT_TIMESTAMP,
+                next_attempt_at = CURRENT_TIMESTAMP + v.delay * interval '1 second'
+            FROM (VALUES %s) AS v(id, status, error, delay)
+            WHERE i.id = v.id
+        ''', failed)
+
+    if deferred:
+        cursor.execute('''
+            UPDATE contractor_import_items
+            SET status = 'pending', attempts = attempts - 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ANY(%s)
+        ''', (deferred,))
+
+    conn.commit()
+
+
+JOB_COLUMNS = ('id', 'status', 'is_seller', 'is_buyer', 'is_carrier')
+
+
+def _run(cursor, conn, job: Dict[str, Any], deadline: float) -> None:
+    '''Обрабатывает пачки задания до дедлайна; без оставшихся ИНН задание закрывается (done)'''
+    cursor.execute('''
+        UPDATE contractor_import_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE id = %s
+    ''', (job['id'],))
+    conn.commit()
+
+    while time.monotonic() < deadline:
+        batch = _claim_batch(cursor, conn, job['id'])
+        if not batch:
+            break
+        _process_batch(cursor, conn, job, batch, deadline)
+
+    cursor.execute('''
+        UPDATE contractor_import_jobs
+        SET status = 'done', finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND NOT EXISTS (
+            SELECT 1 FROM contractor_import_items
+            WHERE job_id = %s AND status IN ('pending', 'running')
+        )
+    ''', (job['id'], job['id']))
+    conn.commit()
+
+
+def _claim_abandoned_job(cursor, conn) -> Optional[Dict[str, Any]]:
+    '''
+    Старейшее незавершённое задание, которое никто не продвигал дольше STALE_INTERVAL (клиент закрыл вкладку).
+    updated_at сдвигается сразу, поэтому параллельные вызовы и следующий шаг цикла его не возьмут
+    '''
+    cursor.execute(f'''
+        UPDATE contractor_import_jobs
+        SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM contractor_import_jobs
+            WHERE status <> 'done' AND updated_at < CURRENT_TIMESTAMP - interval '{STALE_INTERVAL}'
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {', '.join(JOB_COLUMNS)}
+    ''')
+    row = cursor.fetchone()
+    conn.commit()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+
+def run_job(cursor, conn, job_id: Optional[int]) -> Optional[List[int]]:
+    '''
+    Обрабатывает задание job_id, а в оставшееся от RUN_BUDGET_SECONDS время - брошенные задания,
+    поэтому они завершаются при любом следующем импорте или вызове import_run без jobId (по расписанию)
+    Returns: id обработанных заданий; None, если задание job_id не найдено
+    '''
+    deadline = time.monotonic() + RUN_BUDGET_SECONDS
+    processed = []
+    if job_id is not None:
+        cursor.execute(f'SELECT {", ".join(JOB_COLUMNS)} FROM contractor_import_jobs WHERE id = %s', (job_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        if job['status'] != 'done':
+            _run(cursor, conn, job, deadline)
+            processed.append(job_id)
+
+    while time.monotonic() < deadline:
+        job = _claim_abandoned_job(cursor, conn)
+        if not job:
+            break
+        _run(cursor, conn, job, deadline)
+        processed.append(job['id'])
+    return processed
+
+
+def job_progress(cursor, job_id: int) -> Dict[str, Any]:
+    '''Прогресс задания: счётчики по статусам и ИНН, требующие внимания'''
+    cursor.execute('SELECT status, total, created_at, finished_at FROM contractor_import_jobs WHERE id = %s', (job_id,))
+    status, total, created_at, finished_at = cursor.fetchone()
+
+    cursor.execute('''
+        SELECT status, count(*) FROM contractor_import_items WHERE job_id = %s GROUP BY status
+    ''', (job_id,))
+    counts = {key: 0 for key in ('pending', 'running', 'created', 'exists', 'not_found', 'failed')}
+    counts.update(dict(cursor.fetchall()))
+
+    cursor.execute('''
+        SELECT inn, status, error FROM contractor_import_items
+        WHERE job_id = %s AND status IN ('not_found', 'failed')
+        ORDER BY id
+    ''', (job_id,))
+    problems = [{'inn': inn, 'status': item_status, 'error': error} for inn, item_status, error in cursor.fetchall()]
+
+    return {
+        'jobId': job_id,
+        'status': status,
+        'total': total,
+        'processed': total - counts['pending'] - counts['running'],
+        'counts': {
+            'pending': counts['pending'] + counts['running'],
+            'created': counts['created'],
+            'exists': counts['exists'],
+            'notFound': counts['not_found'],
+            'failed': counts['failed']
+        },
+        'problems': problems,
+        'createdAt': created_at,
+        'finishedAt': finished_at
+    }
+
+
+def handle_contractor_import(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Импорт контрагентов по ИНН фоновым заданием
+    POST action=import - создать задание
+    POST action=import_run&jobId=N - обработать очередные пачки (вызывается клиентом до status=done)
+    POST action=import_run - только дообработать брошенные задания (по расписанию)
+    GET action=import_status&jobId=N - прогресс
+    '''
+    params = event.get('queryStringParameters') or {}
+    action = params.get('action')
+
+    if method == 'POST' and action == 'import':
+        return create_job(event, cursor, conn, cors_headers)
+
+    if method == 'POST' and action == 'import_run' and not params.get('jobId'):
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': dumps({'processedJobs': run_job(cursor, conn, None)}),
+            'isBase64Encoded': False
+        }
+
+    try:
+        job_id = int(params.get('jobId') or '')
+    except ValueError:
+        return _error(400, 'Не указан jobId', cors_headers)
+
+    if method == 'POST' and action == 'import_run':
+        if run_job(cursor, conn, job_id) is None:
+            return _error(404, 'Задание импорта не найдено', cors_headers)
+    elif method == 'GET' and action == 'import_status':
+        cursor.execute('SELECT 1 FROM contractor_import_jobs WHERE id = %s', (job_id,))
+        if not cursor.fetchone():
+            return _error(404, 'Задание импорта не найдено', cors_headers)
+    else:
+        return _error(405, 'Method not allowed', cors_headers)
+
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps(job_progress(cursor, job_id)),
+        'isBase64Encoded': False
+    }
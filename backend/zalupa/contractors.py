@@ -1,5 +1,50 @@
 import json
 from typing import Dict, Any
+from serializer import dumps
+from pg_json import JsonFields, use_pg_json
+from list_query import parse_list_params, fetch_list, fetch_list_json
+from contractor_cache import invalidate
+from contractor_import import handle_contractor_import
+
+
+CONTRACTOR_JSON_FIELDS: JsonFields = [
+    ('id', 't.id'),
+    ('name', 't.name'),
+    ('inn', 't.inn'),
+    ('kpp', 't.kpp'),
+    ('ogrn', 't.ogrn'),
+    ('director', 't.director'),
+    ('legalAddress', 't.legal_address'),
+    ('actualAddress', 't.actual_address'),
+    ('postalAddress', 't.postal_address'),
+    ('isSeller', 't.is_seller'),
+    ('isBuyer', 't.is_buyer'),
+    ('isCarrier', 't.is_carrier'),
+    ('bankAccounts', "COALESCE(t.bank_accounts, '[]'::jsonb)"),
+    ('deliveryAddresses', "COALESCE(t.delivery_addresses, '[]'::jsonb)"),
+    ('createdAt', 't.created_at'),
+    ('updatedAt', 't.updated_at'),
+]
+
+CONTRACTOR_LIST_SPEC = {
+    'table': 'contractors',
+    'collection': 'contractors',
+    'fields': CONTRACTOR_JSON_FIELDS,
+    'sort': {
+        'createdAt': 't.created_at',
+        'updatedAt': 't.updated_at',
+        'name': 't.name',
+        'inn': 't.inn',
+        'id': 't.id'
+    },
+    'filters': {
+        'is_carrier': ('t.is_carrier', 'bool'),
+        'is_seller': ('t.is_seller', 'bool'),
+        'is_buyer': ('t.is_buyer', 'bool')
+    },
+    'default_sort': '-createdAt'
+}
+
 
 def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
     '''
@@ -15,6 +60,9 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
     '''
     params = event.get('queryStringParameters') or {}
     
+    if params.get('action') in ('import', 'import_run', 'import_status'):
+        return handle_contractor_import(method, event, cursor, conn, cors_headers)
+    
     if method == 'POST':
         body_data = json.loads(event.get('body', '{}'))
         
@@ -25,7 +73,7 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Наименование, ИНН'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Наименование, ИНН'}),
                 'isBase64Encoded': False
             }
         
@@ -58,10 +106,10 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Контрагент {name} успешно добавлен',
-                'createdAt': result[1].isoformat() if result[1] else None
+                'createdAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -77,7 +125,7 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Контрагент не найден'}),
+                    'body': dumps({'error': 'Контрагент не найден'}),
                     'isBase64Encoded': False
                 }
             
@@ -96,45 +144,36 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
                 'isCarrier': row[11],
                 'bankAccounts': row[12] if row[12] else [],
                 'deliveryAddresses': row[13] if row[13] else [],
-                'createdAt': row[14].isoformat() if row[14] else None,
-                'updatedAt': row[15].isoformat() if row[15] else None
+                'createdAt': row[14],
+                'updatedAt': row[15]
             }
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(contractor),
+                'body': dumps(contractor),
                 'isBase64Encoded': False
             }
         else:
-            cursor.execute('SELECT * FROM contractors ORDER BY created_at DESC')
-            rows = cursor.fetchall()
+            try:
+                query = parse_list_params(params, CONTRACTOR_LIST_SPEC)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
             
-            contractors = []
-            for row in rows:
-                contractors.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'inn': row[2],
-                    'kpp': row[3],
-                    'ogrn': row[4],
-                    'director': row[5],
-                    'legalAddress': row[6],
-                    'actualAddress': row[7],
-                    'postalAddress': row[8],
-                    'isSeller': row[9],
-                    'isBuyer': row[10],
-                    'isCarrier': row[11],
-                    'bankAccounts': row[12] if row[12] else [],
-                    'deliveryAddresses': row[13] if row[13] else [],
-                    'createdAt': row[14].isoformat() if row[14] else None,
-                    'updatedAt': row[15].isoformat() if row[15] else None
-                })
+            if use_pg_json(params):
+                body = fetch_list_json(cursor, CONTRACTOR_LIST_SPEC, query)
+            else:
+                body = fetch_list(cursor, CONTRACTOR_LIST_SPEC, query)
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'contractors': contractors, 'total': len(contractors)}),
+                'body': body,
                 'isBase64Encoded': False
             }
     
@@ -145,7 +184,7 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID контрагента'}),
+                'body': dumps({'error': 'Не указан ID контрагента'}),
                 'isBase64Encoded': False
             }
         
@@ -158,7 +197,7 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Наименование, ИНН'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Наименование, ИНН'}),
                 'isBase64Encoded': False
             }
         
@@ -198,12 +237,13 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
         ))
         
         result = cursor.fetchone()
+        invalidate(contractor_id)
         
         if not result:
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Контрагент не найден'}),
+                'body': dumps({'error': 'Контрагент не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -212,9 +252,9 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'message': f'Контрагент {name} успешно обновлён',
-                'updatedAt': result[1].isoformat() if result[1] else None
+                'updatedAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -226,18 +266,19 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID контрагента'}),
+                'body': dumps({'error': 'Не указан ID контрагента'}),
                 'isBase64Encoded': False
             }
         
         cursor.execute('DELETE FROM contractors WHERE id = %s RETURNING id', (contractor_id,))
         result = cursor.fetchone()
+        invalidate(contractor_id)
         
         if not result:
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Контрагент не найден'}),
+                'body': dumps({'error': 'Контрагент не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -246,7 +287,7 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Контрагент удалён'}),
+            'body': dumps({'message': 'Контрагент удалён'}),
             'isBase64Encoded': False
         }
     
@@ -254,6 +295,6 @@ def handle_contractors(method: str, event: Dict[str, Any], cursor, conn, cors_he
         return {
             'statusCode': 405,
             'headers': cors_headers,
-            'body': json.dumps({'error': f'Метод {method} не поддерживается'}),
+            'body': dumps({'error': f'Метод {method} не поддерживается'}),
             'isBase64Encoded': False
         }
@@ -1,6 +1,11 @@
 import json
-from typing import Dict, Any
+import re
+from datetime import date
+from typing import Dict, Any, List, Tuple
 from psycopg2.extras import RealDictCursor
+from serializer import dumps
+from list_query import MAX_LIMIT, encode_cursor, decode_cursor, keyset_condition
+from contractor_cache import get_many
 
 
 def to_camelcase(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -21,10 +26,12 @@ def handle_contracts(method: str, event: Dict[str, Any], cursor, conn, cors_head
     contract_id = params.get('id')
     
     if method == 'GET':
+        if params.get('action') == 'search':
+            return search_contracts(cursor, params, cors_headers)
         if contract_id:
             return get_contract_by_id(cursor, contract_id, cors_headers)
         else:
-            return get_all_contracts(cursor, cors_headers)
+            return get_all_contracts(cursor, params, cors_headers)
     
     elif method == 'POST':
         return create_contract(event, cursor, conn, cors_headers)
@@ -34,7 +41,7 @@ def handle_contracts(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'ID договора обязателен'}),
+                'body': dumps({'error': 'ID договора обязателен'}),
                 'isBase64Encoded': False
             }
         return update_contract(contract_id, event, cursor, conn, cors_headers)
@@ -44,7 +51,7 @@ def handle_contracts(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'ID договора обязателен'}),
+                'body': dumps({'error': 'ID договора обязателен'}),
                 'isBase64Encoded': False
             }
         return delete_contract(contract_id, cursor, conn, cors_headers)
@@ -52,41 +59,254 @@ def handle_contracts(method: str, event: Dict[str, Any], cursor, conn, cors_head
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
+        'body': dumps({'error': 'Метод не поддерживается'}),
         'isBase64Encoded': False
     }
 
 
-def get_all_contracts(cursor, cors_headers: Dict[str, str]) -> Dict[str, Any]:
-    '''Получить все договоры-заявки с информацией о контрагентах'''
+CONTRACT_SUMMARY_COLUMNS = '''
+    c.id, c.contract_number, c.contract_date, c.customer_id, c.carrier_id, c.cargo,
+    c.loading_addresses, c.unloading_addresses, c.payment_amount,
+    c.driver_full_name, c.driver_phone, c.vehicle_registration_number, c.vehicle_trailer_number,
+    c.created_at
+'''
+
+# Явный список вместо c.*: служебная колонка search_vector не должна попадать в ответы
+CONTRACT_FULL_COLUMNS = '''
+    c.id, c.contract_number, c.contract_date, c.customer_id, c.carrier_id,
+    c.vehicle_type, c.vehicle_capacity_tons, c.vehicle_capacity_m3,
+    c.temperature_mode, c.additional_conditions, c.cargo,
+    c.loading_seller_id, c.loading_addresses, c.loading_date,
+    c.unloading_buyer_id, c.unloading_addresses, c.unloading_date,
+    c.payment_amount, c.taxation_type, c.payment_terms,
+    c.driver_id, c.driver_full_name, c.driver_phone, c.driver_phone_extra,
+    c.driver_passport, c.driver_license,
+    c.vehicle_id, c.vehicle_registration_number, c.vehicle_trailer_number, c.vehicle_brand,
+    c.created_at, c.updated_at
+'''
+
+# Стороны договора: колонка с id контрагента -> ключ с его названием в ответе
+SUMMARY_PARTIES = (
+    ('customer_id', 'customer_name'),
+    ('carrier_id', 'carrier_name')
+)
+
+FULL_PARTIES = SUMMARY_PARTIES + (
+    ('loading_seller_id', 'loading_seller_name'),
+    ('unloading_buyer_id', 'unloading_buyer_name')
+)
+
+
+def attach_contractor_names(cursor, contracts: List[Dict[str, Any]], parties) -> None:
+    '''Проставляет названия сторон из кэша контрагентов вместо JOIN contractors на каждую сторону'''
+    ids = [contract[id_key] for contract in contracts for id_key, _ in parties]
+    contractors = get_many(cursor, ids)
+    
+    for contract in contracts:
+        for id_key, name_key in parties:
+            contractor = contractors.get(contract[id_key])
+            contract[name_key] = contractor['name'] if contractor else None
+
+
+def parse_contract_filters(params: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    '''Фильтры списка: customer_id, carrier_id, date_from/date_to по contract_date'''
+    conditions = []
+    values = []
+    
+    for param, column in (('customer_id', 'c.customer_id'), ('carrier_id', 'c.carrier_id')):
+        if params.get(param):
+            try:
+                values.append(int(params[param]))
+            except ValueError:
+                raise ValueError(f'{param} должен быть числом')
+            conditions.append(f'{column} = %s')
+    
+    for param, operator in (('date_from', '>='), ('date_to', '<=')):
+        if params.get(param):
+            try:
+                values.append(date.fromisoformat(params[param]))
+            except ValueError:
+                raise ValueError(f'{param} должен быть датой в формате YYYY-MM-DD')
+            conditions.append(f'c.contract_date {operator} %s')
+    
+    return conditions, values
+
+
+def get_all_contracts(cursor, params: Dict[str, Any], cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Получить список договоров-заявок
+    ?view=summary - только поля для страницы списка (номер, дата, стороны, груз, сумма, водитель/ТС)
+    ?limit=N&cursor=... - keyset-пагинация по (created_at, id)
+    ?customer_id, carrier_id, date_from, date_to - фильтры
+    '''
+    
+    try:
+        filter_conditions, filter_values = parse_contract_filters(params)
+        limit = min(int(params['limit']), MAX_LIMIT) if params.get('limit') else None
+        if limit is not None and limit < 1:
+            raise ValueError('limit должен быть больше 0')
+        conditions, values = list(filter_conditions), list(filter_values)
+        if params.get('cursor'):
+            condition, cursor_values = keyset_condition('c.created_at', 'c.id', True, decode_cursor(params['cursor']))
+            conditions.append(condition)
+            values.extend(cursor_values)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    
+    if params.get('view') == 'summary':
+        columns, parties = CONTRACT_SUMMARY_COLUMNS, SUMMARY_PARTIES
+    else:
+        columns, parties = CONTRACT_FULL_COLUMNS, FULL_PARTIES
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    limit_sql = f'LIMIT {limit + 1}' if limit else ''
     
     cursor = cursor.connection.cursor(cursor_factory=RealDictCursor)
     
-    cursor.execute('''
-        SELECT 
-            c.*,
-            customer.name as customer_name,
-            carrier.name as carrier_name,
-            loading_seller.name as loading_seller_name,
-            unloading_buyer.name as unloading_buyer_name
+    cursor.execute(f'''
+        SELECT {columns}
         FROM contracts c
-        LEFT JOIN contractors customer ON c.customer_id = customer.id
-        LEFT JOIN contractors carrier ON c.carrier_id = carrier.id
-        LEFT JOIN contractors loading_seller ON c.loading_seller_id = loading_seller.id
-        LEFT JOIN contractors unloading_buyer ON c.unloading_buyer_id = unloading_buyer.id
-        ORDER BY c.created_at DESC
-    ''')
+        {where}
+        ORDER BY c.created_at DESC, c.id DESC
+        {limit_sql}
+    ''', values)
     
     contracts = cursor.fetchall()
-    contracts_camelcase = [to_camelcase(dict(c)) for c in contracts]
+    page = contracts[:limit] if limit else contracts
+    attach_contractor_names(cursor, page, parties)
+    result = {
+        'contracts': [to_camelcase(dict(c)) for c in page],
+        'count': len(page),
+        'total': len(page)
+    }
+    if limit:
+        filter_where = f"WHERE {' AND '.join(filter_conditions)}" if filter_conditions else ''
+        cursor.execute(f'SELECT count(*) AS total FROM contracts c {filter_where}', filter_values)
+        result['total'] = cursor.fetchone()['total']
+        result['nextCursor'] = encode_cursor(page[-1]['created_at'], page[-1]['id']) if len(contracts) > limit else None
     
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps({
-            'contracts': contracts_camelcase,
-            'total': len(contracts_camelcase)
-        }, default=str),
+        'body': dumps(result),
+        'isBase64Encoded': False
+    }
+
+
+def build_search_query(text: str, operator: str = '&') -> str:
+    '''Превращает строку поиска в tsquery с префиксным совпадением каждого слова: "цем моск" -> "цем:* & моск:*"'''
+    words = re.findall(r'\w+', text.lower())
+    return f' {operator} '.join(f'{word}:*' for word in words)
+
+
+def search_contracts(cursor, params: Dict[str, Any], cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Полнотекстовый поиск договоров-заявок: ?action=search&q=...&limit=20&offset=0
+    Кандидаты по любому из слов собираются UNION из GIN-индекса contracts.search_vector
+    и индексов по каждой стороне договора для найденных контрагентов, затем проверяется
+    совпадение всех слов с учётом названий сторон и результаты ранжируются ts_rank.
+    total - число всех найденных договоров, как в списке договоров
+    '''
+    text = params.get('q', '')
+    
+    if not build_search_query(text):
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Параметр q обязателен'}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        limit = max(1, min(int(params.get('limit') or 20), MAX_LIMIT))
+        offset = max(0, int(params.get('offset') or 0))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'limit и offset должны быть числами'}),
+            'isBase64Encoded': False
+        }
+    
+    cursor = cursor.connection.cursor(cursor_factory=RealDictCursor)
+    
+    cursor.execute(f'''
+        WITH q AS (
+            SELECT to_tsquery('russian', %(all_words)s) AS query, to_tsquery('russian', %(any_word)s) AS candidates
+        ),
+        matched_contractors AS (
+            SELECT id FROM contractors, q
+            WHERE to_tsvector('russian', name) @@ q.candidates
+        ),
+        -- Кандидаты собираются отдельными индексными выборками: GIN по search_vector
+        -- и индекс внешнего ключа на каждую сторону договора
+        candidates AS (
+            SELECT c.id FROM contracts c, q WHERE c.search_vector @@ q.candidates
+            UNION
+            SELECT c.id FROM contracts c JOIN matched_contractors m ON c.customer_id = m.id
+            UNION
+            SELECT c.id FROM contracts c JOIN matched_contractors m ON c.carrier_id = m.id
+            UNION
+            SELECT c.id FROM contracts c JOIN matched_contractors m ON c.loading_seller_id = m.id
+            UNION
+            SELECT c.id FROM contracts c JOIN matched_contractors m ON c.unloading_buyer_id = m.id
+        ),
+        ranked AS (
+            SELECT {CONTRACT_SUMMARY_COLUMNS},
+                customer.name as customer_name,
+                carrier.name as carrier_name,
+                c.search_vector || setweight(to_tsvector('russian',
+                    concat_ws(' ', customer.name, carrier.name, loading_seller.name, unloading_buyer.name)
+                ), 'B') AS document
+            FROM candidates
+            JOIN contracts c ON c.id = candidates.id
+            LEFT JOIN contractors customer ON c.customer_id = customer.id
+            LEFT JOIN contractors carrier ON c.carrier_id = carrier.id
+            LEFT JOIN contractors loading_seller ON c.loading_seller_id = loading_seller.id
+            LEFT JOIN contractors unloading_buyer ON c.unloading_buyer_id = unloading_buyer.id
+        ),
+        matched AS (
+            SELECT ranked.*, ts_rank(ranked.document, q.query) AS rank
+            FROM ranked, q
+            WHERE ranked.document @@ q.query
+        )
+        -- Одна строка с total даже для пустой страницы (offset за концом выдачи)
+        SELECT totals.total, page.*
+        FROM (SELECT count(*) AS total FROM matched) totals
+        LEFT JOIN LATERAL (
+            SELECT * FROM matched
+            ORDER BY rank DESC, created_at DESC, id DESC
+            LIMIT %(limit)s OFFSET %(offset)s
+        ) page ON true
+    ''', {
+        'all_words': build_search_query(text, '&'),
+        'any_word': build_search_query(text, '|'),
+        'limit': limit + 1,
+        'offset': offset
+    })
+    
+    rows = cursor.fetchall()
+    total = rows[0]['total']
+    rows = [row for row in rows if row['id'] is not None]
+    page = rows[:limit]
+    
+    for row in page:
+        del row['document']
+        del row['total']
+    
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({
+            'contracts': [to_camelcase(dict(r)) for r in page],
+            'total': total,
+            'nextOffset': offset + limit if len(rows) > limit else None
+        }),
         'isBase64Encoded': False
     }
 
@@ -96,18 +316,9 @@ def get_contract_by_id(cursor, contract_id: str, cors_headers: Dict[str, str]) -
     
     cursor = cursor.connection.cursor(cursor_factory=RealDictCursor)
     
-    cursor.execute('''
-        SELECT 
-            c.*,
-            customer.name as customer_name,
-            carrier.name as carrier_name,
-            loading_seller.name as loading_seller_name,
-            unloading_buyer.name as unloading_buyer_name
+    cursor.execute(f'''
+        SELECT {CONTRACT_FULL_COLUMNS}
         FROM contracts c
-        LEFT JOIN contractors customer ON c.customer_id = customer.id
-        LEFT JOIN contractors carrier ON c.carrier_id = carrier.id
-        LEFT JOIN contractors loading_seller ON c.loading_seller_id = loading_seller.id
-        LEFT JOIN contractors unloading_buyer ON c.unloading_buyer_id = unloading_buyer.id
         WHERE c.id = %s
     ''', (contract_id,))
     
@@ -117,14 +328,16 @@ def get_contract_by_id(cursor, contract_id: str, cors_headers: Dict[str, str]) -
         return {
             'statusCode': 404,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Договор не найден'}),
+            'body': dumps({'error': 'Договор не найден'}),
             'isBase64Encoded': False
         }
     
+    attach_contractor_names(cursor, [contract], FULL_PARTIES)
+    
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps(to_camelcase(dict(contract)), default=str),
+        'body': dumps(to_camelcase(dict(contract))),
         'isBase64Encoded': False
     }
 
@@ -143,7 +356,7 @@ def create_contract(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str,
         return {
             'statusCode': 400,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Номер договора, дата и груз обязательны'}),
+            'body': dumps({'error': 'Номер договора, дата и груз обязательны'}),
             'isBase64Encoded': False
         }
     
@@ -153,7 +366,7 @@ def create_contract(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str,
         return {
             'statusCode': 400,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Договор с таким номером уже существует'}),
+            'body': dumps({'error': 'Договор с таким номером уже существует'}),
             'isBase64Encoded': False
         }
     
@@ -191,10 +404,10 @@ def create_contract(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str,
     return {
         'statusCode': 201,
         'headers': cors_headers,
-        'body': json.dumps({
+        'body': dumps({
             'id': result[0],
             'message': 'Договор-заявка успешно создан',
-            'createdAt': str(result[1])
+            'createdAt': result[1]
         }),
         'isBase64Encoded': False
     }
@@ -211,7 +424,7 @@ def update_contract(contract_id: str, event: Dict[str, Any], cursor, conn, cors_
         return {
             'statusCode': 404,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Договор не найден'}),
+            'body': dumps({'error': 'Договор не найден'}),
             'isBase64Encoded': False
         }
     
@@ -247,7 +460,7 @@ def update_contract(contract_id: str, event: Dict[str, Any], cursor, conn, cors_
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps({'message': 'Договор-заявка успешно обновлён'}),
+        'body': dumps({'message': 'Договор-заявка успешно обновлён'}),
         'isBase64Encoded': False
     }
 
@@ -262,7 +475,7 @@ def delete_contract(contract_id: str, cursor, conn, cors_headers: Dict[str, str]
         return {
             'statusCode': 404,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Договор не найден'}),
+            'body': dumps({'error': 'Договор не найден'}),
             'isBase64Encoded': False
         }
     
@@ -271,6 +484,6 @@ def delete_contract(contract_id: str, cursor, conn, cors_headers: Dict[str, str]
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps({'message': 'Договор-заявка успешно удалён'}),
+        'body': dumps({'message': 'Договор-заявка успешно удалён'}),
         'isBase64Encoded': False
     }
\ No newline at end of file
@@ -1,16 +1,19 @@
 import os
 from typing import Optional, Dict, Any
+from request_metrics import phase
 
 
-def get_company_by_inn(inn: str) -> Optional[Dict[str, Any]]:
+def find_party_by_inn(inn: str, session=None) -> Optional[Dict[str, Any]]:
     """
-    Получает данные компании по ИНН из DaData
+    Запрашивает компанию по ИНН из DaData без перехвата ошибок
     
     Args:
         inn: ИНН компании
+        session: requests.Session для переиспользования соединений при пакетной обработке
         
     Returns:
-        Словарь с данными компании или None при ошибке
+        Словарь с данными компании или None, если компания не найдена
+        (ошибки сети и HTTP пробрасываются, чтобы вызывающий мог повторить запрос)
     """
     import requests
     
@@ -30,32 +33,48 @@ def get_company_by_inn(inn: str) -> Optional[Dict[str, Any]]:
         'count': 1
     }
     
-    try:
-        response = requests.post(
+    with phase('http'):
+        response = (session or requests).post(
             f'{base_url}/findById/party',
             json=data,
             headers=headers,
             timeout=10
         )
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        if not result.get('suggestions'):
-            return None
-        
-        company = result['suggestions'][0]
-        data = company.get('data', {})
-        
-        return {
-            'name': data.get('name', {}).get('full_with_opf', ''),
-            'inn': data.get('inn', ''),
-            'kpp': data.get('kpp', ''),
-            'ogrn': data.get('ogrn', ''),
-            'director': data.get('management', {}).get('name', ''),
-            'legalAddress': data.get('address', {}).get('unrestricted_value', '')
-        }
+    response.raise_for_status()
+    
+    result = response.json()
+    
+    if not result.get('suggestions'):
+        return None
+    
+    company = result['suggestions'][0]
+    data = company.get('data', {})
+    
+    return {
+        'name': data.get('name', {}).get('full_with_opf', ''),
+        'inn': data.get('inn', ''),
+        'kpp': data.get('kpp', ''),
+        'ogrn': data.get('ogrn', ''),
+        'director': (data.get('management') or {}).get('name', ''),
+        'legalAddress': (data.get('address') or {}).get('unrestricted_value', '')
+    }
+
+
+def get_company_by_inn(inn: str) -> Optional[Dict[str, Any]]:
+    """
+    Получает данные компании по ИНН из DaData
+    
+    Args:
+        inn: ИНН компании
         
+    Returns:
+        Словарь с данными компании или None при ошибке
+    """
+    if not os.environ.get('DADATA_API_KEY'):
+        raise ValueError("DADATA_API_KEY не установлен")
+    
+    try:
+        return find_party_by_inn(inn)
     except Exception as e:
         print(f"Ошибка при запросе к DaData: {e}")
         return None
@@ -92,12 +111,13 @@ def suggest_addresses(query: str, count: int = 10) -> list:
     }
     
     try:
-        response = requests.post(
-            f'{base_url}/suggest/address',
-            json=data,
-            headers=headers,
-            timeout=10
-        )
+        with phase('http'):
+            response = requests.post(
+                f'{base_url}/suggest/address',
+                json=data,
+                headers=headers,
+                timeout=10
+            )
         response.raise_for_status()
         
         result = response.json()
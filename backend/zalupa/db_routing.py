@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Dict, Any, Tuple
+import psycopg2
+from http_cache import get_header
+
+# Ресурсы, списки и карточки которых (GET) можно читать с реплики DATABASE_URL_REPLICA
+REPLICA_RESOURCES = ('drivers', 'vehicles', 'contractors', 'contracts', 'templates', 'orders', 'stats')
+
+# Действия GET, которые только читают; остальные (статус импорта и т.п.) идут на основную базу
+REPLICA_ACTIONS = (None, 'search')
+
+# Токен read-your-writes: до этого момента (unix-время в мс) чтения клиента идут на основную базу
+TOKEN_HEADER = 'X-Read-Primary-Until'
+
+# Окно после записи, в течение которого клиент читает с основной базы; должно перекрывать отставание реплики
+PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS') or 10)
+
+REPLICA_CONNECT_TIMEOUT = 3
+
+
+def replica_url() -> str:
+    return os.environ.get('DATABASE_URL_REPLICA') or ''
+
+
+def pinned_to_primary(event: Dict[str, Any]) -> bool:
+    '''Передан ли действующий токен после недавней записи; неверный токен игнорируется'''
+    try:
+        until = int(get_header(event, TOKEN_HEADER) or 0)
+    except ValueError:
+        return False
+    now = time.time() * 1000
+    # Токен не может закреплять дольше окна: защищает от токенов из будущего при сбитых часах клиента
+    return now < until <= now + PIN_SECONDS * 1000
+
+
+def use_replica(event: Dict[str, Any], method: str, resource: str, params: Dict[str, Any]) -> bool:
+    '''Можно ли выполнить запрос на реплике: только чтение списков/карточек и без недавней записи клиента'''
+    if not replica_url() or method != 'GET':
+        return False
+    if resource not in REPLICA_RESOURCES or params.get('action') not in REPLICA_ACTIONS:
+        return False
+    return not pinned_to_primary(event)
+
+
+def read_token_headers(method: str, result: Dict[str, Any]) -> Dict[str, str]:
+    '''Заголовок с токеном для ответа на успешную запись'''
+    if method in ('POST', 'PUT', 'DELETE') and result.get('statusCode', 500) < 400:
+        return {TOKEN_HEADER: str(int((time.time() + PIN_SECONDS) * 1000))}
+    return {}
+
+
+def connect(db_url: str, replica: bool, **kwargs) -> Tuple[Any, bool]:
+    '''
+    Соединение с репликой или основной базой
+    Если реплика недоступна, запрос выполняется на основной базе
+    Returns: (соединение, открыто ли оно к реплике)
+    '''
+    if replica:
+        try:
+            return psycopg2.connect(replica_url(), connect_timeout=REPLICA_CONNECT_TIMEOUT, **kwargs), True
+        except psycopg2.OperationalError as e:
+            print(f'replica unavailable, using primary: {e}')
+    return psycopg2.connect(db_url, **kwargs), False
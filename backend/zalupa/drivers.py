@@ -1,5 +1,77 @@
 import json
 from typing import Dict, Any
+from serializer import dumps
+from pg_json import JsonFields, use_pg_json
+from list_query import parse_list_params, fetch_list, fetch_list_json
+from bulk_import import ImportColumns, import_rows
+
+
+DRIVER_JSON_FIELDS: JsonFields = [
+    ('id', 't.id'),
+    ('lastName', 't.last_name'),
+    ('firstName', 't.first_name'),
+    ('middleName', 't.middle_name'),
+    ('phone', 't.phone'),
+    ('phoneExtra', 't.phone_extra'),
+    ('passportSeries', 't.passport_series'),
+    ('passportNumber', 't.passport_number'),
+    ('passportDate', 't.passport_date'),
+    ('passportIssued', 't.passport_issued'),
+    ('licenseSeries', 't.license_series'),
+    ('licenseNumber', 't.license_number'),
+    ('licenseDate', 't.license_date'),
+    ('licenseIssued', 't.license_issued'),
+    ('createdAt', 't.created_at'),
+    ('updatedAt', 't.updated_at'),
+    ('companyId', 't.company_id'),
+]
+
+DRIVER_LIST_SPEC = {
+    'table': 'drivers',
+    'collection': 'drivers',
+    'fields': DRIVER_JSON_FIELDS,
+    'sort': {
+        'createdAt': 't.created_at',
+        'updatedAt': 't.updated_at',
+        'lastName': 't.last_name',
+        'id': 't.id'
+    },
+    'filters': {
+        'company_id': ('t.company_id', 'int')
+    },
+    'default_sort': '-createdAt'
+}
+
+DRIVER_IMPORT_COLUMNS: ImportColumns = [
+    ('last_name', 'lastName', 'text(100)', 'Фамилия'),
+    ('first_name', 'firstName', 'text(100)', 'Имя'),
+    ('middle_name', 'middleName', 'text(100)', 'Отчество'),
+    ('phone', 'phone', 'text(20)', 'Телефон'),
+    ('phone_extra', 'phoneExtra', 'text(20)', 'Доп. телефон'),
+    ('passport_series', 'passportSeries', 'text(10)', 'Серия паспорта'),
+    ('passport_number', 'passportNumber', 'text(20)', 'Номер паспорта'),
+    ('passport_date', 'passportDate', 'date', 'Дата выдачи паспорта'),
+    ('passport_issued', 'passportIssued', 'text', 'Кем выдан паспорт'),
+    ('license_series', 'licenseSeries', 'text(10)', 'Серия ВУ'),
+    ('license_number', 'licenseNumber', 'text(20)', 'Номер ВУ'),
+    ('license_date', 'licenseDate', 'date', 'Дата выдачи ВУ'),
+    ('license_issued', 'licenseIssued', 'text', 'Кем выдано ВУ'),
+    ('company_id', 'companyId', 'int', 'ID компании'),
+]
+
+DRIVER_IMPORT_SPEC = {
+    'table': 'drivers',
+    'columns': DRIVER_IMPORT_COLUMNS,
+    'required': ['last_name', 'first_name', 'phone'],
+    # Колонки-ссылки без внешнего ключа в БД: несуществующий id - ошибка строки, а не висячая ссылка
+    'references': {'company_id': ('contractors', 'контрагент')},
+    # Дубликат - совпадение телефона или водительского удостоверения (в файле и в БД)
+    'unique': [('phone',), ('license_series', 'license_number')],
+    'match': [
+        'd.phone = s.phone',
+        'd.license_number = s.license_number AND d.license_series = s.license_series'
+    ]
+}
 
 
 def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
@@ -7,6 +79,9 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
     
     params = event.get('queryStringParameters') or {}
     
+    if method == 'POST' and params.get('action') == 'import':
+        return import_rows(event, cursor, conn, cors_headers, DRIVER_IMPORT_SPEC)
+    
     if method == 'POST':
         body_data = json.loads(event.get('body', '{}'))
         
@@ -17,7 +92,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Фамилия, Имя'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Фамилия, Имя'}),
                 'isBase64Encoded': False
             }
         
@@ -48,7 +123,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 409,
                 'headers': cors_headers,
-                'body': json.dumps({'error': f'Водитель {last_name} {first_name} с телефоном {phone} уже существует'}),
+                'body': dumps({'error': f'Водитель {last_name} {first_name} с телефоном {phone} уже существует'}),
                 'isBase64Encoded': False
             }
         
@@ -71,10 +146,10 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Водитель {last_name} {first_name} успешно добавлен',
-                'createdAt': result[1].isoformat() if result[1] else None
+                'createdAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -90,7 +165,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Водитель не найден'}),
+                    'body': dumps({'error': 'Водитель не найден'}),
                     'isBase64Encoded': False
                 }
             
@@ -103,53 +178,43 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
                 'phoneExtra': row[5],
                 'passportSeries': row[6],
                 'passportNumber': row[7],
-                'passportDate': row[8].isoformat() if row[8] else None,
+                'passportDate': row[8],
                 'passportIssued': row[9],
                 'licenseSeries': row[10],
                 'licenseNumber': row[11],
-                'licenseDate': row[12].isoformat() if row[12] else None,
+                'licenseDate': row[12],
                 'licenseIssued': row[13],
-                'createdAt': row[14].isoformat() if row[14] else None,
-                'updatedAt': row[15].isoformat() if row[15] else None,
+                'createdAt': row[14],
+                'updatedAt': row[15],
                 'companyId': row[16]
             }
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(driver),
+                'body': dumps(driver),
                 'isBase64Encoded': False
             }
         else:
-            cursor.execute('SELECT * FROM drivers ORDER BY created_at DESC')
-            rows = cursor.fetchall()
+            try:
+                query = parse_list_params(params, DRIVER_LIST_SPEC)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
             
-            drivers = []
-            for row in rows:
-                drivers.append({
-                    'id': row[0],
-                    'lastName': row[1],
-                    'firstName': row[2],
-                    'middleName': row[3],
-                    'phone': row[4],
-                    'phoneExtra': row[5],
-                    'passportSeries': row[6],
-                    'passportNumber': row[7],
-                    'passportDate': row[8].isoformat() if row[8] else None,
-                    'passportIssued': row[9],
-                    'licenseSeries': row[10],
-                    'licenseNumber': row[11],
-                    'licenseDate': row[12].isoformat() if row[12] else None,
-                    'licenseIssued': row[13],
-                    'createdAt': row[14].isoformat() if row[14] else None,
-                    'updatedAt': row[15].isoformat() if row[15] else None,
-                    'companyId': row[16]
-                })
+            if use_pg_json(params):
+                body = fetch_list_json(cursor, DRIVER_LIST_SPEC, query)
+            else:
+                body = fetch_list(cursor, DRIVER_LIST_SPEC, query)
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'drivers': drivers, 'total': len(drivers)}),
+                'body': body,
                 'isBase64Encoded': False
             }
     
@@ -160,7 +225,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID водителя'}),
+                'body': dumps({'error': 'Не указан ID водителя'}),
                 'isBase64Encoded': False
             }
         
@@ -173,7 +238,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Фамилия, Имя'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Фамилия, Имя'}),
                 'isBase64Encoded': False
             }
         
@@ -222,7 +287,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Водитель не найден'}),
+                'body': dumps({'error': 'Водитель не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -231,10 +296,10 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Водитель {last_name} {first_name} успешно обновлен',
-                'updatedAt': result[1].isoformat() if result[1] else None
+                'updatedAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -246,7 +311,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID водителя'}),
+                'body': dumps({'error': 'Не указан ID водителя'}),
                 'isBase64Encoded': False
             }
         
@@ -257,7 +322,7 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Водитель не найден'}),
+                'body': dumps({'error': 'Водитель не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -266,13 +331,13 @@ def handle_drivers(method: str, event: Dict[str, Any], cursor, conn, cors_header
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Водитель успешно удален'}),
+            'body': dumps({'message': 'Водитель успешно удален'}),
             'isBase64Encoded': False
         }
     
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Метод не поддерживается'}),
+        'body': dumps({'error': 'Метод не поддерживается'}),
         'isBase64Encoded': False
     }
\ No newline at end of file
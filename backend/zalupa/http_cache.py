@@ -0,0 +1,62 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Dict, Any, Optional, Tuple
+
+# Справочные ресурсы, списки которых отдаются с ETag: resource -> таблица
+VERSIONED_TABLES = {
+    'drivers': 'drivers',
+    'vehicles': 'vehicles',
+    'contractors': 'contractors',
+    'templates': 'templates',
+    'roles': 'roles'
+}
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    '''Возвращает заголовок запроса без учёта регистра имени'''
+    headers = event.get('headers') or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def collection_version(cursor, table: str, params: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    '''
+    Вычисляет версию коллекции одним запросом max(updated_at) + count(*)
+    Args: table - таблица ресурса
+          params - queryStringParameters (limit, fields, фильтры меняют содержимое ответа)
+    Returns: (ETag, Last-Modified или None для пустой таблицы)
+    '''
+    cursor.execute(f'SELECT max(updated_at), count(*) FROM {table}')
+    updated_at, total = cursor.fetchone()
+
+    query = '&'.join(f'{key}={params[key]}' for key in sorted(params))
+    raw = f'{table}:{updated_at.isoformat() if updated_at else ""}:{total}:{query}'
+    etag = f'W/"{hashlib.md5(raw.encode("utf-8")).hexdigest()}"'
+
+    last_modified = None
+    if updated_at:
+        last_modified = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+    return etag, last_modified
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    '''Проверяет If-None-Match запроса против текущего ETag'''
+    if_none_match = get_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or etag.replace('W/', '') in candidates
+
+
+def cache_headers(etag: str, last_modified: Optional[str]) -> Dict[str, str]:
+    '''Заголовки кэширования для ответа со списком'''
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return headers
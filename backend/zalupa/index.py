@@ -1,5 +1,3 @@
-import json
-import psycopg2
 import os
 from typing import Dict, Any
 from dadata_service import get_company_by_inn, suggest_addresses
@@ -13,6 +11,14 @@ from roles import handle_roles
 from users import handle_users
 from telegram import handle_telegram
 from invites import handle_invites
+from changes import handle_changes, prune_change_log
+from stats import handle_stats, handle_stats_rebuild
+from authz import USER_TOKEN_HEADER, check_access, handle_user_token
+from http_cache import VERSIONED_TABLES, collection_version, etag_matches, cache_headers
+from serializer import dumps
+from slow_queries import handle_diagnostics, record_slow_queries
+from request_metrics import InstrumentedConnection, start_request, finish_request, phase, current
+from db_routing import TOKEN_HEADER, use_replica, read_token_headers, connect
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -22,12 +28,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
           context - объект с атрибутами request_id, function_name
     Returns: HTTP response dict
     '''
+    metrics = start_request()
+    result = route(event, context)
+    return finish_request(metrics, event, context, result)
+
+
+def route(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''Маршрутизация запроса по resource; замеры времени ведёт handler'''
     method: str = event.get('httpMethod', 'GET')
     
     cors_headers = {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token',
+        'Access-Control-Allow-Headers': f'Content-Type, X-User-Id, {USER_TOKEN_HEADER}, X-Auth-Token, If-None-Match, {TOKEN_HEADER}',
+        'Access-Control-Expose-Headers': f'ETag, Last-Modified, {TOKEN_HEADER}',
         'Access-Control-Max-Age': '86400',
         'Content-Type': 'application/json'
     }
@@ -53,7 +67,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Параметр inn обязателен'}),
+                    'body': dumps({'error': 'Параметр inn обязателен'}),
                     'isBase64Encoded': False
                 }
             
@@ -64,14 +78,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     return {
                         'statusCode': 404,
                         'headers': cors_headers,
-                        'body': json.dumps({'error': 'Компания не найдена'}),
+                        'body': dumps({'error': 'Компания не найдена'}),
                         'isBase64Encoded': False
                     }
                 
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps(company_data),
+                    'body': dumps(company_data),
                     'isBase64Encoded': False
                 }
                 
@@ -79,7 +93,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': str(e)}),
+                    'body': dumps({'error': str(e)}),
                     'isBase64Encoded': False
                 }
         
@@ -90,7 +104,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Параметр query обязателен'}),
+                    'body': dumps({'error': 'Параметр query обязателен'}),
                     'isBase64Encoded': False
                 }
             
@@ -100,7 +114,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'suggestions': suggestions}),
+                    'body': dumps({'suggestions': suggestions}),
                     'isBase64Encoded': False
                 }
                 
@@ -108,7 +122,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': str(e)}),
+                    'body': dumps({'error': str(e)}),
                     'isBase64Encoded': False
                 }
     
@@ -117,51 +131,103 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'DATABASE_URL not configured'}),
+            'body': dumps({'error': 'DATABASE_URL not configured'}),
             'isBase64Encoded': False
         }
     
     try:
-        conn = psycopg2.connect(db_url)
+        with phase('connect'):
+            conn, on_replica = connect(
+                db_url, use_replica(event, method, resource, params), connection_factory=InstrumentedConnection
+            )
+        metrics = current()
+        if metrics and on_replica:
+            metrics.database = 'replica'
         cursor = conn.cursor()
         
-        if resource == 'drivers':
-            result = handle_drivers(method, event, cursor, conn, cors_headers)
-        elif resource == 'vehicles':
-            result = handle_vehicles(method, event, cursor, conn, cors_headers)
-        elif resource == 'contractors':
-            result = handle_contractors(method, event, cursor, conn, cors_headers)
-        elif resource == 'contracts':
-            result = handle_contracts(method, event, cursor, conn, cors_headers)
-        elif resource == 'templates':
-            result = handle_templates(method, event, cursor, conn, cors_headers)
-        elif resource == 'orders':
-            result = handle_orders(method, event, cursor, conn, cors_headers)
-        elif resource == 'roles':
-            result = handle_roles(method, event, cursor, conn, cors_headers)
-        elif resource == 'users':
-            result = handle_users(method, event, cursor, conn, cors_headers)
-        elif resource == 'telegram':
-            result = handle_telegram(method, event, cursor, conn, cors_headers)
-        elif resource == 'invites':
-            result = handle_invites(method, event, cursor, conn, cors_headers)
-        else:
-            result = {
-                'statusCode': 400,
+        denied = check_access(event, cursor, resource, method)
+        if denied:
+            cursor.close()
+            conn.close()
+            return {
+                'statusCode': denied[0],
                 'headers': cors_headers,
-                'body': json.dumps({'error': f'Неизвестный ресурс: {resource}'}),
+                'body': dumps({'error': denied[1]}),
                 'isBase64Encoded': False
             }
         
+        version = None
+        if method == 'GET' and resource in VERSIONED_TABLES and not params.get('id') and not params.get('action'):
+            version = collection_version(cursor, VERSIONED_TABLES[resource], params)
+            
+            if etag_matches(event, version[0]):
+                cursor.close()
+                conn.close()
+                return {
+                    'statusCode': 304,
+                    'headers': {**cors_headers, **cache_headers(*version)},
+                    'body': '',
+                    'isBase64Encoded': False
+                }
+        
+        with phase('handler'):
+            if resource == 'drivers':
+                result = handle_drivers(method, event, cursor, conn, cors_headers)
+            elif resource == 'vehicles':
+                result = handle_vehicles(method, event, cursor, conn, cors_headers)
+            elif resource == 'contractors':
+                result = handle_contractors(method, event, cursor, conn, cors_headers)
+            elif resource == 'contracts':
+                result = handle_contracts(method, event, cursor, conn, cors_headers)
+            elif resource == 'templates':
+                result = handle_templates(method, event, cursor, conn, cors_headers)
+            elif resource == 'orders':
+                result = handle_orders(method, event, cursor, conn, cors_headers)
+            elif resource == 'roles':
+                result = handle_roles(method, event, cursor, conn, cors_headers)
+            elif resource == 'users':
+                result = handle_users(method, event, cursor, conn, cors_headers)
+            elif resource == 'telegram':
+                result = handle_telegram(method, event, cursor, conn, cors_headers)
+            elif resource == 'invites':
+                result = handle_invites(method, event, cursor, conn, cors_headers)
+            elif resource == 'changes':
+                result = handle_changes(method, event, cursor, conn, cors_headers)
+            elif resource == 'stats':
+                result = handle_stats(method, event, cursor, conn, cors_headers)
+            elif resource == 'diagnostics' and params.get('action') == 'change_log':
+                result = prune_change_log(method, event, cursor, conn, cors_headers)
+            elif resource == 'diagnostics' and params.get('action') == 'user_token':
+                result = handle_user_token(method, event, cursor, conn, cors_headers)
+            elif resource == 'diagnostics' and params.get('action') == 'rebuild_stats':
+                result = handle_stats_rebuild(method, event, cursor, conn, cors_headers)
+            elif resource == 'diagnostics':
+                result = handle_diagnostics(method, event, cursor, conn, cors_headers)
+            else:
+                result = {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': dumps({'error': f'Неизвестный ресурс: {resource}'}),
+                    'isBase64Encoded': False
+                }
+        
+        if metrics and metrics.slow:
+            # Реплика только для чтения: журнал пишется в основную базу
+            record_slow_queries(conn, metrics, resource, method, db_url if on_replica else None)
+        
         cursor.close()
         conn.close()
         
+        if version and result['statusCode'] == 200:
+            result['headers'] = {**result['headers'], **cache_headers(*version)}
+        result['headers'] = {**result['headers'], **read_token_headers(method, result)}
+        
         return result
         
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': str(e)}),
+            'body': dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
\ No newline at end of file
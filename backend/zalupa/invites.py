@@ -1,6 +1,8 @@
 import json
 import secrets
 from psycopg2.extras import RealDictCursor
+from serializer import dumps
+from telegram_config import get_config
 
 
 def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -> dict:
@@ -14,7 +16,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user_id is required'}),
+                'body': dumps({'error': 'user_id is required'}),
                 'isBase64Encoded': False
             }
         
@@ -30,13 +32,11 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'invite': None}),
+                'body': dumps({'invite': None}),
                 'isBase64Encoded': False
             }
         
-        cursor.execute('SELECT bot_username FROM telegram_config WHERE id = 1')
-        config = cursor.fetchone()
-        bot_username = config['bot_username'] if config and config.get('bot_username') else 'your_bot'
+        bot_username = get_config(cursor).get('bot_username') or 'your_bot'
         
         invite_link = f'https://t.me/{bot_username}?start={user["invite_code"]}'
         is_used = user['invite_used_at'] is not None
@@ -44,7 +44,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'invite': {
                     'id': user['id'],
                     'code': user['invite_code'],
@@ -64,7 +64,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user_id is required'}),
+                'body': dumps({'error': 'user_id is required'}),
                 'isBase64Encoded': False
             }
         
@@ -73,7 +73,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'User not found'}),
+                'body': dumps({'error': 'User not found'}),
                 'isBase64Encoded': False
             }
         
@@ -89,16 +89,14 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
         ''', (invite_code, user_id))
         conn.commit()
         
-        cursor.execute('SELECT bot_username FROM telegram_config WHERE id = 1')
-        config = cursor.fetchone()
-        bot_username = config[0] if config and config[0] else 'your_bot'
+        bot_username = get_config(cursor).get('bot_username') or 'your_bot'
         
         invite_link = f'https://t.me/{bot_username}?start={invite_code}'
         
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': user_id,
                 'code': invite_code,
                 'invite_link': invite_link,
@@ -115,7 +113,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user_id is required'}),
+                'body': dumps({'error': 'user_id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -124,7 +122,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'User not found'}),
+                'body': dumps({'error': 'User not found'}),
                 'isBase64Encoded': False
             }
 
@@ -138,16 +136,14 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
         ''', (invite_code, user_id))
         conn.commit()
 
-        cursor.execute('SELECT bot_username FROM telegram_config WHERE id = 1')
-        config = cursor.fetchone()
-        bot_username = config[0] if config and config[0] else 'your_bot'
+        bot_username = get_config(cursor).get('bot_username') or 'your_bot'
         
         invite_link = f'https://t.me/{bot_username}?start={invite_code}'
 
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': user_id,
                 'code': invite_code,
                 'invite_link': invite_link
@@ -174,7 +170,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
                 'code': user['invite_code'],
                 'created_by': user['id'],
                 'creator_name': user['full_name'],
-                'created_at': user['invite_created_at'].isoformat() if user['invite_created_at'] else None,
+                'created_at': user['invite_created_at'],
                 'is_used': user['invite_used_at'] is not None,
                 'current_uses': 1 if user['invite_used_at'] else 0,
                 'max_uses': 1
@@ -183,7 +179,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'invites': invites}),
+            'body': dumps({'invites': invites}),
             'isBase64Encoded': False
         }
 
@@ -195,7 +191,7 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user id is required'}),
+                'body': dumps({'error': 'user id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -211,13 +207,13 @@ def handle_invites(method: str, event: dict, cursor, conn, cors_headers: dict) -
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Invite deleted'}),
+            'body': dumps({'message': 'Invite deleted'}),
             'isBase64Encoded': False
         }
 
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
+        'body': dumps({'error': 'Method not allowed'}),
         'isBase64Encoded': False
     }
@@ -0,0 +1,214 @@
+import json
+import base64
+from typing import Dict, Any, List, Tuple
+from pg_json import JsonFields, json_object_sql
+from serializer import dumps
+
+MAX_LIMIT = 500
+
+# Подставляется в SQL для получения курсора последней строки страницы (base64url без '=')
+CURSOR_SQL = "rtrim(translate(encode(convert_to(json_build_array({sort}, t.id)::text, 'UTF8'), 'base64'), E'+/\\n', '-_'), '=')"
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    '''Кодирует позицию последней строки страницы в курсор для ?cursor='''
+    return base64.urlsafe_b64encode(dumps([sort_value, row_id]).encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    '''Раскодирует курсор в пару [значение сортировки, id]'''
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')).decode('utf-8'))
+    except Exception:
+        raise ValueError('Некорректный cursor')
+    if not isinstance(value, list) or len(value) != 2:
+        raise ValueError('Некорректный cursor')
+    return value
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'Ожидается true или false, получено: {value}')
+
+
+def parse_list_params(params: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Разбирает параметры списка: limit, cursor, sort, fields и фильтры из spec['filters']
+    Args: params - queryStringParameters
+          spec - описание ресурса (table, collection, fields, sort, filters, default_sort)
+    Returns: dict с проверенными параметрами; при ошибке бросает ValueError с текстом для 400
+    '''
+    fields: JsonFields = spec['fields']
+    if params.get('fields'):
+        requested = [f.strip() for f in params['fields'].split(',') if f.strip()]
+        known = dict(fields)
+        unknown = [f for f in requested if f not in known]
+        if unknown:
+            raise ValueError(f'Неизвестные поля: {", ".join(unknown)}')
+        fields = [(f, known[f]) for f in requested]
+
+    sort = params.get('sort') or spec['default_sort']
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in spec['sort']:
+        raise ValueError(f'Сортировка по полю {sort_key} не поддерживается')
+
+    limit = None
+    if params.get('limit'):
+        try:
+            limit = int(params['limit'])
+        except ValueError:
+            raise ValueError('limit должен быть числом')
+        if limit < 1:
+            raise ValueError('limit должен быть больше 0')
+        limit = min(limit, MAX_LIMIT)
+
+    filters: List[Tuple[str, Any]] = []
+    for param, (column, kind) in spec['filters'].items():
+        raw = params.get(param)
+        if raw is None or raw == '':
+            continue
+        if kind == 'bool':
+            filters.append((column, _parse_bool(raw)))
+        else:
+            try:
+                filters.append((column, int(raw)))
+            except ValueError:
+                raise ValueError(f'{param} должен быть числом')
+
+    return {
+        'fields': fields,
+        'sort_column': spec['sort'][sort_key],
+        'descending': descending,
+        'limit': limit,
+        'cursor': decode_cursor(params['cursor']) if params.get('cursor') else None,
+        'filters': filters
+    }
+
+
+def keyset_condition(sort_column: str, id_column: str, descending: bool, cursor: List[Any]) -> Tuple[str, List[Any]]:
+    '''
+    Условие «строки после курсора» для ORDER BY sort_column, id_column в одном направлении
+    Колонка сортировки может быть NULL: в Postgres NULL идут последними при ASC и первыми при DESC,
+    а сравнение (sort, id) < (NULL, id) даёт NULL - без явной ветки для NULL обход страниц обрывался бы
+    '''
+    value, row_id = cursor
+    operator = '<' if descending else '>'
+    if value is None:
+        condition = f'{sort_column} IS NULL AND {id_column} {operator} %s'
+        if descending:
+            condition += f' OR {sort_column} IS NOT NULL'
+        return f'({condition})', [row_id]
+
+    condition = f'({sort_column}, {id_column}) {operator} (%s, %s)'
+    if not descending:
+        condition += f' OR {sort_column} IS NULL'
+    return f'({condition})', [value, row_id]
+
+
+def _filter_conditions(query: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    return [f'{column} = %s' for column, _ in query['filters']], [value for _, value in query['filters']]
+
+
+def _where_and_order(query: Dict[str, Any]) -> Tuple[str, str, List[Any]]:
+    conditions, values = _filter_conditions(query)
+
+    if query['cursor'] is not None:
+        condition, cursor_values = keyset_condition(query['sort_column'], 't.id', query['descending'], query['cursor'])
+        conditions.append(condition)
+        values.extend(cursor_values)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    direction = 'DESC' if query['descending'] else 'ASC'
+    order = f"{query['sort_column']} {direction}, t.id {direction}"
+    return where, order, values
+
+
+def _total_sql(spec: Dict[str, Any], query: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    '''Число всех строк под фильтрами (без курсора) - поле total при постраничном запросе'''
+    conditions, values = _filter_conditions(query)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"SELECT count(*) FROM {spec['table']} t {where}", values
+
+
+def fetch_list(cursor, spec: Dict[str, Any], query: Dict[str, Any]) -> str:
+    '''
+    Выполняет запрос страницы и возвращает тело ответа {"<collection>": [...], "count": N, "total": M[, "nextCursor": ...]}
+    count - строк на странице, total - всех строк под фильтрами (как и без пагинации)
+    Строки собираются в dict по именам полей, сериализация - через serializer.dumps
+    '''
+    where, order, values = _where_and_order(query)
+    limit_sql = f"LIMIT {query['limit'] + 1}" if query['limit'] else ''
+    columns = ', '.join(expr for _, expr in query['fields'])
+
+    cursor.execute(f'''
+        SELECT {query['sort_column']}, t.id, {columns}
+        FROM {spec['table']} t
+        {where}
+        ORDER BY {order}
+        {limit_sql}
+    ''', values)
+    rows = cursor.fetchall()
+
+    keys = [key for key, _ in query['fields']]
+    page = rows[:query['limit']] if query['limit'] else rows
+    result: Dict[str, Any] = {
+        spec['collection']: [dict(zip(keys, row[2:])) for row in page],
+        'count': len(page),
+        'total': len(page)
+    }
+    if query['limit']:
+        total_sql, total_values = _total_sql(spec, query)
+        cursor.execute(total_sql, total_values)
+        result['total'] = cursor.fetchone()[0]
+        result['nextCursor'] = encode_cursor(page[-1][0], page[-1][1]) if len(rows) > query['limit'] else None
+    return dumps(result)
+
+
+def fetch_list_json(cursor, spec: Dict[str, Any], query: Dict[str, Any]) -> str:
+    '''
+    То же, что fetch_list, но документ целиком собирает Postgres (json_build_object/json_agg),
+    а Python возвращает готовый текст без разбора строк
+    '''
+    where, order, values = _where_and_order(query)
+    doc = json_object_sql(query['fields'])
+
+    if not query['limit']:
+        cursor.execute(f'''
+            SELECT json_build_object(
+                '{spec['collection']}', COALESCE(json_agg(p.doc ORDER BY p.rn), '[]'::json),
+                'count', count(*),
+                'total', count(*)
+            )::text
+            FROM (
+                SELECT {doc} AS doc, row_number() OVER (ORDER BY {order}) AS rn
+                FROM {spec['table']} t
+                {where}
+            ) p
+        ''', values)
+        return cursor.fetchone()[0]
+
+    limit = query['limit']
+    total_sql, total_values = _total_sql(spec, query)
+    cursor.execute(f'''
+        SELECT json_build_object(
+            '{spec['collection']}', COALESCE(json_agg(p.doc ORDER BY p.rn) FILTER (WHERE p.rn <= {limit}), '[]'::json),
+            'count', count(*) FILTER (WHERE p.rn <= {limit}),
+            'total', ({total_sql}),
+            'nextCursor', CASE WHEN count(*) > {limit} THEN max(p.cursor) FILTER (WHERE p.rn = {limit}) END
+        )::text
+        FROM (
+            SELECT {doc} AS doc,
+                   row_number() OVER (ORDER BY {order}) AS rn,
+                   {CURSOR_SQL.format(sort=query['sort_column'])} AS cursor
+            FROM {spec['table']} t
+            {where}
+            ORDER BY {order}
+            LIMIT {limit + 1}
+        ) p
+    ''', total_values + values)
+    return cursor.fetchone()[0]
@@ -0,0 +1,122 @@
+import re
+from html import escape
+from typing import Dict, Any, List, Tuple, Optional
+
+# Переменные, которые код передаёт в send_notification для каждого события.
+# Для событий вне этого списка проверяется только синтаксис шаблона
+EVENT_VARIABLES: Dict[str, Tuple[str, ...]] = {
+    'order_created': ('order_id', 'prefix', 'route_number'),
+    'order_assigned': ('order_id', 'driver_name', 'route_from', 'route_to'),
+    'order_completed': ('order_id', 'status'),
+    'contract_created': ('contract_id',),
+    'driver_assigned': ('driver_name', 'order_id'),
+    'delay_detected': ('order_id', 'delay_time'),
+}
+
+# Переменные заголовка дайджеста (telegram_settings.digest_text)
+DIGEST_VARIABLES = ('count',)
+
+# {{ и }} - буквальные фигурные скобки, {name} - переменная, одиночные скобки - ошибка
+TOKEN_RE = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+
+NAME_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    '''
+    Разобранный шаблон notification_text: чередование текста и имён переменных
+    Рендер - один проход по частям без повторного разбора строки
+    '''
+
+    def __init__(self, parts: List[Tuple[bool, str]]):
+        # (True, имя переменной) или (False, буквальный текст)
+        self.parts = parts
+        self.variables = frozenset(value for is_var, value in parts if is_var)
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        '''Подставляет значения с HTML-экранированием; отсутствующая переменная остаётся как {name}'''
+        out = []
+        for is_var, value in self.parts:
+            if not is_var:
+                out.append(value)
+            elif value in variables and variables[value] is not None:
+                out.append(escape(str(variables[value]), quote=False))
+            else:
+                out.append('{' + value + '}')
+        return ''.join(out)
+
+
+def compile_template(
+    text: str,
+    event_type: Optional[str] = None,
+    allowed: Optional[Tuple[str, ...]] = None
+) -> CompiledTemplate:
+    '''
+    Разбирает и проверяет шаблон уведомления
+    Args: text - notification_text; event_type - для проверки имён переменных по EVENT_VARIABLES
+          allowed - явный список допустимых переменных вместо EVENT_VARIABLES
+    Returns: CompiledTemplate
+    Raises: TemplateError с описанием первой ошибки
+    '''
+    known = allowed if allowed is not None else EVENT_VARIABLES.get(event_type)
+    parts: List[Tuple[bool, str]] = []
+    literal: List[str] = []
+    position = 0
+
+    for match in TOKEN_RE.finditer(text or ''):
+        literal.append(text[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+
+        if token in ('{{', '}}'):
+            literal.append(token[0])
+            continue
+        if match.group(1) is None:
+            raise TemplateError(f'Непарная скобка «{token}» в позиции {match.start() + 1}')
+
+        name = match.group(1).strip()
+        if not NAME_RE.match(name):
+            raise TemplateError(f'Недопустимое имя переменной «{{{match.group(1)}}}»')
+        if known is not None and name not in known:
+            raise TemplateError(
+                f"Неизвестная переменная {{{name}}}. Доступны: {', '.join('{' + v + '}' for v in known)}"
+            )
+
+        if literal:
+            parts.append((False, ''.join(literal)))
+            literal = []
+        parts.append((True, name))
+
+    literal.append((text or '')[position:])
+    tail = ''.join(literal)
+    if tail:
+        parts.append((False, tail))
+
+    return CompiledTemplate(parts)
+
+
+# Скомпилированные шаблоны на время жизни тёплого инстанса: event_type -> (updated_at, шаблон)
+_cache: Dict[str, Tuple[Any, CompiledTemplate]] = {}
+
+
+def get_template(event_type: str, text: str, updated_at: Any) -> CompiledTemplate:
+    '''
+    Скомпилированный шаблон из кэша; перекомпилируется только при смене updated_at строки telegram_settings
+    Имена переменных здесь не проверяются (это делается при сохранении), шаблон с битым
+    синтаксисом, сохранённый до появления проверки, отправляется как есть
+    '''
+    cached = _cache.get(event_type)
+    if cached and cached[0] == updated_at:
+        return cached[1]
+
+    try:
+        template = compile_template(text)
+    except TemplateError:
+        template = CompiledTemplate([(False, text or '')])
+
+    _cache[event_type] = (updated_at, template)
+    return template
@@ -1,6 +1,7 @@
 import json
-from typing import Dict, Any
-from telegram_notifications import send_notification
+from typing import Dict, Any, List
+from telegram_notifications import QUEUED, send_notification, flush_digests
+from serializer import dumps
 
 
 def handle_orders(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
@@ -28,7 +29,7 @@ def handle_orders(method: str, event: Dict[str, Any], cursor, conn, cors_headers
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'id обязателен для обновления'}),
+                'body': dumps({'error': 'id обязателен для обновления'}),
                 'isBase64Encoded': False
             }
         return update_order(order_id, event, cursor, conn, cors_headers)
@@ -38,7 +39,7 @@ def handle_orders(method: str, event: Dict[str, Any], cursor, conn, cors_headers
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'id обязателен для удаления'}),
+                'body': dumps({'error': 'id обязателен для удаления'}),
                 'isBase64Encoded': False
             }
         return delete_order(order_id, cursor, conn, cors_headers)
@@ -46,7 +47,7 @@ def handle_orders(method: str, event: Dict[str, Any], cursor, conn, cors_headers
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
+        'body': dumps({'error': 'Method not allowed'}),
         'isBase64Encoded': False
     }
 
@@ -66,14 +67,14 @@ def get_all_orders(cursor, cors_headers: Dict[str, str]) -> Dict[str, Any]:
         order = {
             'id': row[0],
             'prefix': row[1],
-            'orderDate': row[2].isoformat() if row[2] else None,
+            'orderDate': row[2],
             'routeNumber': row[3],
             'invoice': row[4],
             'trak': row[5],
-            'weight': float(row[6]) if row[6] else None,
+            'weight': row[6],
             'fullRoute': row[7],
-            'createdAt': row[8].isoformat() if row[8] else None,
-            'updatedAt': row[9].isoformat() if row[9] else None,
+            'createdAt': row[8],
+            'updatedAt': row[9],
         }
         
         cursor.execute('''
@@ -108,7 +109,7 @@ def get_all_orders(cursor, cors_headers: Dict[str, str]) -> Dict[str, Any]:
                 'to': r[2],
                 'vehicleId': r[3],
                 'driverName': r[4],
-                'loadingDate': r[5].isoformat() if r[5] else None,
+                'loadingDate': r[5],
                 'position': r[6]
             }
             
@@ -137,7 +138,7 @@ def get_all_orders(cursor, cors_headers: Dict[str, str]) -> Dict[str, Any]:
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps({'orders': orders, 'total': len(orders)}),
+        'body': dumps({'orders': orders, 'total': len(orders)}),
         'isBase64Encoded': False
     }
 
@@ -157,21 +158,21 @@ def get_order_by_id(cursor, order_id: str, cors_headers: Dict[str, str]) -> Dict
         return {
             'statusCode': 404,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Заказ не найден'}),
+            'body': dumps({'error': 'Заказ не найден'}),
             'isBase64Encoded': False
         }
     
     order = {
         'id': row[0],
         'prefix': row[1],
-        'orderDate': row[2].isoformat() if row[2] else None,
+        'orderDate': row[2],
         'routeNumber': row[3],
         'invoice': row[4],
         'trak': row[5],
-        'weight': float(row[6]) if row[6] else None,
+        'weight': row[6],
         'fullRoute': row[7],
-        'createdAt': row[8].isoformat() if row[8] else None,
-        'updatedAt': row[9].isoformat() if row[9] else None,
+        'createdAt': row[8],
+        'updatedAt': row[9],
     }
     
     cursor.execute('''
@@ -206,7 +207,7 @@ def get_order_by_id(cursor, order_id: str, cors_headers: Dict[str, str]) -> Dict
             'to': r[2],
             'vehicleId': r[3],
             'driverName': r[4],
-            'loadingDate': r[5].isoformat() if r[5] else None,
+            'loadingDate': r[5],
             'position': r[6]
         }
         
@@ -234,11 +235,98 @@ def get_order_by_id(cursor, order_id: str, cors_headers: Dict[str, str]) -> Dict
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps(order),
+        'body': dumps(order),
         'isBase64Encoded': False
     }
 
 
+def fetch_orders_by_ids(cursor, order_ids: List[int]) -> List[Dict[str, Any]]:
+    '''Загрузить заказы с грузополучателями, маршрутами и остановками тремя запросами по ANY(ids)'''
+    if not order_ids:
+        return []
+    
+    cursor.execute('''
+        SELECT 
+            id, prefix, order_date, route_number, invoice, 
+            trak, weight, full_route, created_at, updated_at
+        FROM orders
+        WHERE id = ANY(%s)
+    ''', (list(order_ids),))
+    
+    orders = {}
+    for row in cursor.fetchall():
+        orders[row[0]] = {
+            'id': row[0],
+            'prefix': row[1],
+            'orderDate': row[2],
+            'routeNumber': row[3],
+            'invoice': row[4],
+            'trak': row[5],
+            'weight': row[6],
+            'fullRoute': row[7],
+            'createdAt': row[8],
+            'updatedAt': row[9],
+            'consignees': [],
+            'routes': []
+        }
+    
+    if not orders:
+        return []
+    
+    cursor.execute('''
+        SELECT id, contractor_id, name, note, position, order_id
+        FROM order_consignees
+        WHERE order_id = ANY(%s)
+        ORDER BY order_id, position
+    ''', (list(orders),))
+    for c in cursor.fetchall():
+        orders[c[5]]['consignees'].append({
+            'id': c[0],
+            'contractorId': c[1],
+            'name': c[2],
+            'note': c[3],
+            'position': c[4]
+        })
+    
+    cursor.execute('''
+        SELECT 
+            r.id, r.from_address, r.to_address, r.vehicle_id, r.driver_name, r.loading_date, r.position, r.order_id,
+            s.id, s.stop_type, s.address, s.note, s.position
+        FROM order_routes r
+        LEFT JOIN route_stops s ON s.route_id = r.id
+        WHERE r.order_id = ANY(%s)
+        ORDER BY r.order_id, r.position, s.position
+    ''', (list(orders),))
+    
+    routes = {}
+    for r in cursor.fetchall():
+        route = routes.get(r[0])
+        if route is None:
+            route = {
+                'id': r[0],
+                'from': r[1],
+                'to': r[2],
+                'vehicleId': r[3],
+                'driverName': r[4],
+                'loadingDate': r[5],
+                'position': r[6],
+                'additionalStops': []
+            }
+            routes[r[0]] = route
+            orders[r[7]]['routes'].append(route)
+        
+        if r[8] is not None:
+            route['additionalStops'].append({
+                'id': r[8],
+                'type': r[9],
+                'address': r[10],
+                'note': r[11],
+                'position': r[12]
+            })
+    
+    return list(orders.values())
+
+
 def create_order(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
     '''Создать новый заказ'''
     try:
@@ -287,7 +375,7 @@ def create_order(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, st
         conn.commit()
         
         try:
-            send_notification(
+            result = send_notification(
                 cursor,
                 'order_created',
                 {
@@ -296,16 +384,22 @@ def create_order(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, st
                     'route_number': data.get('routeNumber', '')
                 }
             )
+            conn.commit()
+            # Очередь дайджестов разбирается только если уведомление в неё попало: без окна дайджеста
+            # запись заказа не ждёт лишнего SKIP LOCKED запроса и обращений к Telegram
+            if result == QUEUED:
+                flush_digests(cursor)
         except Exception as e:
+            conn.rollback()
             print(f'Ошибка отправки уведомления: {e}')
         
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': order_id,
                 'message': 'Заказ успешно создан',
-                'createdAt': created_at.isoformat()
+                'createdAt': created_at
             }),
             'isBase64Encoded': False
         }
@@ -315,7 +409,7 @@ def create_order(event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, st
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': str(e)}),
+            'body': dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
 
@@ -345,7 +439,7 @@ def update_order(order_id: str, event: Dict[str, Any], cursor, conn, cors_header
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заказ не найден'}),
+                'body': dumps({'error': 'Заказ не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -354,7 +448,7 @@ def update_order(order_id: str, event: Dict[str, Any], cursor, conn, cors_header
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Заказ обновлён'}),
+            'body': dumps({'message': 'Заказ обновлён'}),
             'isBase64Encoded': False
         }
         
@@ -363,7 +457,7 @@ def update_order(order_id: str, event: Dict[str, Any], cursor, conn, cors_header
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': str(e)}),
+            'body': dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
 
@@ -385,7 +479,7 @@ def delete_order(order_id: str, cursor, conn, cors_headers: Dict[str, str]) -> D
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заказ не найден'}),
+                'body': dumps({'error': 'Заказ не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -394,7 +488,7 @@ def delete_order(order_id: str, cursor, conn, cors_headers: Dict[str, str]) -> D
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Заказ удалён'}),
+            'body': dumps({'message': 'Заказ удалён'}),
             'isBase64Encoded': False
         }
     
@@ -403,7 +497,7 @@ def delete_order(order_id: str, cursor, conn, cors_headers: Dict[str, str]) -> D
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': str(e)}),
+            'body': dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
 
@@ -413,7 +507,7 @@ def notify_order_saved(event: Dict[str, Any], cursor, conn, cors_headers: Dict[s
     try:
         data = json.loads(event.get('body', '{}'))
         
-        send_notification(
+        result = send_notification(
             cursor,
             'order_created',
             {
@@ -422,18 +516,21 @@ def notify_order_saved(event: Dict[str, Any], cursor, conn, cors_headers: Dict[s
                 'route_number': data.get('routeNumber', '')
             }
         )
+        conn.commit()
+        if result == QUEUED:
+            flush_digests(cursor)
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Уведомление отправлено'}),
+            'body': dumps({'message': 'Уведомление отправлено'}),
             'isBase64Encoded': False
         }
     except Exception as e:
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'ok', 'error': str(e)}),
+            'body': dumps({'message': 'ok', 'error': str(e)}),
             'isBase64Encoded': False
         }
 
@@ -443,7 +540,7 @@ def notify_route_saved(event: Dict[str, Any], cursor, conn, cors_headers: Dict[s
     try:
         data = json.loads(event.get('body', '{}'))
         
-        send_notification(
+        result = send_notification(
             cursor,
             'order_assigned',
             {
@@ -453,18 +550,21 @@ def notify_route_saved(event: Dict[str, Any], cursor, conn, cors_headers: Dict[s
                 'route_to': data.get('to', '')
             }
         )
+        conn.commit()
+        if result == QUEUED:
+            flush_digests(cursor)
         
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Уведомление отправлено'}),
+            'body': dumps({'message': 'Уведомление отправлено'}),
             'isBase64Encoded': False
         }
     except Exception as e:
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'ok', 'error': str(e)}),
+            'body': dumps({'message': 'ok', 'error': str(e)}),
             'isBase64Encoded': False
         }
         
@@ -473,6 +573,6 @@ def notify_route_saved(event: Dict[str, Any], cursor, conn, cors_headers: Dict[s
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': str(e)}),
+            'body': dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
\ No newline at end of file
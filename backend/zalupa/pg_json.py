@@ -0,0 +1,23 @@
+import os
+from typing import Dict, Any, List, Tuple
+
+# Поле ответа: (camelCase ключ, SQL-выражение относительно алиаса t)
+JsonFields = List[Tuple[str, str]]
+
+
+def use_pg_json(params: Dict[str, Any]) -> bool:
+    '''
+    Включён ли режим сборки JSON на стороне Postgres
+    Включается параметром ?render=db или переменной окружения PG_JSON_RENDER=1,
+    ?render=python принудительно возвращает сборку в Python
+    '''
+    render = params.get('render')
+    if render:
+        return render == 'db'
+    return os.environ.get('PG_JSON_RENDER', '').lower() in ('1', 'true', 'yes')
+
+
+def json_object_sql(fields: JsonFields) -> str:
+    '''Собирает выражение json_build_object('key', expr, ...) для списка полей'''
+    return 'json_build_object(' + ', '.join(f"'{key}', {expr}" for key, expr in fields) + ')'
+
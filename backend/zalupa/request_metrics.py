@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+from psycopg2.extensions import connection as base_connection, cursor as base_cursor
+
+# Сколько самых медленных запросов попадает в лог запроса
+SLOWEST_QUERIES = 3
+
+# Длина текста запроса в логе (параметры не логируются)
+STATEMENT_PREVIEW = 200
+
+# SLOW_QUERY_MS=<порог> - режим диагностики: запросы дольше порога сохраняются в slow_query_log (slow_queries.py)
+SLOW_QUERY_MS = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None
+
+# Не больше стольких медленных запросов сохраняется за один вызов handler
+MAX_SLOW_PER_REQUEST = 20
+
+# SERVER_TIMING=1 - добавлять заголовок Server-Timing к ответам (видно во вкладке Network браузера)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_current: ContextVar[Optional['RequestMetrics']] = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    '''
+    Замеры одного вызова handler: фазы (connect, handler, serialization, http),
+    число и суммарное время SQL-запросов, строки и самые медленные запросы
+    Фазы могут вкладываться: handler включает время SQL, serialization и http внутри него
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.query_ms = 0.0
+        self.rows = 0
+        self.slowest: List[Dict[str, Any]] = []
+        # Запросы дольше SLOW_QUERY_MS вместе с параметрами - для slow_queries.record_slow_queries
+        self.slow: List[Dict[str, Any]] = []
+        # primary или replica (DATABASE_URL_REPLICA, см. db_routing.py)
+        self.database = 'primary'
+
+    def add_phase(self, name: str, ms: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def add_query(self, statement: Any, ms: float, rowcount: int, vars: Any = None) -> None:
+        self.queries += 1
+        self.query_ms += ms
+        if rowcount > 0:
+            self.rows += rowcount
+        if SLOW_QUERY_MS is not None and ms >= SLOW_QUERY_MS and len(self.slow) < MAX_SLOW_PER_REQUEST:
+            self.slow.append({'statement': statement, 'vars': vars, 'ms': ms, 'rows': rowcount})
+        if len(self.slowest) < SLOWEST_QUERIES or ms > self.slowest[-1]['ms']:
+            if isinstance(statement, bytes):
+                statement = statement.decode('utf-8', 'replace')
+            elif not isinstance(statement, str):
+                # psycopg2.sql.Composed и т.п. - без соединения as_string недоступен
+                statement = repr(statement)
+            preview = _WHITESPACE_RE.sub(' ', statement).strip()[:STATEMENT_PREVIEW]
+            self.slowest.append({'ms': round(ms, 2), 'sql': preview})
+            self.slowest.sort(key=lambda q: -q['ms'])
+            del self.slowest[SLOWEST_QUERIES:]
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        '''Значение заголовка Server-Timing: фазы, db и total в миллисекундах'''
+        entries = [f'{name};dur={ms:.1f}' for name, ms in self.phases.items()]
+        entries.append(f'db;dur={self.query_ms:.1f};desc="{self.queries} queries"')
+        entries.append(f'total;dur={self.total_ms():.1f}')
+        return ', '.join(entries)
+
+
+def start_request() -> RequestMetrics:
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    '''Добавляет время блока к фазе текущего запроса; вне handler ничего не делает'''
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, (time.perf_counter() - started) * 1000)
+
+
+class _TimedCursorMixin:
+    '''Засекает execute/executemany/copy_expert и передаёт замер в RequestMetrics соединения'''
+
+    def _timed(self, statement, vars, call, *args):
+        metrics = self.connection.metrics
+        if metrics is None:
+            return call(*args)
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            metrics.add_query(statement, (time.perf_counter() - started) * 1000, self.rowcount, vars)
+
+    def execute(self, query, vars=None):
+        return self._timed(query, vars, super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(query, None, super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(sql, None, super().copy_expert, sql, file, size)
+
+
+_timed_factories: Dict[type, type] = {}
+
+
+def _timed_factory(factory: type) -> type:
+    timed = _timed_factories.get(factory)
+    if timed is None:
+        timed = type(f'Timed{factory.__name__}', (_TimedCursorMixin, factory), {})
+        _timed_factories[factory] = timed
+    return timed
+
+
+class InstrumentedConnection(base_connection):
+    '''
+    Соединение, все курсоры которого (в том числе с cursor_factory=RealDictCursor) учитываются в metrics
+    Использование: psycopg2.connect(dsn, connection_factory=InstrumentedConnection)
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = _current.get()
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or base_cursor
+        kwargs['cursor_factory'] = _timed_factory(factory)
+        return super().cursor(*args, **kwargs)
+
+
+def finish_request(
+    metrics: RequestMetrics,
+    event: Dict[str, Any],
+    context: Any,
+    result: Dict[str, Any]
+) -> Dict[str, Any]:
+    '''
+    Пишет структурированную строку лога о запросе и при SERVER_TIMING добавляет заголовок к ответу
+    Returns: result (с дополненными заголовками)
+    '''
+    params = event.get('queryStringParameters') or {}
+    body = result.get('body') or ''
+    record = {
+        'type': 'request',
+        'request_id': getattr(context, 'request_id', None),
+        'method': event.get('httpMethod', 'GET'),
+        'resource': params.get('resource'),
+        'action': params.get('action'),
+        'status': result.get('statusCode'),
+        'duration_ms': round(metrics.total_ms(), 2),
+        'phases': {name: round(ms, 2) for name, ms in metrics.phases.items()},
+        'db': {
+            'database': metrics.database,
+            'queries': metrics.queries,
+            'time_ms': round(metrics.query_ms, 2),
+            'rows': metrics.rows,
+            'slowest': metrics.slowest,
+            'slow': len(metrics.slow)
+        },
+        'bytes': len(body.encode('utf-8')) if isinstance(body, str) else len(body)
+    }
+    print(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+    _current.set(None)
+
+    if SERVER_TIMING:
+        result['headers'] = {
+            **result.get('headers', {}),
+            'Server-Timing': metrics.server_timing(),
+            'Timing-Allow-Origin': '*'
+        }
+    return result
@@ -2,6 +2,7 @@ import json
 import re
 import hashlib
 from psycopg2.extras import RealDictCursor
+from serializer import dumps
 
 
 def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) -> dict:
@@ -17,7 +18,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'roles': [dict(r) for r in roles]}),
+            'body': dumps({'roles': [dict(r) for r in roles]}),
             'isBase64Encoded': False
         }
 
@@ -31,7 +32,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'display_name is required'}),
+                'body': dumps({'error': 'display_name is required'}),
                 'isBase64Encoded': False
             }
 
@@ -49,7 +50,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({'id': role_id, 'message': 'Role created'}),
+            'body': dumps({'id': role_id, 'message': 'Role created'}),
             'isBase64Encoded': False
         }
 
@@ -61,7 +62,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'role id is required'}),
+                'body': dumps({'error': 'role id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -76,7 +77,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Role not found'}),
+                'body': dumps({'error': 'Role not found'}),
                 'isBase64Encoded': False
             }
 
@@ -84,13 +85,13 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 403,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Cannot modify system role'}),
+                'body': dumps({'error': 'Cannot modify system role'}),
                 'isBase64Encoded': False
             }
 
         if display_name:
             cursor.execute(
-                'UPDATE roles SET display_name = %s, description = %s WHERE id = %s',
+                'UPDATE roles SET display_name = %s, description = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s',
                 (display_name, description, role_id)
             )
 
@@ -99,7 +100,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Role updated'}),
+            'body': dumps({'message': 'Role updated'}),
             'isBase64Encoded': False
         }
 
@@ -111,7 +112,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'role id is required'}),
+                'body': dumps({'error': 'role id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -122,7 +123,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Role not found'}),
+                'body': dumps({'error': 'Role not found'}),
                 'isBase64Encoded': False
             }
 
@@ -130,7 +131,7 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 403,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Cannot delete system role'}),
+                'body': dumps({'error': 'Cannot delete system role'}),
                 'isBase64Encoded': False
             }
 
@@ -142,13 +143,13 @@ def handle_roles(method: str, event: dict, cursor, conn, cors_headers: dict) ->
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Role deleted'}),
+            'body': dumps({'message': 'Role deleted'}),
             'isBase64Encoded': False
         }
 
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
+        'body': dumps({'error': 'Method not allowed'}),
         'isBase64Encoded': False
     }
\ No newline at end of file
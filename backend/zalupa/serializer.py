@@ -0,0 +1,34 @@
+import json
+import base64
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from request_metrics import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    '''Приводит типы, которые возвращает psycopg2, к JSON-совместимым значениям'''
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (memoryview, bytes, bytearray)):
+        return base64.b64encode(obj).decode('utf-8')
+    raise TypeError(f'Type {type(obj)} not serializable')
+
+
+def dumps(data: Any) -> str:
+    '''
+    Сериализует тело ответа в JSON-строку
+    Args: data - dict/list с данными ответа (date, datetime, Decimal, bytea допускаются как есть)
+    Returns: JSON-строка; используется orjson, если он установлен, иначе стандартный json
+    '''
+    with phase('serialization'):
+        if orjson is not None:
+            return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':'))
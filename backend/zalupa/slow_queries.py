@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import random
+import hashlib
+from typing import Dict, Any, Optional
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from serializer import dumps
+
+# Доля медленных запросов, для которых снимается план (EXPLAIN ANALYZE выполняет запрос повторно)
+EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE') or 0.1)
+
+# Ограничение на повторное выполнение запроса ради плана
+EXPLAIN_TIMEOUT_MS = 5000
+
+DEFAULT_DAYS = 7
+
+MAX_LIMIT = 100
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Списки VALUES из execute_values: (?, ?), (?, ?), ... -> (?, ?), ...
+_VALUES_RE = re.compile(r'(\((?:\?|NULL|true|false)(?:, ?(?:\?|NULL|true|false))*\))(?:, ?\((?:\?|NULL|true|false)(?:, ?(?:\?|NULL|true|false))*\))+')
+_WRITE_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|COPY|TRUNCATE)\b|\bFOR\s+(UPDATE|SHARE|NO KEY UPDATE)\b', re.IGNORECASE)
+
+
+def normalize_statement(statement: Any) -> Optional[str]:
+    '''Текст запроса без литералов: строки и числа заменяются на ?, списки VALUES сворачиваются'''
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    if not isinstance(statement, str):
+        return None
+    text = _WHITESPACE_RE.sub(' ', statement).strip()
+    text = _STRING_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    return _VALUES_RE.sub(r'\1, ...', text)
+
+
+def params_shape(vars: Any) -> Any:
+    '''Типы параметров без значений: ["int", "str", "list[25]"] или {"name": "str"}'''
+    def shape(value: Any) -> str:
+        if value is None:
+            return 'null'
+        if isinstance(value, (list, tuple)):
+            return f'list[{len(value)}]'
+        return type(value).__name__
+
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return {key: shape(value) for key, value in vars.items()}
+    return [shape(value) for value in vars]
+
+
+def _explain(cursor, statement: Any, vars: Any) -> Optional[str]:
+    '''План запроса: EXPLAIN (ANALYZE, BUFFERS) для чтения, простой EXPLAIN для изменяющих запросов'''
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8')
+    if not isinstance(statement, str) or 'COPY' in statement.upper()[:10]:
+        return None
+    prefix = 'EXPLAIN ' if _WRITE_RE.search(statement) else 'EXPLAIN (ANALYZE, BUFFERS) '
+    cursor.execute(f'SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}')
+    cursor.execute(prefix + statement, vars)
+    return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def record_slow_queries(conn, metrics, resource: str, method: str, log_db_url: Optional[str] = None) -> None:
+    '''
+    Сохраняет медленные запросы текущего вызова в slow_query_log, часть - с планом
+    Вызывается после обработчика: незакоммиченное им уже не нужно, транзакция откатывается
+    Планы снимаются на conn, записи пишутся через отдельное соединение к log_db_url
+    (основная база, если conn открыт к реплике), иначе в conn
+    Ошибки диагностики, включая недоступность основной базы, не влияют на ответ и только печатаются
+    '''
+    # Собственные запросы диагностики не должны попасть в замеры
+    conn.metrics = None
+    log_conn = None
+    cursor = conn.cursor()
+    try:
+        conn.rollback()
+        rows = []
+        for item in metrics.slow:
+            normalized = normalize_statement(item['statement'])
+            if normalized is None:
+                continue
+
+            plan = None
+            if random.random() < EXPLAIN_SAMPLE_RATE:
+                try:
+                    plan = _explain(cursor, item['statement'], item['vars'])
+                except Exception as e:
+                    plan = f'EXPLAIN failed: {e}'
+                conn.rollback()
+
+            shape = params_shape(item['vars'])
+            rows.append((
+                hashlib.md5(normalized.encode('utf-8')).hexdigest(), normalized,
+                json.dumps(shape) if shape is not None else None,
+                resource, method, round(item['ms'], 2), item['rows'], plan
+            ))
+
+        log_conn = psycopg2.connect(log_db_url) if log_db_url else conn
+        with log_conn.cursor() as log_cursor:
+            for row in rows:
+                log_cursor.execute('''
+                    INSERT INTO slow_query_log
+                        (fingerprint, statement, params_shape, resource, method, duration_ms, row_count, plan)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ''', row)
+        log_conn.commit()
+    except Exception as e:
+        conn.rollback()
+        if log_conn is not None and log_conn is not conn:
+            log_conn.rollback()
+        print(f'slow query log failed: {e}')
+    finally:
+        cursor.close()
+        if log_conn is not None and log_conn is not conn:
+            log_conn.close()
+
+
+def handle_diagnostics(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Диагностика для администраторов
+    GET ?resource=diagnostics&action=slow_queries&days=7&limit=20 - медленные запросы,
+        сгруппированные по тексту, в порядке суммарного времени; с последним снятым планом
+    DELETE ?resource=diagnostics&action=slow_queries&days=30 - удалить записи старше days дней
+    '''
+    params = event.get('queryStringParameters') or {}
+    action = params.get('action', 'slow_queries')
+
+    if action != 'slow_queries':
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': f'Неизвестное действие: {action}'}),
+            'isBase64Encoded': False
+        }
+
+    try:
+        days = max(0, int(params.get('days') or DEFAULT_DAYS))
+        limit = max(1, min(int(params.get('limit') or 20), MAX_LIMIT))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'days и limit должны быть числами'}),
+            'isBase64Encoded': False
+        }
+
+    if method == 'GET':
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute('''
+            SELECT l.fingerprint,
+                   min(l.statement) AS statement,
+                   count(*) AS calls,
+                   round(sum(l.duration_ms)::numeric, 1) AS total_ms,
+                   round(avg(l.duration_ms)::numeric, 1) AS avg_ms,
+                   round((percentile_cont(0.95) WITHIN GROUP (ORDER BY l.duration_ms))::numeric, 1) AS p95_ms,
+                   round(max(l.duration_ms)::numeric, 1) AS max_ms,
+                   round(avg(l.row_count)) AS avg_rows,
+                   array_agg(DISTINCT l.resource) AS resources,
+                   max(l.created_at) AS last_seen,
+                   (SELECT s.params_shape FROM slow_query_log s
+                    WHERE s.fingerprint = l.fingerprint
+                    ORDER BY s.created_at DESC LIMIT 1) AS params_shape,
+                   (SELECT s.plan FROM slow_query_log s
+                    WHERE s.fingerprint = l.fingerprint AND s.plan IS NOT NULL
+                    ORDER BY s.created_at DESC LIMIT 1) AS plan
+            FROM slow_query_log l
+            WHERE l.created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
+            GROUP BY l.fingerprint
+            ORDER BY sum(l.duration_ms) DESC
+            LIMIT %s
+        ''', (days, limit))
+
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': dumps({'days': days, 'queries': [dict(row) for row in cursor.fetchall()]}),
+            'isBase64Encoded': False
+        }
+
+    if method == 'DELETE':
+        cursor.execute(
+            'DELETE FROM slow_query_log WHERE created_at < CURRENT_TIMESTAMP - make_interval(days => %s)',
+            (days,)
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        return {
+            'statusCode': 200,
+            'headers': cors_headers,
+            'body': dumps({'deleted': deleted}),
+            'isBase64Encoded': False
+        }
+
+    return {
+        'statusCode': 405,
+        'headers': cors_headers,
+        'body': dumps({'error': 'Method not allowed'}),
+        'isBase64Encoded': False
+    }
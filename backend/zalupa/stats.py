@@ -0,0 +1,160 @@
+from typing import Dict, Any, List
+from serializer import dumps
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+DEFAULT_TOP = 10
+MAX_TOP = 50
+
+# Сводная таблица -> (ключевые колонки, значения); представление <таблица>_source считает то же с нуля (V0032)
+STATS_TABLES = {
+    'stats_orders_daily': (('day', 'prefix'), ('orders_count', 'weight_total')),
+    'stats_contracts_daily': (('day', 'party', 'contractor_id'), ('contracts_count', 'amount_total')),
+    'stats_routes_daily': (('day',), ('routes_count',))
+}
+
+# Таблицы-источники: на время пересчёта записи в них ждут, чтобы триггеры не разошлись с пересчитанным
+SOURCE_TABLES = ('orders', 'contracts', 'order_routes')
+
+
+def handle_stats(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Показатели дашборда из сводных таблиц: объём чтения зависит от числа дней, а не от числа заказов
+    GET ?resource=stats&days=30&top=10 - заказы и тоннаж по дням, тоннаж по префиксам,
+        топ заказчиков и перевозчиков по сумме договоров за период, маршруты с погрузкой сегодня
+    Нужно право read на contracts и orders (authz.COMPOSITE_RESOURCES)
+    '''
+    if method != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    params = event.get('queryStringParameters') or {}
+    try:
+        days = max(1, min(int(params.get('days') or DEFAULT_DAYS), MAX_DAYS))
+        top = max(1, min(int(params.get('top') or DEFAULT_TOP), MAX_TOP))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'days и top должны быть числами'}),
+            'isBase64Encoded': False
+        }
+
+    cursor.execute('SELECT CURRENT_DATE - %s + 1, CURRENT_DATE', (days,))
+    date_from, date_to = cursor.fetchone()
+
+    cursor.execute('''
+        SELECT day, sum(orders_count), sum(weight_total)
+        FROM stats_orders_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY day
+        HAVING sum(orders_count) > 0
+        ORDER BY day
+    ''', (date_from, date_to))
+    orders_per_day = [{'day': row[0], 'orders': row[1], 'weight': row[2]} for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT prefix, sum(orders_count), sum(weight_total)
+        FROM stats_orders_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY prefix
+        HAVING sum(orders_count) > 0
+        ORDER BY sum(weight_total) DESC, prefix
+    ''', (date_from, date_to))
+    tonnage_by_prefix = [{'prefix': row[0], 'orders': row[1], 'weight': row[2]} for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT t.party, t.contractor_id, c.name, t.contracts, t.amount
+        FROM (
+            SELECT party, contractor_id, sum(contracts_count) AS contracts, sum(amount_total) AS amount,
+                   row_number() OVER (PARTITION BY party ORDER BY sum(amount_total) DESC, contractor_id) AS place
+            FROM stats_contracts_daily
+            WHERE day BETWEEN %s AND %s
+            GROUP BY party, contractor_id
+            HAVING sum(contracts_count) > 0
+        ) t
+        LEFT JOIN contractors c ON c.id = t.contractor_id
+        WHERE t.place <= %s
+        ORDER BY t.party, t.place
+    ''', (date_from, date_to, top))
+    parties: Dict[str, List[Dict[str, Any]]] = {'customer': [], 'carrier': []}
+    for party, contractor_id, name, contracts, amount in cursor.fetchall():
+        parties[party].append({'contractorId': contractor_id, 'name': name, 'contracts': contracts, 'amount': amount})
+
+    cursor.execute('SELECT routes_count FROM stats_routes_daily WHERE day = CURRENT_DATE')
+    row = cursor.fetchone()
+
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({
+            'from': date_from,
+            'to': date_to,
+            'ordersPerDay': orders_per_day,
+            'tonnageByPrefix': tonnage_by_prefix,
+            'contractsByCustomer': parties['customer'],
+            'contractsByCarrier': parties['carrier'],
+            'activeRoutesToday': row[0] if row else 0
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def rebuild_stats(cursor) -> Dict[str, int]:
+    '''
+    Пересчитывает сводные таблицы с нуля по представлениям *_source
+    Returns: {таблица: число расходившихся строк до пересчёта} - ненулевое значение означает, что триггеры где-то ошиблись
+    '''
+    cursor.execute(f"LOCK TABLE {', '.join(SOURCE_TABLES)} IN SHARE MODE")
+
+    mismatches = {}
+    for table, (keys, values) in STATS_TABLES.items():
+        columns = ', '.join(keys + values)
+        # Строки с нулями остаются после удаления всех заказов дня и равносильны отсутствию строки
+        nonzero = ' OR '.join(f'{value} <> 0' for value in values)
+        cursor.execute(f'''
+            SELECT count(*) FROM (
+                (SELECT {columns} FROM {table} WHERE {nonzero}
+                 EXCEPT SELECT {columns} FROM {table}_source)
+                UNION ALL
+                (SELECT {columns} FROM {table}_source
+                 EXCEPT SELECT {columns} FROM {table} WHERE {nonzero})
+            ) d
+        ''')
+        mismatches[table] = cursor.fetchone()[0]
+
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_source')
+    return mismatches
+
+
+def handle_stats_rebuild(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    POST ?resource=diagnostics&action=rebuild_stats - пересчёт сводных таблиц дашборда со сверкой
+    (только с X-Auth-Token = DIAGNOSTICS_TOKEN, см. authz.ADMIN_RESOURCES; можно вызывать по расписанию)
+    '''
+    if method != 'POST':
+        return {
+            'statusCode': 405,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    mismatches = rebuild_stats(cursor)
+    conn.commit()
+
+    if any(mismatches.values()):
+        print(f'stats rebuild fixed mismatches: {mismatches}')
+
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({'mismatches': mismatches}),
+        'isBase64Encoded': False
+    }
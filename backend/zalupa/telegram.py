@@ -1,13 +1,11 @@
 import json
 import requests
 from psycopg2.extras import RealDictCursor
-from datetime import datetime
-
-
-def serialize_datetime(obj):
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+from serializer import dumps
+from telegram_config import get_config, invalidate
+from notification_templates import compile_template, TemplateError, DIGEST_VARIABLES
+from telegram_notifications import flush_digests
+from request_metrics import phase
 
 
 def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict) -> dict:
@@ -34,14 +32,14 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'config': result}),
+                    'body': dumps({'config': result}),
                     'isBase64Encoded': False
                 }
             else:
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'config': None}),
+                    'body': dumps({'config': None}),
                     'isBase64Encoded': False
                 }
 
@@ -54,19 +52,20 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'bot_token and bot_username are required'}),
+                    'body': dumps({'error': 'bot_token and bot_username are required'}),
                     'isBase64Encoded': False
                 }
 
             try:
-                response = requests.get(f'https://api.telegram.org/bot{bot_token}/getMe', timeout=10)
+                with phase('http'):
+                    response = requests.get(f'https://api.telegram.org/bot{bot_token}/getMe', timeout=10)
                 data = response.json()
 
                 if not data.get('ok'):
                     return {
                         'statusCode': 400,
                         'headers': cors_headers,
-                        'body': json.dumps({'error': 'Неверный токен бота'}),
+                        'body': dumps({'error': 'Неверный токен бота'}),
                         'isBase64Encoded': False
                     }
 
@@ -77,7 +76,7 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                     return {
                         'statusCode': 400,
                         'headers': cors_headers,
-                        'body': json.dumps({'error': f'Username не совпадает. Бот: @{actual_username}'}),
+                        'body': dumps({'error': f'Username не совпадает. Бот: @{actual_username}'}),
                         'isBase64Encoded': False
                     }
 
@@ -92,13 +91,15 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                         updated_at = CURRENT_TIMESTAMP
                 ''', (bot_token, bot_username))
                 conn.commit()
+                invalidate()
 
                 webhook_url = 'https://functions.poehali.dev/33cce63d-413a-4ccd-976c-ece47a291bc9'
-                webhook_response = requests.post(
-                    f'https://api.telegram.org/bot{bot_token}/setWebhook',
-                    json={'url': webhook_url},
-                    timeout=10
-                )
+                with phase('http'):
+                    webhook_response = requests.post(
+                        f'https://api.telegram.org/bot{bot_token}/setWebhook',
+                        json={'url': webhook_url},
+                        timeout=10
+                    )
                 webhook_data = webhook_response.json()
                 
                 if not webhook_data.get('ok'):
@@ -107,7 +108,7 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({
+                    'body': dumps({
                         'message': 'Бот успешно подключён',
                         'is_connected': True,
                         'bot_info': bot_info
@@ -119,14 +120,14 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Таймаут при проверке бота'}),
+                    'body': dumps({'error': 'Таймаут при проверке бота'}),
                     'isBase64Encoded': False
                 }
             except Exception as e:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка подключения: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка подключения: {str(e)}'}),
                     'isBase64Encoded': False
                 }
 
@@ -139,36 +140,34 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'admin_telegram_id is required'}),
+                    'body': dumps({'error': 'admin_telegram_id is required'}),
                     'isBase64Encoded': False
                 }
 
-            cursor.execute('SELECT bot_token FROM telegram_config WHERE id = 1')
-            config = cursor.fetchone()
+            bot_token = get_config(cursor).get('bot_token')
 
-            if not config or not config[0]:
+            if not bot_token:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Сначала подключите бота'}),
+                    'body': dumps({'error': 'Сначала подключите бота'}),
                     'isBase64Encoded': False
                 }
 
-            bot_token = config[0]
-
             try:
-                response = requests.get(
-                    f'https://api.telegram.org/bot{bot_token}/getChat',
-                    params={'chat_id': admin_telegram_id},
-                    timeout=10
-                )
+                with phase('http'):
+                    response = requests.get(
+                        f'https://api.telegram.org/bot{bot_token}/getChat',
+                        params={'chat_id': admin_telegram_id},
+                        timeout=10
+                    )
                 data = response.json()
 
                 if not data.get('ok'):
                     return {
                         'statusCode': 400,
                         'headers': cors_headers,
-                        'body': json.dumps({'error': 'Не удалось найти пользователя. Убедитесь, что он запустил бота командой /start'}),
+                        'body': dumps({'error': 'Не удалось найти пользователя. Убедитесь, что он запустил бота командой /start'}),
                         'isBase64Encoded': False
                     }
 
@@ -180,11 +179,12 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                     WHERE id = 1
                 ''', (admin_telegram_id,))
                 conn.commit()
+                invalidate()
 
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({
+                    'body': dumps({
                         'message': 'Админ успешно добавлен',
                         'user_info': {
                             'id': user_info.get('id'),
@@ -199,7 +199,7 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка проверки: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка проверки: {str(e)}'}),
                     'isBase64Encoded': False
                 }
 
@@ -213,14 +213,14 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'settings': [dict(s) for s in settings]}, default=serialize_datetime),
+                    'body': dumps({'settings': [dict(s) for s in settings]}),
                     'isBase64Encoded': False
                 }
             except Exception as e:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Settings fetch error: {str(e)}'}),
+                    'body': dumps({'error': f'Settings fetch error: {str(e)}'}),
                     'isBase64Encoded': False
                 }
 
@@ -231,7 +231,7 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'event_type is required'}),
+                    'body': dumps({'error': 'event_type is required'}),
                     'isBase64Encoded': False
                 }
 
@@ -245,18 +245,53 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 update_values.append(body['is_enabled'])
             
             if 'notification_text' in body:
+                try:
+                    compile_template(body['notification_text'], event_type)
+                except TemplateError as e:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'error': f'Ошибка в шаблоне: {str(e)}'}),
+                        'isBase64Encoded': False
+                    }
                 update_fields.append('notification_text = %s')
                 update_values.append(body['notification_text'])
             
             if 'role_ids' in body:
                 update_fields.append('role_ids = %s')
                 update_values.append(body['role_ids'])
+
+            if 'digest_window_seconds' in body:
+                window = body['digest_window_seconds']
+                if not isinstance(window, int) or isinstance(window, bool) or window < 0:
+                    return {
+                        'statusCode': 400,
+                        'headers': cors_headers,
+                        'body': dumps({'error': 'digest_window_seconds must be a non-negative integer'}),
+                        'isBase64Encoded': False
+                    }
+                update_fields.append('digest_window_seconds = %s')
+                update_values.append(window)
+
+            if 'digest_text' in body:
+                if body['digest_text']:
+                    try:
+                        compile_template(body['digest_text'], allowed=DIGEST_VARIABLES)
+                    except TemplateError as e:
+                        return {
+                            'statusCode': 400,
+                            'headers': cors_headers,
+                            'body': dumps({'error': f'Ошибка в шаблоне дайджеста: {str(e)}'}),
+                            'isBase64Encoded': False
+                        }
+                update_fields.append('digest_text = %s')
+                update_values.append(body['digest_text'] or None)
             
             if not update_fields:
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'No fields to update'}),
+                    'body': dumps({'error': 'No fields to update'}),
                     'isBase64Encoded': False
                 }
             
@@ -270,7 +305,18 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'Setting updated'}),
+                'body': dumps({'message': 'Setting updated'}),
+                'isBase64Encoded': False
+            }
+
+    elif action == 'flush':
+        # Отправка накопленных дайджестов, у которых истекло окно; вызывается по расписанию
+        if method in ('GET', 'POST'):
+            stats = flush_digests(conn.cursor())
+            return {
+                'statusCode': 200,
+                'headers': cors_headers,
+                'body': dumps(stats),
                 'isBase64Encoded': False
             }
 
@@ -296,14 +342,14 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'linked_users': [dict(u) for u in linked_users]}),
+                    'body': dumps({'linked_users': [dict(u) for u in linked_users]}),
                     'isBase64Encoded': False
                 }
             except Exception as e:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка загрузки: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка загрузки: {str(e)}'}),
                     'isBase64Encoded': False
                 }
 
@@ -315,7 +361,7 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'user_id is required'}),
+                    'body': dumps({'error': 'user_id is required'}),
                     'isBase64Encoded': False
                 }
 
@@ -327,27 +373,27 @@ def handle_telegram(method: str, event: dict, cursor, conn, cors_headers: dict)
                     return {
                         'statusCode': 404,
                         'headers': cors_headers,
-                        'body': json.dumps({'error': 'Привязка не найдена'}),
+                        'body': dumps({'error': 'Привязка не найдена'}),
                         'isBase64Encoded': False
                     }
 
                 return {
                     'statusCode': 200,
                     'headers': cors_headers,
-                    'body': json.dumps({'message': 'Пользователь успешно отвязан'}),
+                    'body': dumps({'message': 'Пользователь успешно отвязан'}),
                     'isBase64Encoded': False
                 }
             except Exception as e:
                 return {
                     'statusCode': 500,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка отвязки: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка отвязки: {str(e)}'}),
                     'isBase64Encoded': False
                 }
 
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
+        'body': dumps({'error': 'Method not allowed'}),
         'isBase64Encoded': False
     }
\ No newline at end of file
@@ -1,58 +1,189 @@
+import json
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from telegram_config import get_config
+from notification_templates import get_template
+from request_metrics import phase
+
+MAX_ATTEMPTS = 5
+
+# Сколько событий перечисляется в дайджесте, остальные сворачиваются в «… и ещё N»
+DIGEST_MAX_ITEMS = 10
+
+DEFAULT_DIGEST_TEXT = 'Новых уведомлений: {count}'
+
+# Строка в статусе sending дольше этого интервала считается брошенной упавшим обработчиком
+STALE_INTERVAL = '2 minutes'
+
+# Результаты send_notification
+SENT = 'sent'
+QUEUED = 'queued'
+
+
+def _post_message(bot_token: str, chat_id: int, text: str) -> bool:
+    with phase('http'):
+        response = requests.post(
+            f'https://api.telegram.org/bot{bot_token}/sendMessage',
+            json={
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': 'HTML'
+            },
+            timeout=5
+        )
+    return bool(response.json().get('ok'))
 
 
 def send_notification(
     cursor,
     event_type: str,
     variables: Dict[str, Any]
-) -> bool:
-    '''Отправка уведомления в Telegram для определённого события'''
-    
+) -> Optional[str]:
+    '''
+    Отправка уведомления в Telegram для определённого события
+    Если для события задан digest_window_seconds, уведомление только ставится в очередь
+    в транзакции вызывающего: после conn.commit() обработчик вызывает flush_digests - первое событие
+    в окне уходит сразу, следующие копятся и отправляются одним дайджестом по истечении окна.
+    Без дайджестов (по умолчанию) flush_digests вызывать не нужно: очередь пуста
+    Returns: 'sent', 'queued' (нужен flush_digests после commit) или None, если ничего не отправлено
+    '''
+
+    config = get_config(cursor)
+    if not config.get('is_connected') or not config.get('bot_token') or not config.get('admin_telegram_id'):
+        return None
+
     cursor.execute('''
-        SELECT ts.notification_text, ts.role_ids, tc.bot_token, tc.admin_telegram_id
-        FROM telegram_settings ts
-        CROSS JOIN telegram_config tc
-        WHERE ts.event_type = %s 
-          AND ts.is_enabled = true
-          AND tc.is_connected = true
-          AND tc.id = 1
+        SELECT notification_text, role_ids, updated_at, digest_window_seconds
+        FROM telegram_settings
+        WHERE event_type = %s AND is_enabled = true
     ''', (event_type,))
-    
+
     result = cursor.fetchone()
     if not result:
-        return False
-    
-    notification_text, role_ids, bot_token, admin_telegram_id = result
-    
-    if not bot_token or not admin_telegram_id:
-        return False
-    
-    message = notification_text
-    for key, value in variables.items():
-        message = message.replace(f'{{{key}}}', str(value))
-    
+        return None
+
+    notification_text, role_ids, updated_at, digest_window_seconds = result
+    bot_token = config['bot_token']
+    admin_telegram_id = config['admin_telegram_id']
+
+    message = get_template(event_type, notification_text, updated_at).render(variables)
+
     # Получаем telegram_id пользователей (сейчас отправляем только админу)
     telegram_ids = []
     if admin_telegram_id:
         telegram_ids.append(admin_telegram_id)
-    
+
+    if digest_window_seconds:
+        payload = json.dumps(variables, ensure_ascii=False, default=str)
+        for telegram_id in telegram_ids:
+            cursor.execute('''
+                INSERT INTO telegram_notification_queue (event_type, chat_id, variables, message)
+                VALUES (%s, %s, %s, %s)
+            ''', (event_type, telegram_id, payload, message))
+        return QUEUED if telegram_ids else None
+
     success = False
     for telegram_id in telegram_ids:
         try:
-            response = requests.post(
-                f'https://api.telegram.org/bot{bot_token}/sendMessage',
-                json={
-                    'chat_id': telegram_id,
-                    'text': message,
-                    'parse_mode': 'HTML'
-                },
-                timeout=5
-            )
-            if response.json().get('ok'):
+            if _post_message(bot_token, telegram_id, message):
                 success = True
         except Exception as e:
             print(f'Ошибка отправки в Telegram {telegram_id}: {e}')
             continue
-    
-    return success
\ No newline at end of file
+
+    return SENT if success else None
+
+
+def build_digest(header: str, messages: List[str]) -> str:
+    '''Одно событие отправляется как есть, несколько - заголовком и списком'''
+    if len(messages) == 1:
+        return messages[0]
+    lines = [header] + [f'• {m}' for m in messages[:DIGEST_MAX_ITEMS]]
+    if len(messages) > DIGEST_MAX_ITEMS:
+        lines.append(f'… и ещё {len(messages) - DIGEST_MAX_ITEMS}')
+    return '\n'.join(lines)
+
+
+def flush_digests(cursor) -> Dict[str, int]:
+    '''
+    Отправляет накопленные уведомления получателям, у которых истекло окно дайджеста
+    Не больше одного сообщения на (событие, получатель) за digest_window_seconds;
+    строки забираются через SKIP LOCKED, поэтому параллельные вызовы не отправят их дважды
+    Returns: счётчики отправленных сообщений, вошедших в них событий и ошибок
+    '''
+    conn = cursor.connection
+    config = get_config(cursor)
+    if not config.get('is_connected') or not config.get('bot_token'):
+        return {'messages': 0, 'events': 0, 'failed': 0}
+
+    cursor.execute(f'''
+        UPDATE telegram_notification_queue q
+        SET status = 'sending', claimed_at = CURRENT_TIMESTAMP, attempts = q.attempts + 1
+        WHERE q.id IN (
+            SELECT p.id
+            FROM telegram_notification_queue p
+            JOIN telegram_settings s ON s.event_type = p.event_type
+            WHERE p.chat_id IS NOT NULL
+              AND (p.status = 'pending'
+                   OR (p.status = 'sending' AND p.claimed_at < CURRENT_TIMESTAMP - interval '{STALE_INTERVAL}'))
+              AND NOT EXISTS (
+                  SELECT 1 FROM telegram_notification_queue sent
+                  WHERE sent.event_type = p.event_type
+                    AND sent.chat_id = p.chat_id
+                    AND sent.status = 'sent'
+                    AND sent.sent_at > CURRENT_TIMESTAMP - make_interval(secs => s.digest_window_seconds)
+              )
+            FOR UPDATE OF p SKIP LOCKED
+        )
+        RETURNING q.id, q.event_type, q.chat_id, q.message
+    ''')
+    rows = sorted(cursor.fetchall())
+    conn.commit()
+    if not rows:
+        return {'messages': 0, 'events': 0, 'failed': 0}
+
+    groups: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
+    for queue_id, event_type, chat_id, message in rows:
+        groups.setdefault((event_type, chat_id), []).append((queue_id, message))
+
+    cursor.execute('''
+        SELECT event_type, digest_text, updated_at
+        FROM telegram_settings
+        WHERE event_type = ANY(%s)
+    ''', (list({event_type for event_type, _ in groups}),))
+    digest_settings = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    stats = {'messages': 0, 'events': 0, 'failed': 0}
+    for (event_type, chat_id), items in groups.items():
+        ids = [queue_id for queue_id, _ in items]
+        digest_text, updated_at = digest_settings.get(event_type, (None, None))
+        header = get_template(f'{event_type}:digest', digest_text or DEFAULT_DIGEST_TEXT, updated_at)
+        text = build_digest(header.render({'count': len(items)}), [message for _, message in items])
+
+        error: Optional[str] = None
+        try:
+            if not _post_message(config['bot_token'], chat_id, text):
+                error = 'Telegram API returned ok=false'
+        except Exception as e:
+            error = str(e)
+
+        if error is None:
+            cursor.execute('''
+                UPDATE telegram_notification_queue
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                WHERE id = ANY(%s)
+            ''', (ids,))
+            stats['messages'] += 1
+            stats['events'] += len(ids)
+        else:
+            print(f'Ошибка отправки в Telegram {chat_id}: {error}')
+            cursor.execute('''
+                UPDATE telegram_notification_queue
+                SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                    last_error = %s
+                WHERE id = ANY(%s)
+            ''', (MAX_ATTEMPTS, error, ids))
+            stats['failed'] += len(ids)
+        conn.commit()
+
+    return stats
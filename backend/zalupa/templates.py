@@ -1,6 +1,7 @@
 import json
 import base64
 from typing import Dict, Any
+from serializer import dumps
 
 def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
     '''
@@ -29,7 +30,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните название и имя файла'}),
+                'body': dumps({'error': 'Заполните название и имя файла'}),
                 'isBase64Encoded': False
             }
         
@@ -41,7 +42,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка декодирования файла: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка декодирования файла: {str(e)}'}),
                     'isBase64Encoded': False
                 }
         
@@ -52,7 +53,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 409,
                 'headers': cors_headers,
-                'body': json.dumps({'error': f'Шаблон с названием "{name}" уже существует'}),
+                'body': dumps({'error': f'Шаблон с названием "{name}" уже существует'}),
                 'isBase64Encoded': False
             }
         
@@ -68,10 +69,10 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Шаблон "{name}" успешно создан',
-                'createdAt': result[1].isoformat() if result[1] else None
+                'createdAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -87,29 +88,25 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Шаблон не найден'}),
+                    'body': dumps({'error': 'Шаблон не найден'}),
                     'isBase64Encoded': False
                 }
             
-            file_data_b64 = None
-            if row[7]:
-                file_data_b64 = base64.b64encode(row[7]).decode('utf-8')
-            
             template = {
                 'id': row[0],
                 'name': row[1],
                 'fileName': row[2],
                 'fileUrl': row[3],
                 'fieldMappings': row[4],
-                'createdAt': row[5].isoformat() if row[5] else None,
-                'updatedAt': row[6].isoformat() if row[6] else None,
-                'fileData': file_data_b64
+                'createdAt': row[5],
+                'updatedAt': row[6],
+                'fileData': row[7] or None
             }
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(template),
+                'body': dumps(template),
                 'isBase64Encoded': False
             }
         else:
@@ -124,14 +121,14 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
                     'fileName': row[2],
                     'fileUrl': row[3],
                     'fieldMappings': row[4],
-                    'createdAt': row[5].isoformat() if row[5] else None,
-                    'updatedAt': row[6].isoformat() if row[6] else None
+                    'createdAt': row[5],
+                    'updatedAt': row[6]
                 })
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'templates': templates, 'total': len(templates)}),
+                'body': dumps({'templates': templates, 'total': len(templates)}),
                 'isBase64Encoded': False
             }
     
@@ -142,7 +139,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID шаблона'}),
+                'body': dumps({'error': 'Не указан ID шаблона'}),
                 'isBase64Encoded': False
             }
         
@@ -158,7 +155,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните название и имя файла'}),
+                'body': dumps({'error': 'Заполните название и имя файла'}),
                 'isBase64Encoded': False
             }
         
@@ -170,7 +167,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Ошибка декодирования файла: {str(e)}'}),
+                    'body': dumps({'error': f'Ошибка декодирования файла: {str(e)}'}),
                     'isBase64Encoded': False
                 }
         
@@ -204,7 +201,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Шаблон не найден'}),
+                'body': dumps({'error': 'Шаблон не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -213,10 +210,10 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Шаблон "{name}" обновлён',
-                'updatedAt': result[1].isoformat() if result[1] else None
+                'updatedAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -228,7 +225,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID шаблона'}),
+                'body': dumps({'error': 'Не указан ID шаблона'}),
                 'isBase64Encoded': False
             }
         
@@ -239,7 +236,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Шаблон не найден'}),
+                'body': dumps({'error': 'Шаблон не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -248,7 +245,7 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Шаблон удалён'}),
+            'body': dumps({'message': 'Шаблон удалён'}),
             'isBase64Encoded': False
         }
     
@@ -256,6 +253,6 @@ def handle_templates(method: str, event: Dict[str, Any], cursor, conn, cors_head
         return {
             'statusCode': 405,
             'headers': cors_headers,
-            'body': json.dumps({'error': f'Метод {method} не поддерживается'}),
+            'body': dumps({'error': f'Метод {method} не поддерживается'}),
             'isBase64Encoded': False
         }
\ No newline at end of file
@@ -1,12 +1,90 @@
 import json
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
+from typing import List
+from psycopg2.extras import RealDictCursor, execute_values
+from serializer import dumps
+
+
+def sync_user_roles(cursor, user_id: int, role_ids: List[int]) -> None:
+    '''Приводит роли пользователя к role_ids: недостающие добавляются одним INSERT, лишние удаляются одним DELETE'''
+    role_ids = sorted({int(r) for r in role_ids})
+    if role_ids:
+        execute_values(
+            cursor,
+            'INSERT INTO user_roles (user_id, role_id) VALUES %s ON CONFLICT (user_id, role_id) DO NOTHING',
+            [(user_id, role_id) for role_id in role_ids]
+        )
+    cursor.execute(
+        'DELETE FROM user_roles WHERE user_id = %s AND role_id <> ALL(%s::int[])',
+        (user_id, role_ids)
+    )
+
+
+def bulk_update_role(event: dict, cursor, conn, cors_headers: dict) -> dict:
+    '''
+    Массовое назначение и снятие одной роли: POST ?resource=users&action=bulk_roles
+    Body: {"role_id": N, "assign": [user_id, ...], "revoke": [user_id, ...]}
+    '''
+    body = json.loads(event.get('body') or '{}')
+    try:
+        role_id = int(body.get('role_id'))
+        assign = sorted({int(u) for u in body.get('assign') or []})
+        revoke = sorted({int(u) for u in body.get('revoke') or []})
+    except (TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'role_id, assign и revoke должны содержать числовые id'}),
+            'isBase64Encoded': False
+        }
+
+    if set(assign) & set(revoke):
+        return {
+            'statusCode': 400,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Пользователь не может быть одновременно в assign и revoke'}),
+            'isBase64Encoded': False
+        }
+
+    cursor.execute('SELECT id FROM roles WHERE id = %s', (role_id,))
+    if not cursor.fetchone():
+        return {
+            'statusCode': 404,
+            'headers': cors_headers,
+            'body': dumps({'error': 'Role not found'}),
+            'isBase64Encoded': False
+        }
+
+    assigned = []
+    if assign:
+        # Несуществующие пользователи отбрасываются в SELECT, повторные назначения - ON CONFLICT
+        assigned = execute_values(cursor, '''
+            INSERT INTO user_roles (user_id, role_id)
+            SELECT u.id, v.role_id FROM (VALUES %s) AS v(user_id, role_id)
+            JOIN users u ON u.id = v.user_id
+            ON CONFLICT (user_id, role_id) DO NOTHING
+            RETURNING user_id
+        ''', [(user_id, role_id) for user_id in assign], fetch=True)
+
+    revoked = []
+    if revoke:
+        cursor.execute(
+            'DELETE FROM user_roles WHERE role_id = %s AND user_id = ANY(%s::int[]) RETURNING user_id',
+            (role_id, revoke)
+        )
+        revoked = cursor.fetchall()
+
+    conn.commit()
 
-
-def serialize_datetime(obj):
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': dumps({
+            'role_id': role_id,
+            'assigned': sorted(row[0] for row in assigned),
+            'revoked': sorted(row[0] for row in revoked)
+        }),
+        'isBase64Encoded': False
+    }
 
 
 def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) -> dict:
@@ -40,14 +118,14 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'User not found'}),
+                    'body': dumps({'error': 'User not found'}),
                     'isBase64Encoded': False
                 }
 
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(dict(user), default=serialize_datetime),
+                'body': dumps(dict(user)),
                 'isBase64Encoded': False
             }
 
@@ -75,7 +153,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'users': [dict(u) for u in users]}, default=serialize_datetime),
+                'body': dumps({'users': [dict(u) for u in users]}),
                 'isBase64Encoded': False
             }
         except Exception as e:
@@ -83,10 +161,13 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 500,
                 'headers': cors_headers,
-                'body': json.dumps({'error': str(e)}),
+                'body': dumps({'error': str(e)}),
                 'isBase64Encoded': False
             }
 
+    elif method == 'POST' and (event.get('queryStringParameters') or {}).get('action') == 'bulk_roles':
+        return bulk_update_role(event, cursor, conn, cors_headers)
+
     elif method == 'POST':
         body = json.loads(event.get('body', '{}'))
         print(f"[DEBUG] POST /users body: {json.dumps(body)}")
@@ -105,7 +186,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'full_name and password are required'}),
+                'body': dumps({'error': 'full_name and password are required'}),
                 'isBase64Encoded': False
             }
 
@@ -125,7 +206,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
                 return {
                     'statusCode': 400,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': f'Пользователь с логином "{username}" уже существует'}),
+                    'body': dumps({'error': f'Пользователь с логином "{username}" уже существует'}),
                     'isBase64Encoded': False
                 }
             
@@ -136,18 +217,14 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             )
             user_id = cursor.fetchone()[0]
 
-            for role_id in role_ids:
-                cursor.execute(
-                    'INSERT INTO user_roles (user_id, role_id) VALUES (%s, %s)',
-                    (user_id, role_id)
-                )
+            sync_user_roles(cursor, user_id, role_ids)
 
             conn.commit()
 
             return {
                 'statusCode': 201,
                 'headers': cors_headers,
-                'body': json.dumps({'id': user_id, 'message': 'User created'}),
+                'body': dumps({'id': user_id, 'message': 'User created'}),
                 'isBase64Encoded': False
             }
         except Exception as e:
@@ -156,7 +233,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': str(e)}),
+                'body': dumps({'error': str(e)}),
                 'isBase64Encoded': False
             }
 
@@ -168,7 +245,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user id is required'}),
+                'body': dumps({'error': 'user id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -185,7 +262,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'User not found'}),
+                'body': dumps({'error': 'User not found'}),
                 'isBase64Encoded': False
             }
 
@@ -196,20 +273,14 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
                     (username, email, full_name, phone, is_active, user_id)
                 )
 
-            cursor.execute('DELETE FROM user_roles WHERE user_id = %s', (user_id,))
-
-            for role_id in role_ids:
-                cursor.execute(
-                    'INSERT INTO user_roles (user_id, role_id) VALUES (%s, %s)',
-                    (user_id, role_id)
-                )
+            sync_user_roles(cursor, user_id, role_ids)
 
             conn.commit()
 
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User updated'}),
+                'body': dumps({'message': 'User updated'}),
                 'isBase64Encoded': False
             }
         except Exception as e:
@@ -217,7 +288,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': str(e)}),
+                'body': dumps({'error': str(e)}),
                 'isBase64Encoded': False
             }
 
@@ -231,7 +302,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'user id is required'}),
+                'body': dumps({'error': 'user id is required'}),
                 'isBase64Encoded': False
             }
 
@@ -241,7 +312,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'User not found'}),
+                    'body': dumps({'error': 'User not found'}),
                     'isBase64Encoded': False
                 }
 
@@ -259,7 +330,7 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'User deleted'}),
+                'body': dumps({'message': 'User deleted'}),
                 'isBase64Encoded': False
             }
         except Exception as e:
@@ -268,13 +339,13 @@ def handle_users(method: str, event: dict, cursor, conn, cors_headers: dict) ->
             return {
                 'statusCode': 500,
                 'headers': cors_headers,
-                'body': json.dumps({'error': str(e)}),
+                'body': dumps({'error': str(e)}),
                 'isBase64Encoded': False
             }
 
     return {
         'statusCode': 405,
         'headers': cors_headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
+        'body': dumps({'error': 'Method not allowed'}),
         'isBase64Encoded': False
     }
\ No newline at end of file
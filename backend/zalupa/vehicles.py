@@ -1,5 +1,66 @@
 import json
 from typing import Dict, Any
+from serializer import dumps
+from pg_json import JsonFields, use_pg_json
+from list_query import parse_list_params, fetch_list, fetch_list_json
+from bulk_import import ImportColumns, import_rows
+
+
+VEHICLE_JSON_FIELDS: JsonFields = [
+    ('id', 't.id'),
+    ('brand', 't.brand'),
+    ('registrationNumber', 't.registration_number'),
+    ('capacity', 't.capacity'),
+    ('trailerNumber', 't.trailer_number'),
+    ('trailerType', 't.trailer_type'),
+    ('companyId', 't.company_id'),
+    ('driverId', 't.driver_id'),
+    ('createdAt', 't.created_at'),
+    ('updatedAt', 't.updated_at'),
+]
+
+VEHICLE_LIST_SPEC = {
+    'table': 'vehicles',
+    'collection': 'vehicles',
+    'fields': VEHICLE_JSON_FIELDS,
+    'sort': {
+        'createdAt': 't.created_at',
+        'updatedAt': 't.updated_at',
+        'brand': 't.brand',
+        'registrationNumber': 't.registration_number',
+        'id': 't.id'
+    },
+    'filters': {
+        'company_id': ('t.company_id', 'int'),
+        'driver_id': ('t.driver_id', 'int')
+    },
+    'default_sort': '-createdAt'
+}
+
+VEHICLE_IMPORT_COLUMNS: ImportColumns = [
+    ('brand', 'brand', 'text(255)', 'Марка'),
+    ('registration_number', 'registrationNumber', 'text(100)', 'Госномер'),
+    ('capacity', 'capacity', 'decimal(10,2)', 'Грузоподъёмность'),
+    ('trailer_number', 'trailerNumber', 'text(100)', 'Номер прицепа'),
+    ('trailer_type', 'trailerType', 'text(255)', 'Тип прицепа'),
+    ('company_id', 'companyId', 'int', 'ID компании'),
+    ('driver_id', 'driverId', 'int', 'ID водителя'),
+]
+
+VEHICLE_IMPORT_SPEC = {
+    'table': 'vehicles',
+    'columns': VEHICLE_IMPORT_COLUMNS,
+    'required': ['brand', 'registration_number'],
+    # Колонки-ссылки без внешнего ключа в БД: несуществующий id - ошибка строки, а не висячая ссылка
+    'references': {'company_id': ('contractors', 'контрагент')},
+    # Госномер сравнивается без пробелов и регистра: "а 123 вс 77" и "А123ВС77" - одна машина
+    'unique': [('registration_number',)],
+    'normalize': {'registration_number': lambda value: value.replace(' ', '').upper()},
+    'match': [
+        "upper(replace(d.registration_number, ' ', '')) = upper(replace(s.registration_number, ' ', ''))"
+    ]
+}
+
 
 def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_headers: Dict[str, str]) -> Dict[str, Any]:
     '''
@@ -15,6 +76,9 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
     '''
     params = event.get('queryStringParameters') or {}
     
+    if method == 'POST' and params.get('action') == 'import':
+        return import_rows(event, cursor, conn, cors_headers, VEHICLE_IMPORT_SPEC)
+    
     if method == 'POST':
         body_data = json.loads(event.get('body', '{}'))
         
@@ -25,7 +89,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Марка ТС, Номер ТС'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Марка ТС, Номер ТС'}),
                 'isBase64Encoded': False
             }
         
@@ -52,10 +116,10 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
         return {
             'statusCode': 201,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Автомобиль {brand} {registration_number} успешно добавлен',
-                'createdAt': result[1].isoformat() if result[1] else None
+                'createdAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -71,7 +135,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
                 return {
                     'statusCode': 404,
                     'headers': cors_headers,
-                    'body': json.dumps({'error': 'Автомобиль не найден'}),
+                    'body': dumps({'error': 'Автомобиль не найден'}),
                     'isBase64Encoded': False
                 }
             
@@ -79,44 +143,41 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
                 'id': row[0],
                 'brand': row[1],
                 'registrationNumber': row[2],
-                'capacity': float(row[3]) if row[3] else None,
+                'capacity': row[3],
                 'trailerNumber': row[4],
                 'trailerType': row[5],
                 'companyId': row[6],
                 'driverId': row[7],
-                'createdAt': row[8].isoformat() if row[8] else None,
-                'updatedAt': row[9].isoformat() if row[9] else None
+                'createdAt': row[8],
+                'updatedAt': row[9]
             }
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps(vehicle),
+                'body': dumps(vehicle),
                 'isBase64Encoded': False
             }
         else:
-            cursor.execute('SELECT * FROM vehicles ORDER BY created_at DESC')
-            rows = cursor.fetchall()
+            try:
+                query = parse_list_params(params, VEHICLE_LIST_SPEC)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': cors_headers,
+                    'body': dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
             
-            vehicles = []
-            for row in rows:
-                vehicles.append({
-                    'id': row[0],
-                    'brand': row[1],
-                    'registrationNumber': row[2],
-                    'capacity': float(row[3]) if row[3] else None,
-                    'trailerNumber': row[4],
-                    'trailerType': row[5],
-                    'companyId': row[6],
-                    'driverId': row[7],
-                    'createdAt': row[8].isoformat() if row[8] else None,
-                    'updatedAt': row[9].isoformat() if row[9] else None
-                })
+            if use_pg_json(params):
+                body = fetch_list_json(cursor, VEHICLE_LIST_SPEC, query)
+            else:
+                body = fetch_list(cursor, VEHICLE_LIST_SPEC, query)
             
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'vehicles': vehicles, 'total': len(vehicles)}),
+                'body': body,
                 'isBase64Encoded': False
             }
     
@@ -127,7 +188,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID автомобиля'}),
+                'body': dumps({'error': 'Не указан ID автомобиля'}),
                 'isBase64Encoded': False
             }
         
@@ -140,7 +201,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Заполните обязательные поля: Марка ТС, Номер ТС'}),
+                'body': dumps({'error': 'Заполните обязательные поля: Марка ТС, Номер ТС'}),
                 'isBase64Encoded': False
             }
         
@@ -173,7 +234,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Автомобиль не найден'}),
+                'body': dumps({'error': 'Автомобиль не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -182,10 +243,10 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': dumps({
                 'id': result[0],
                 'message': f'Автомобиль {brand} {registration_number} успешно обновлен',
-                'updatedAt': result[1].isoformat() if result[1] else None
+                'updatedAt': result[1]
             }),
             'isBase64Encoded': False
         }
@@ -197,7 +258,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Не указан ID автомобиля'}),
+                'body': dumps({'error': 'Не указан ID автомобиля'}),
                 'isBase64Encoded': False
             }
         
@@ -208,7 +269,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Автомобиль не найден'}),
+                'body': dumps({'error': 'Автомобиль не найден'}),
                 'isBase64Encoded': False
             }
         
@@ -217,7 +278,7 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({'message': 'Автомобиль успешно удален'}),
+            'body': dumps({'message': 'Автомобиль успешно удален'}),
             'isBase64Encoded': False
         }
     
@@ -225,6 +286,6 @@ def handle_vehicles(method: str, event: Dict[str, Any], cursor, conn, cors_heade
         return {
             'statusCode': 405,
             'headers': cors_headers,
-            'body': json.dumps({'error': f'Метод {method} не поддерживается'}),
+            'body': dumps({'error': f'Метод {method} не поддерживается'}),
             'isBase64Encoded': False
         }
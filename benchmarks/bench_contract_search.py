@@ -0,0 +1,111 @@
+'''
+Нагрузочная проверка полнотекстового поиска договоров (?resource=contracts&action=search).
+
+Запуск:
+    DATABASE_URL=postgresql://... python benchmarks/bench_contract_search.py --contracts 100000 --runs 20
+
+Контрагенты и договоры генерируются в одной транзакции и откатываются в конце.
+С --explain для каждого запроса печатается план EXPLAIN (ANALYZE, BUFFERS).
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'zalupa'))
+
+from contracts import handle_contracts, build_search_query
+
+
+SEED_CONTRACTORS_SQL = '''
+    INSERT INTO contractors (name, inn, is_carrier, is_buyer, is_seller)
+    SELECT (ARRAY['ООО Ромашка', 'АО Северный Терминал', 'ООО ТрансЛогистик', 'ИП Кузнецов', 'ООО Агроимпорт'])[1 + g %% 5] || ' ' || g,
+           lpad(g::text, 10, '9'), g %% 3 = 0, g %% 3 = 1, g %% 3 = 2
+    FROM generate_series(1, %s) g
+    RETURNING id
+'''
+
+SEED_CONTRACTS_SQL = '''
+    INSERT INTO contracts (
+        contract_number, contract_date, customer_id, carrier_id, loading_seller_id, unloading_buyer_id,
+        cargo, loading_addresses, unloading_addresses, payment_amount,
+        driver_full_name, vehicle_registration_number
+    )
+    SELECT 'BENCH-' || g, DATE '2023-01-01' + (g %% 700),
+           ids[1 + g %% n], ids[1 + (g * 7) %% n], ids[1 + (g * 11) %% n], ids[1 + (g * 13) %% n],
+           (ARRAY['Цемент М500', 'Щебень гранитный', 'Зерно пшеница', 'Металлопрокат', 'Пиломатериалы'])[1 + g %% 5],
+           jsonb_build_array('г. ' || (ARRAY['Москва', 'Новороссийск', 'Казань', 'Екатеринбург', 'Ростов-на-Дону'])[1 + g %% 5] || ', ул. Складская, д. ' || (g %% 200)),
+           jsonb_build_array('г. ' || (ARRAY['Самара', 'Воронеж', 'Тверь', 'Уфа', 'Пермь'])[1 + g %% 5] || ', промзона, стр. ' || (g %% 50)),
+           10000 + g %% 90000,
+           (ARRAY['Иванов Пётр Сергеевич', 'Смирнов Алексей Иванович', 'Кузнецов Олег Петрович'])[1 + g %% 3],
+           'А' || lpad((g %% 1000)::text, 3, '0') || 'ВС77'
+    FROM generate_series(1, %s) g,
+         (SELECT array_agg(id) AS ids, count(*)::int AS n FROM contractors WHERE id = ANY(%s)) c
+'''
+
+QUERIES = [
+    'BENCH-4242',
+    'цемент',
+    'новороссийск складская',
+    'ромашка',
+    'ромашка щебень',
+    'смирнов А123'
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark contract full-text search')
+    parser.add_argument('--contracts', type=int, default=100000, help='synthetic contracts to insert')
+    parser.add_argument('--contractors', type=int, default=2000, help='synthetic contractors to insert')
+    parser.add_argument('--runs', type=int, default=20, help='requests per query')
+    parser.add_argument('--explain', action='store_true', help='print EXPLAIN (ANALYZE, BUFFERS) for each query')
+    args = parser.parse_args()
+
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        sys.exit('DATABASE_URL is not set')
+
+    conn = psycopg2.connect(db_url)
+    cursor = conn.cursor()
+
+    try:
+        started = time.perf_counter()
+        cursor.execute(SEED_CONTRACTORS_SQL, (args.contractors,))
+        contractor_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(SEED_CONTRACTS_SQL, (args.contracts, contractor_ids))
+        cursor.execute('ANALYZE contracts')
+        cursor.execute('ANALYZE contractors')
+        print(f'seeded {args.contracts} contracts in {time.perf_counter() - started:.1f}s')
+
+        for text in QUERIES:
+            event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'search', 'q': text, 'limit': '20'}}
+            timings = []
+            body = {}
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                result = handle_contracts('GET', event, cursor, conn, {})
+                timings.append((time.perf_counter() - started) * 1000)
+                body = json.loads(result['body'])
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{text!r:<28} p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms  hits={body.get('total')}")
+
+            if args.explain:
+                cursor.execute(
+                    "EXPLAIN (ANALYZE, BUFFERS) SELECT id FROM contracts WHERE search_vector @@ to_tsquery('russian', %s)",
+                    (build_search_query(text, '|'),)
+                )
+                for (line,) in cursor.fetchall():
+                    print(f'    {line}')
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+'''
+Бенчмарк обработчиков backend-функций на синтетических данных: p50/p95, число SQL-запросов
+на запрос, пиковая память и размер ответа для каждого сценария.
+
+Запуск на временном локальном Postgres (нужны initdb и pg_ctl в PATH):
+    python benchmarks/bench_endpoints.py --local-postgres --orders 20000 --runs 30 --json results/HEAD.json
+
+Запуск на своей базе (отдельной, не рабочей: данные коммитятся):
+    DATABASE_URL=postgresql://... python benchmarks/bench_endpoints.py --migrate --seed --runs 30
+
+Сравнение с прошлым прогоном:
+    python benchmarks/bench_endpoints.py --local-postgres --compare results/main.json
+
+Обработчики вызываются в том же процессе с фейковыми событиями: zalupa через index.route,
+generate-pdf через index.handler. Число запросов и их время берутся из request_metrics.
+Параметры масштаба и коммит пишутся в --json, чтобы прогоны разных коммитов можно было сравнивать.
+'''
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extensions import make_dsn
+
+from synthetic_data import DEFAULT_SCALE, seed
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MIGRATIONS_DIR = os.path.join(ROOT, 'db_migrations')
+
+# Схема, в которой платформа держит таблицы проекта (часть миграций ссылается на неё явно)
+SCHEMA = 't_p22554550_multiport_transport_'
+
+
+def load_function(name: str) -> types.ModuleType:
+    '''
+    Импортирует backend/<name>/index.py под отдельным именем
+    Одноимённые модули соседних функций (contractor_cache и т.п.) не смешиваются:
+    на время импорта они убираются из sys.modules и затем возвращаются
+    '''
+    directory = os.path.join(ROOT, 'backend', name)
+    siblings = {f[:-3] for f in os.listdir(directory) if f.endswith('.py') and f != 'index.py'}
+    stashed = {module: sys.modules.pop(module) for module in list(sys.modules) if module in siblings}
+
+    sys.path.insert(0, directory)
+    try:
+        spec = importlib.util.spec_from_file_location(f'{name.replace("-", "_")}_index', os.path.join(directory, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(directory)
+        if stashed:
+            for module in siblings:
+                sys.modules.pop(module, None)
+            sys.modules.update(stashed)
+    return module
+
+
+@contextlib.contextmanager
+def local_postgres():
+    '''Временный кластер Postgres в каталоге /tmp; удаляется после прогона'''
+    data_dir = tempfile.mkdtemp(prefix='bench-pg-')
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    try:
+        subprocess.run(
+            ['initdb', '-D', data_dir, '-U', 'postgres', '--auth=trust', '-E', 'UTF8', '--locale=C'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        subprocess.run(
+            ['pg_ctl', '-D', data_dir, '-o', f'-p {port} -k {data_dir} -c fsync=off', '-w', '-l',
+             os.path.join(data_dir, 'server.log'), 'start'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        try:
+            yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+        finally:
+            subprocess.run(['pg_ctl', '-D', data_dir, '-m', 'fast', 'stop'], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def apply_migrations(dsn: str) -> int:
+    '''Применяет db_migrations/V*.sql по порядку к пустой базе'''
+    files = sorted(
+        (f for f in os.listdir(MIGRATIONS_DIR) if f.startswith('V') and f.endswith('.sql')),
+        key=lambda f: int(f[1:f.index('__')])
+    )
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {SCHEMA}')
+        for name in files:
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                cursor.execute(f.read())
+        conn.commit()
+    finally:
+        conn.close()
+    return len(files)
+
+
+def sample_ids(dsn: str) -> Dict[str, Optional[int]]:
+    '''Идентификаторы для detail-сценариев: строка из середины таблицы, а не первая'''
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        ids = {}
+        for table in ('orders', 'contracts', 'templates'):
+            cursor.execute(f'SELECT id FROM {table} ORDER BY id OFFSET (SELECT count(*) / 2 FROM {table}) LIMIT 1')
+            row = cursor.fetchone()
+            ids[table] = row[0] if row else None
+        cursor.execute("SELECT id FROM templates WHERE field_mappings <> '[]'::jsonb ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        ids['form_template'] = row[0] if row else ids['templates']
+        return ids
+    finally:
+        conn.close()
+
+
+def get_event(query: Dict[str, str]) -> Dict[str, Any]:
+    return {'httpMethod': 'GET', 'queryStringParameters': query, 'headers': {}}
+
+
+def build_scenarios(ids: Dict[str, Optional[int]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    '''(имя, функция, событие) для каждого сценария'''
+    scenarios = [
+        ('drivers.list', 'zalupa', get_event({'resource': 'drivers'})),
+        ('vehicles.list', 'zalupa', get_event({'resource': 'vehicles'})),
+        ('contractors.list', 'zalupa', get_event({'resource': 'contractors'})),
+        ('contracts.list', 'zalupa', get_event({'resource': 'contracts'})),
+        ('contracts.summary', 'zalupa', get_event({'resource': 'contracts', 'view': 'summary', 'limit': '50'})),
+        ('contracts.search', 'zalupa', get_event({'resource': 'contracts', 'action': 'search', 'q': 'цемент москва'})),
+        ('orders.list', 'zalupa', get_event({'resource': 'orders'})),
+        ('templates.list', 'zalupa', get_event({'resource': 'templates'})),
+        ('users.list', 'zalupa', get_event({'resource': 'users'})),
+        ('roles.list', 'zalupa', get_event({'resource': 'roles'})),
+    ]
+    if ids.get('orders'):
+        scenarios.append(('orders.detail', 'zalupa', get_event({'resource': 'orders', 'id': str(ids['orders'])})))
+    if ids.get('contracts'):
+        scenarios.append(('contracts.detail', 'zalupa', get_event({'resource': 'contracts', 'id': str(ids['contracts'])})))
+    if ids.get('templates') and ids.get('contracts'):
+        for name, template_id in (('generate_pdf.text', ids['templates']), ('generate_pdf.form', ids['form_template'])):
+            scenarios.append((name, 'generate-pdf', {
+                'httpMethod': 'POST',
+                'headers': {},
+                'body': json.dumps({'templateId': template_id, 'contractId': ids['contracts']})
+            }))
+    return scenarios
+
+
+class Runner:
+    '''Вызывает обработчики функций и собирает замеры одного запроса'''
+
+    def __init__(self):
+        self.functions = {'zalupa': load_function('zalupa')}
+        # request_metrics из zalupa уже в sys.modules; generate-pdf не инструментирован,
+        # поэтому его соединение подменяется на InstrumentedConnection
+        self.metrics = sys.modules['request_metrics']
+        pdf = load_function('generate-pdf')
+        pdf.psycopg2 = types.SimpleNamespace(
+            connect=partial(psycopg2.connect, connection_factory=self.metrics.InstrumentedConnection)
+        )
+        self.functions['generate-pdf'] = pdf
+
+    def call(self, function: str, event: Dict[str, Any]) -> Tuple[Dict[str, Any], float, Any]:
+        module = self.functions[function]
+        entry = module.route if function == 'zalupa' else module.handler
+        metrics = self.metrics.start_request()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = entry(event, None)
+            elapsed = (time.perf_counter() - started) * 1000
+        return result, elapsed, metrics
+
+    def measure(self, function: str, event: Dict[str, Any], runs: int, warmup: int) -> Dict[str, Any]:
+        for _ in range(warmup):
+            self.call(function, event)
+
+        # Пиковая память - отдельным вызовом: tracemalloc замедляет выполнение и исказил бы время
+        tracemalloc.start()
+        result, _, metrics = self.call(function, event)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(runs):
+            result, elapsed, metrics = self.call(function, event)
+            timings.append(elapsed)
+        timings.sort()
+
+        body = result.get('body') or ''
+        stats = {
+            'status': result.get('statusCode'),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.query_ms, 2),
+            'rows': metrics.rows,
+            'peak_kb': round(peak / 1024, 1),
+            'bytes': len(body.encode('utf-8'))
+        }
+        if stats['status'] != 200:
+            stats['error'] = body[:200]
+        return stats
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    header = f"{'scenario':<20} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'db ms':>8} {'peak KiB':>9} {'bytes':>10}"
+    if baseline:
+        header += f" {'Δp50':>8} {'Δqueries':>9}"
+    print(header)
+    for name, stats in results.items():
+        line = (
+            f"{name:<20} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['queries']:>8} "
+            f"{stats['db_ms']:>8.2f} {stats['peak_kb']:>9.1f} {stats['bytes']:>10}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            delta = (stats['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else 0.0
+            line += f" {delta:>+7.1f}% {stats['queries'] - previous['queries']:>+9}"
+        if stats['status'] != 200:
+            line += f"  !! {stats['status']} {stats.get('error', '')}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend handlers on synthetic data')
+    parser.add_argument('--local-postgres', action='store_true',
+                        help='start a throwaway Postgres cluster (implies --migrate --seed)')
+    parser.add_argument('--migrate', action='store_true', help='apply db_migrations/ to an empty database')
+    parser.add_argument('--seed', action='store_true', help='insert synthetic data and commit it')
+    for key, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value, dest=key)
+    parser.add_argument('--runs', type=int, default=20, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests per scenario')
+    parser.add_argument('--only', help='comma-separated scenario name prefixes')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file of a previous run to diff against')
+    args = parser.parse_args()
+
+    scale = {key: getattr(args, key) for key in DEFAULT_SCALE}
+
+    with contextlib.ExitStack() as stack:
+        if args.local_postgres:
+            base_dsn = stack.enter_context(local_postgres())
+            args.migrate = args.seed = True
+        else:
+            base_dsn = os.environ.get('DATABASE_URL')
+            if not base_dsn:
+                sys.exit('DATABASE_URL is not set (or use --local-postgres)')
+
+        dsn = make_dsn(base_dsn, options=f'-c search_path={SCHEMA},public')
+        # Обработчики сами подключаются по DATABASE_URL
+        os.environ['DATABASE_URL'] = dsn
+
+        if args.migrate:
+            print(f'applied {apply_migrations(dsn)} migrations')
+        if args.seed:
+            started = time.perf_counter()
+            conn = psycopg2.connect(dsn)
+            try:
+                seed(conn.cursor(), scale)
+                conn.commit()
+            finally:
+                conn.close()
+            print(f'seed took {time.perf_counter() - started:.1f}s')
+
+        runner = Runner()
+        scenarios = build_scenarios(sample_ids(dsn))
+        if args.only:
+            prefixes = tuple(args.only.split(','))
+            scenarios = [s for s in scenarios if s[0].startswith(prefixes)]
+
+        results = {}
+        for name, function, event in scenarios:
+            results[name] = runner.measure(function, event, args.runs, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'commit': git_commit(),
+                'scale': scale if args.seed else None,
+                'runs': args.runs,
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+'''
+Сравнение сборки JSON списков в Python и в Postgres (?render=python / ?render=db)
+для drivers, vehicles и contractors.
+
+Запуск:
+    DATABASE_URL=postgresql://... python benchmarks/bench_list_render.py --rows 5000 --runs 20
+
+Синтетические строки вставляются в той же транзакции и откатываются в конце,
+поэтому скрипт можно запускать на копии рабочей базы.
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'zalupa'))
+
+from drivers import handle_drivers
+from vehicles import handle_vehicles
+from contractors import handle_contractors
+
+
+SEED_SQL = {
+    'drivers': '''
+        INSERT INTO drivers (
+            last_name, first_name, middle_name, phone, passport_series, passport_number,
+            passport_date, passport_issued, license_series, license_number, license_date, license_issued
+        )
+        SELECT 'Иванов' || g, 'Пётр', 'Сергеевич', '+7900' || lpad(g::text, 7, '0'), '4510', lpad(g::text, 6, '0'),
+               DATE '2015-01-01' + (g % 3000), 'ОВД района ' || g, '77АА', lpad(g::text, 6, '0'),
+               DATE '2018-01-01' + (g % 2000), 'ГИБДД ' || g
+        FROM generate_series(1, %s) g
+    ''',
+    'vehicles': '''
+        INSERT INTO vehicles (brand, registration_number, capacity, trailer_number, trailer_type)
+        SELECT 'Volvo FH', 'А' || lpad(g::text, 3, '0') || 'ВС77', 20 + (g % 5), 'ЕА' || g || '77', 'Тент'
+        FROM generate_series(1, %s) g
+    ''',
+    'contractors': '''
+        INSERT INTO contractors (
+            name, inn, kpp, ogrn, director, legal_address, is_carrier, bank_accounts, delivery_addresses
+        )
+        SELECT 'ООО Перевозчик ' || g, lpad(g::text, 10, '7'), '770101001', lpad(g::text, 13, '1'),
+               'Петров П. П.', 'г. Москва, ул. Складская, д. ' || g, g % 2 = 0,
+               jsonb_build_array(jsonb_build_object('bankName', 'Сбербанк', 'accountNumber', lpad(g::text, 20, '4'))),
+               jsonb_build_array('г. Москва, ул. Складская, д. ' || g)
+        FROM generate_series(1, %s) g
+    '''
+}
+
+HANDLERS = {
+    'drivers': handle_drivers,
+    'vehicles': handle_vehicles,
+    'contractors': handle_contractors
+}
+
+
+def run_mode(handler, cursor, conn, mode: str, runs: int):
+    event = {'httpMethod': 'GET', 'queryStringParameters': {'render': mode}}
+    timings = []
+    body = ''
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = handler('GET', event, cursor, conn, {})
+        timings.append((time.perf_counter() - started) * 1000)
+        body = result['body']
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'bytes': len(body.encode('utf-8')),
+        'body': body
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Python vs Postgres JSON rendering for list endpoints')
+    parser.add_argument('--rows', type=int, default=5000, help='synthetic rows to insert per resource')
+    parser.add_argument('--runs', type=int, default=20, help='requests per mode')
+    parser.add_argument('--resource', choices=sorted(HANDLERS), action='append', help='limit to resource(s)')
+    args = parser.parse_args()
+
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        sys.exit('DATABASE_URL is not set')
+
+    conn = psycopg2.connect(db_url)
+    cursor = conn.cursor()
+
+    try:
+        for resource in args.resource or sorted(HANDLERS):
+            if args.rows:
+                cursor.execute(SEED_SQL[resource], (args.rows,))
+
+            python_mode = run_mode(HANDLERS[resource], cursor, conn, 'python', args.runs)
+            db_mode = run_mode(HANDLERS[resource], cursor, conn, 'db', args.runs)
+            same = json.loads(python_mode['body']) == json.loads(db_mode['body'])
+
+            print(f'{resource}:')
+            for name, stats in (('python', python_mode), ('db', db_mode)):
+                print(f"  {name:<7} p50={stats['p50']:8.2f}ms  p95={stats['p95']:8.2f}ms  body={stats['bytes']} bytes")
+            print(f"  speedup p50: {python_mode['p50'] / db_mode['p50']:.2f}x, identical payload: {same}")
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
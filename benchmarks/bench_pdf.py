@@ -0,0 +1,207 @@
+'''
+Микробенчмарк генерации PDF (backend/generate-pdf) по стадиям, без базы данных.
+
+Запуск:
+    python benchmarks/bench_pdf.py --pages 1,5,20,50 --runs 10
+    python benchmarks/bench_pdf.py --pages 50 --cprofile /tmp/pdf.prof
+    python benchmarks/bench_pdf.py --pages 20 --pyinstrument /tmp/pdf.html   # если установлен pyinstrument
+
+Корпус шаблонов собирается synthetic_data.make_pdf: N страниц с плейсхолдерами {{field}} в тексте,
+с полями AcroForm и без них (часть полей названа кириллицей). Договор заполнен кириллическими значениями.
+
+Стадии повторяют generate_pdf и handler:
+    fetch        - bytea из psycopg2 (memoryview или base64-строка) -> bytes, decode_file_data
+    prepare      - prepare_form_data
+    placeholders - replace_placeholders: pikepdf open, замена в content streams, save
+    form         - fill_form_fields: pypdf append, update_page_form_field_values, write
+    encode       - base64 результата для ответа
+Для каждой стадии печатается p50 времени и пик выделенной памяти (tracemalloc, отдельным проходом).
+'''
+import argparse
+import base64
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import statistics
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Any, List, Tuple
+
+from bench_endpoints import load_function
+from synthetic_data import CONTRACT_FIELDS, make_pdf
+
+STAGES = ('fetch', 'prepare', 'placeholders', 'form', 'encode')
+
+FORM_FIELDS = CONTRACT_FIELDS[:12] + ('Заказчик', 'Перевозчик', 'Груз')
+
+CONTRACT = {
+    'id': 1,
+    'contract_number': 'ДЗ-2024/0815',
+    'contract_date': date(2024, 6, 1),
+    'cargo': 'Цемент М500 в мешках по 50 кг',
+    'loading_addresses': ['г. Москва, ул. Складская, д. 12', 'г. Подольск, Промзона, стр. 4'],
+    'unloading_addresses': ['г. Новороссийск, терминал НУТЭП'],
+    'loading_date': '01.06.2024',
+    'unloading_date': '05.06.2024',
+    'payment_amount': Decimal('185000.00'),
+    'driver_full_name': 'Иванов Пётр Сергеевич',
+    'driver_phone': '+79001234567',
+    'vehicle_registration_number': 'А123ВС77',
+    'vehicle_trailer_number': 'ЕА1234 77',
+    'temperature_mode': '+2..+6 °C',
+    'additional_conditions': 'Растентовка сверху, ремни 8 шт., простой свыше 24 ч оплачивается отдельно'
+}
+
+RELATED = {
+    key: {
+        'name': f'ООО «{title}»', 'inn': '7701234567', 'kpp': '770101001', 'ogrn': '1027700000000',
+        'legal_address': 'г. Москва, ул. Тверская, д. 1', 'director': 'Сидорова Анна Викторовна'
+    }
+    for key, title in (
+        ('customer', 'Ромашка'), ('carrier', 'ТрансЛогистик'),
+        ('loadingSeller', 'Северный Терминал'), ('unloadingBuyer', 'Агроимпорт')
+    )
+}
+
+
+def build_corpus(page_counts: List[int]) -> List[Tuple[str, bytes]]:
+    corpus = []
+    for pages in page_counts:
+        corpus.append((f'{pages}p', make_pdf(pages)))
+        corpus.append((f'{pages}p+form', make_pdf(pages, form_fields=FORM_FIELDS)))
+    return corpus
+
+
+def run_stages(module, blob: bytes, as_base64: bool, stage_hook) -> str:
+    '''Один проход generate_pdf + кодирование ответа; stage_hook(name) - контекст замера стадии'''
+    file_data = base64.b64encode(blob).decode('ascii') if as_base64 else memoryview(blob)
+
+    with stage_hook('fetch'):
+        pdf_bytes = module.decode_file_data(file_data)
+    with stage_hook('prepare'):
+        form_data = module.prepare_form_data(CONTRACT, RELATED)
+    with stage_hook('placeholders'):
+        pdf_bytes = module.replace_placeholders(pdf_bytes, form_data)
+    with stage_hook('form'):
+        pdf_bytes = module.fill_form_fields(pdf_bytes, form_data)
+    with stage_hook('encode'):
+        encoded = base64.b64encode(pdf_bytes).decode('utf-8')
+    return encoded
+
+
+def measure(module, blob: bytes, runs: int, as_base64: bool) -> Dict[str, Any]:
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    @contextlib.contextmanager
+    def timed(name):
+        started = time.perf_counter()
+        yield
+        timings[name].append((time.perf_counter() - started) * 1000)
+
+    peaks: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def traced(name):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        yield
+        peaks[name] = (tracemalloc.get_traced_memory()[1] - before) / 1024
+
+    # generate-pdf печатает отладочные строки - в бенчмарке они только мешают
+    with contextlib.redirect_stdout(io.StringIO()):
+        encoded = run_stages(module, blob, as_base64, timed)
+        for stage in STAGES:
+            timings[stage].clear()
+        for _ in range(runs):
+            run_stages(module, blob, as_base64, timed)
+
+        tracemalloc.start()
+        try:
+            run_stages(module, blob, as_base64, traced)
+        finally:
+            tracemalloc.stop()
+
+    totals = [sum(timings[stage][i] for stage in STAGES) for i in range(runs)]
+    return {
+        'input_kb': round(len(blob) / 1024, 1),
+        'output_kb': round(len(encoded) * 3 / 4 / 1024, 1),
+        'stages': {
+            stage: {'p50_ms': round(statistics.median(timings[stage]), 2), 'peak_kb': round(peaks[stage], 1)}
+            for stage in STAGES
+        },
+        'total_p50_ms': round(statistics.median(totals), 2)
+    }
+
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'template':<12} {'in KiB':>8} {'out KiB':>8}" + ''.join(f' {stage:>14}' for stage in STAGES) + f" {'total ms':>9}"
+    print(header)
+    print(' ' * 30 + ''.join(f" {'ms / peak KiB':>14}" for _ in STAGES))
+    for name, result in results.items():
+        cells = ''.join(
+            f" {result['stages'][stage]['p50_ms']:>6.1f}/{result['stages'][stage]['peak_kb']:<7.0f}" for stage in STAGES
+        )
+        print(f"{name:<12} {result['input_kb']:>8.1f} {result['output_kb']:>8.1f}{cells} {result['total_p50_ms']:>9.2f}")
+
+
+def profile(module, blob: bytes, cprofile_path: str, pyinstrument_path: str) -> None:
+    '''Профиль одного полного прохода: cProfile (pstats-файл + топ в консоль) и/или pyinstrument (HTML)'''
+    def noop(name):
+        return contextlib.nullcontext()
+
+    if cprofile_path:
+        profiler = cProfile.Profile()
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler.runcall(run_stages, module, blob, False, noop)
+        profiler.dump_stats(cprofile_path)
+        print(f'\ncProfile -> {cprofile_path}')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+    if pyinstrument_path:
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print('pyinstrument is not installed, skipping')
+            return
+        profiler = Profiler()
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler.start()
+            run_stages(module, blob, False, noop)
+            profiler.stop()
+        with open(pyinstrument_path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+        print(f'pyinstrument -> {pyinstrument_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage benchmark of PDF generation')
+    parser.add_argument('--pages', default='1,5,20,50', help='comma-separated page counts of the template corpus')
+    parser.add_argument('--runs', type=int, default=10, help='measured renders per template')
+    parser.add_argument('--base64', action='store_true', help='feed file_data as a base64 string instead of bytea')
+    parser.add_argument('--cprofile', help='write a cProfile dump of one render of the largest template')
+    parser.add_argument('--pyinstrument', help='write a pyinstrument HTML report of one render of the largest template')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    module = load_function('generate-pdf')
+    corpus = build_corpus([int(p) for p in args.pages.split(',')])
+
+    results = {name: measure(module, blob, args.runs, args.base64) for name, blob in corpus}
+    print_results(results)
+
+    if args.cprofile or args.pyinstrument:
+        profile(module, max(corpus, key=lambda item: len(item[1]))[1], args.cprofile, args.pyinstrument)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'runs': args.runs, 'base64': args.base64, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+'''
+Поиск недостающих индексов по SQL из кода backend-функций.
+
+Запуск по мигрированной базе (индексы и размеры таблиц из pg_indexes / pg_class):
+    DATABASE_URL=postgresql://... python benchmarks/index_advisor.py
+    python benchmarks/index_advisor.py --local-postgres --write db_migrations/V0031__add_access_path_indexes.sql
+
+Без базы индексы и колонки читаются из db_migrations/*.sql:
+    python benchmarks/index_advisor.py --offline
+
+Статический разбор: из каждого строкового литерала и f-строки с SQL в backend/*/*.py берутся таблицы
+(FROM/JOIN/UPDATE с алиасами), колонки условий равенства (включая условия JOIN), диапазонов и ORDER BY.
+Сортировка учитывается и без LIMIT: индекс (фильтр, сортировка) отдаёт строки по порядку без узла Sort,
+например позиции маршрутов заказа. Для списков на list_query (постраничных)
+дополнительно разбираются *_LIST_SPEC: сортировка по умолчанию и небулевы фильтры.
+Путь доступа считается покрытым, если есть btree-индекс, ведущие колонки которого входят в колонки
+равенства (уникальный индекс закрывает и сортировку), а для сортировки - индекс вида (равенства..., сортировка...).
+Результат - предложения CREATE INDEX с местами в коде; --write сохраняет их как миграцию.
+'''
+import argparse
+import ast
+import os
+import re
+import sys
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+BACKEND_DIR = os.path.join(ROOT, 'backend')
+
+MIGRATIONS_DIR = os.path.join(ROOT, 'db_migrations')
+
+# Таблицы-настройки из единиц строк: индексы им не нужны (в режиме с базой используется --min-rows)
+SMALL_TABLES = {
+    'roles', 'role_permissions', 'telegram_config', 'telegram_settings', 'authz_version',
+    'invite_links', 'telegram_users', 'user_telegram_links'
+}
+
+# Логические флаги (is_admin, is_carrier, ...) малоселективны и ведущей колонкой индекса не берутся
+FLAG_PREFIXES = ('is_', 'has_')
+
+SQL_RE = re.compile(r'\b(SELECT|UPDATE|DELETE)\b')
+CLAUSE_RE = re.compile(r'\b(FROM|WHERE|SET)\b')
+TABLE_RE = re.compile(
+    r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:ONLY\s+)?(?:[a-z_]\w*\.)?([a-z_]\w*)(?:\s+(?:AS\s+)?([a-z_]\w*))?',
+    re.IGNORECASE
+)
+ALIAS_STOPWORDS = {
+    'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'on', 'set', 'order', 'group', 'limit',
+    'offset', 'using', 'returning', 'values', 'select', 'for', 'union', 'having', 'as', 'natural', 'full',
+    'window', 'default', 'on', 'do', 'except', 'intersect'
+}
+COLUMN = r'(?:([a-z_]\w*)\.)?([a-z_]\w*)'
+EQ_RE = re.compile(COLUMN + r'\s*(?:=(?!>)\s*(?:ANY\s*\()?|\bIN\s*\()', re.IGNORECASE)
+EQ_RIGHT_RE = re.compile(r'(?<![<>!])=\s*' + COLUMN + r'\b(?!\s*\()', re.IGNORECASE)
+RANGE_RE = re.compile(COLUMN + r'\s*(?:<=|>=|<(?!>)|(?<!-)>|\bBETWEEN\b)', re.IGNORECASE)
+ORDER_RE = re.compile(r'\bORDER BY\s+(.+?)(?=\bLIMIT\b|\bOFFSET\b|\bFOR\b|\bFETCH\b|\)|$)', re.IGNORECASE)
+ORDER_ITEM_RE = re.compile(r'^\s*' + COLUMN + r'(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?\s*$', re.IGNORECASE)
+JOIN_RIGHT_RE = re.compile(r'\s*' + COLUMN + r'\b(?!\s*\()', re.IGNORECASE)
+JOIN_LEFT_RE = re.compile(COLUMN + r'\s*$', re.IGNORECASE)
+SET_CLAUSE_RE = re.compile(r'\bSET\b.*?(?=\bWHERE\b|\bFROM\b|\bRETURNING\b|$)', re.IGNORECASE)
+WINDOW_RE = re.compile(r'\b(?:OVER|WITHIN GROUP)\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+
+
+class Finding:
+    def __init__(self, table: str, columns: List[Tuple[str, str]], reason: str):
+        self.table = table
+        self.columns = columns
+        self.reason = reason
+        self.locations: List[str] = []
+
+    @property
+    def key(self) -> Tuple[str, Tuple[str, ...]]:
+        return self.table, tuple(column for column, _ in self.columns)
+
+    def index_name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(column for column, _ in self.columns)}"
+
+    def ddl(self) -> str:
+        columns = ', '.join(f'{column} DESC' if direction == 'DESC' else column for column, direction in self.columns)
+        return f'CREATE INDEX IF NOT EXISTS {self.index_name()} ON {self.table}({columns});'
+
+
+# ---------------------------------------------------------------- схема и индексы
+
+class Schema:
+    '''Колонки таблиц и btree-индексы: {table: [(columns, unique)]}'''
+
+    def __init__(self):
+        self.columns: Dict[str, Set[str]] = {}
+        self.indexes: Dict[str, List[Tuple[List[str], bool]]] = {}
+        self.rows: Dict[str, float] = {}
+
+    def add_index(self, table: str, columns: List[str], unique: bool) -> None:
+        self.indexes.setdefault(table, []).append((columns, unique))
+
+
+def _index_columns(definition: str) -> Optional[List[str]]:
+    '''Колонки из "(a, b DESC)"; None для индексов по выражениям'''
+    columns = []
+    for part in definition.split(','):
+        match = re.match(r'^\s*"?([a-z_]\w*)"?(?:\s+(?:ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?\s*$', part, re.IGNORECASE)
+        if not match:
+            return None
+        columns.append(match.group(1).lower())
+    return columns
+
+
+def schema_from_migrations() -> Schema:
+    '''Колонки и индексы по тексту миграций (без базы): CREATE TABLE, ADD COLUMN, UNIQUE, CREATE INDEX'''
+    schema = Schema()
+    files = sorted(
+        (f for f in os.listdir(MIGRATIONS_DIR) if f.startswith('V') and f.endswith('.sql')),
+        key=lambda f: int(f[1:f.index('__')])
+    )
+    for name in files:
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+            text = re.sub(r'--[^\n]*', '', f.read())
+
+        for match in re.finditer(r'CREATE TABLE (?:IF NOT EXISTS )?(?:\w+\.)?(\w+)\s*\((.*?)\n\);', text, re.S | re.I):
+            table = match.group(1).lower()
+            columns = schema.columns.setdefault(table, set())
+            for line in match.group(2).split('\n'):
+                line = line.strip().rstrip(',')
+                unique = re.match(r'^(?:UNIQUE|PRIMARY KEY)\s*\(([^)]*)\)', line, re.I)
+                if unique:
+                    schema.add_index(table, _index_columns(unique.group(1)) or [], True)
+                    continue
+                column = re.match(r'^([a-z_]\w*)\s+(?!KEY\b)[A-Z]', line, re.I)
+                if not column or column.group(1).upper() in ('PRIMARY', 'CONSTRAINT', 'CHECK', 'FOREIGN'):
+                    continue
+                columns.add(column.group(1).lower())
+                if re.search(r'\bPRIMARY KEY\b|\bUNIQUE\b', line, re.I):
+                    schema.add_index(table, [column.group(1).lower()], True)
+
+        for match in re.finditer(r'ALTER TABLE (?:IF EXISTS )?(?:\w+\.)?(\w+)(.*?);', text, re.S | re.I):
+            table = match.group(1).lower()
+            for column in re.finditer(r'ADD COLUMN (?:IF NOT EXISTS )?([a-z_]\w*)([^,;]*)', match.group(2), re.I):
+                schema.columns.setdefault(table, set()).add(column.group(1).lower())
+                if re.search(r'\bUNIQUE\b', column.group(2), re.I):
+                    schema.add_index(table, [column.group(1).lower()], True)
+
+        for match in re.finditer(
+            r'CREATE (UNIQUE )?INDEX (?:IF NOT EXISTS )?\w+ ON (?:\w+\.)?(\w+)(?: USING (\w+))?\s*\(([^;]*?)\)\s*(WHERE[^;]*)?;',
+            text, re.I
+        ):
+            unique, table, method, definition, partial = match.groups()
+            columns = _index_columns(definition)
+            if columns and (method or 'btree').lower() == 'btree' and not partial:
+                schema.add_index(table.lower(), columns, bool(unique))
+    return schema
+
+
+def schema_from_database(dsn: str) -> Schema:
+    '''Колонки, btree-индексы (без частичных и по выражениям) и оценка числа строк из текущей схемы'''
+    import psycopg2
+
+    schema = Schema()
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT table_name, column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+        ''')
+        for table, column in cursor.fetchall():
+            schema.columns.setdefault(table, set()).add(column)
+
+        cursor.execute('''
+            SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = current_schema()
+        ''')
+        for table, definition in cursor.fetchall():
+            match = re.match(r'CREATE (UNIQUE )?INDEX \S+ ON \S+ USING (\w+) \((.*)\)$', definition)
+            if not match or match.group(2) != 'btree':
+                continue
+            columns = _index_columns(match.group(3))
+            if columns:
+                schema.add_index(table, columns, bool(match.group(1)))
+
+        cursor.execute('''
+            SELECT c.relname, c.reltuples FROM pg_class c
+            WHERE c.relnamespace = current_schema()::regnamespace AND c.relkind = 'r'
+        ''')
+        schema.rows = dict(cursor.fetchall())
+    finally:
+        conn.close()
+    return schema
+
+
+# ---------------------------------------------------------------- SQL из кода
+
+def iter_statements() -> List[Tuple[str, str]]:
+    '''(файл:строка, текст SQL) для строковых литералов и f-строк backend-функций; {…} в f-строках -> {}'''
+    statements = []
+    for function in sorted(os.listdir(BACKEND_DIR)):
+        directory = os.path.join(BACKEND_DIR, function)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+
+            nested: Set[int] = set()
+            docstrings: Set[int] = set()
+            for node in ast.walk(tree):
+                if isinstance(node, ast.JoinedStr):
+                    nested.update(id(value) for value in node.values)
+                if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+                    docstrings.add(id(node.value))
+
+            for node in ast.walk(tree):
+                if isinstance(node, ast.JoinedStr):
+                    text = ''.join(v.value if isinstance(v, ast.Constant) else '{}' for v in node.values)
+                elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+                    if id(node) in nested or id(node) in docstrings:
+                        continue
+                    text = node.value
+                else:
+                    continue
+                if SQL_RE.search(text) and CLAUSE_RE.search(text):
+                    location = f'{os.path.relpath(path, ROOT)}:{node.lineno}'
+                    statements.append((location, ' '.join(text.split())))
+    return statements
+
+
+def iter_list_specs() -> List[Tuple[str, Dict[str, Any]]]:
+    '''*_LIST_SPEC из модулей zalupa: table, sort, filters, default_sort (значения-литералы)'''
+    specs = []
+    directory = os.path.join(BACKEND_DIR, 'zalupa')
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.py'):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            if not (isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict)):
+                continue
+            targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            if not any(t.endswith('_LIST_SPEC') for t in targets):
+                continue
+            spec = {}
+            for key, value in zip(node.value.keys, node.value.values):
+                if isinstance(key, ast.Constant) and key.value in ('table', 'sort', 'filters', 'default_sort'):
+                    spec[key.value] = ast.literal_eval(value)
+            specs.append((f'{os.path.relpath(path, ROOT)}:{node.lineno}', spec))
+    return specs
+
+
+def _strip_column(expression: str) -> str:
+    return expression.split('.')[-1]
+
+
+def access_paths(statement: str, schema: Schema) -> List[Dict[str, Any]]:
+    '''
+    Пути доступа statement по таблицам: {table, eq: [...], join: [...], range: [...], order: [(col, dir)]}
+    join - колонки из eq, сравниваемые с колонкой другой таблицы (условия JOIN): они не фиксируют строку
+    и не делают сортировку по таблице ненужной
+    '''
+    aliases: Dict[str, str] = {}
+    for match in TABLE_RE.finditer(statement):
+        table, alias = match.group(1).lower(), (match.group(2) or '').lower()
+        if table not in schema.columns:
+            continue
+        aliases[table] = table
+        if alias and alias not in ALIAS_STOPWORDS:
+            aliases[alias] = table
+    tables = set(aliases.values())
+    if not tables:
+        return []
+
+    def resolve(alias: Optional[str], column: str) -> Optional[str]:
+        column = column.lower()
+        if alias:
+            table = aliases.get(alias.lower())
+            return table if table and column in schema.columns[table] else None
+        owners = [t for t in tables if column in schema.columns[t]]
+        return owners[0] if len(owners) == 1 else None
+
+    text = SET_CLAUSE_RE.sub(' ', statement) if re.match(r'\s*UPDATE\b', statement, re.I) else statement
+    text = re.sub(r'\bDO UPDATE SET\b.*$', ' ', text, flags=re.I)
+    predicate_text = ORDER_RE.sub(' ', WINDOW_RE.sub(' ', text))
+
+    paths: Dict[str, Dict[str, Any]] = OrderedDict()
+
+    def path(table: str) -> Dict[str, Any]:
+        return paths.setdefault(table, {'table': table, 'eq': [], 'join': [], 'range': [], 'order': []})
+
+    def other_side(regex, match) -> Optional[str]:
+        if regex is EQ_RE:
+            partner = JOIN_RIGHT_RE.match(predicate_text, match.end())
+        elif regex is EQ_RIGHT_RE:
+            partner = JOIN_LEFT_RE.search(predicate_text, 0, match.start())
+        else:
+            return None
+        return resolve(partner.group(1), partner.group(2)) if partner else None
+
+    for regex, kind in ((EQ_RE, 'eq'), (EQ_RIGHT_RE, 'eq'), (RANGE_RE, 'range')):
+        for match in regex.finditer(predicate_text):
+            table = resolve(match.group(1), match.group(2))
+            if match.group(2).lower().startswith(FLAG_PREFIXES):
+                continue
+            if not table:
+                continue
+            column = match.group(2).lower()
+            if column not in path(table)[kind]:
+                path(table)[kind].append(column)
+            partner = other_side(regex, match)
+            if partner and partner != table and column not in path(table)['join']:
+                path(table)['join'].append(column)
+
+    for clause in ORDER_RE.findall(WINDOW_RE.sub(' ', text)):
+        items = [ORDER_ITEM_RE.match(item) for item in clause.split(',')]
+        if not all(items):
+            continue
+        owners = {resolve(item.group(1), item.group(2)) for item in items}
+        if len(owners) != 1 or None in owners:
+            continue
+        table = owners.pop()
+        path(table)['order'] = [(item.group(2).lower(), (item.group(3) or 'ASC').upper()) for item in items]
+        break
+
+    return [p for p in paths.values() if p['eq'] or p['range'] or p['order']]
+
+
+def spec_paths(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''Пути доступа списка list_query: сортировка по умолчанию, с каждым фильтром и без'''
+    table = spec['table']
+    sort_key = spec['default_sort'].lstrip('-')
+    direction = 'DESC' if spec['default_sort'].startswith('-') else 'ASC'
+    order = [(_strip_column(spec['sort'][sort_key]), direction), ('id', direction)]
+    paths = [{'table': table, 'eq': [], 'join': [], 'range': [], 'order': order}]
+    for column, kind in spec.get('filters', {}).values():
+        if kind == 'bool':
+            continue
+        paths.append({'table': table, 'eq': [_strip_column(column)], 'join': [], 'range': [], 'order': order})
+    return paths
+
+
+# ---------------------------------------------------------------- покрытие
+
+def check_path(schema: Schema, access: Dict[str, Any]) -> Optional[Finding]:
+    '''None, если путь покрыт индексом, иначе предложение индекса'''
+    table = access['table']
+    indexes = schema.indexes.get(table, [])
+    # Для сортировки колонки условий JOIN не в счёт: значение в них меняется от строки к строке
+    eq_columns = [c for c in access['eq'] if c not in access['join']] if access['order'] else access['eq']
+    eq = set(eq_columns)
+    # Колонка из условия равенства в ORDER BY постоянна и на порядок не влияет
+    order = [item for item in access['order'] if item[0] not in eq]
+    # Строк на одно значение фильтра немного: досортировка по уникальному id индекса не требует
+    if eq and order and order[-1][0] == 'id':
+        order = order[:-1]
+
+    def leading_eq(columns: List[str]) -> int:
+        count = 0
+        for column in columns:
+            if column not in eq:
+                break
+            count += 1
+        return count
+
+    if order:
+        # Достаточно, чтобы после колонок равенства шла первая колонка сортировки: остальное досортирует incremental sort
+        if any(leading_eq(columns) == len(eq) and columns[len(eq):len(eq) + 1] == [order[0][0]] for columns, _ in indexes):
+            return None
+        columns = [(c, 'ASC') for c in eq_columns] + order
+        return Finding(table, columns, 'filter + sort' if eq_columns else 'sort')
+
+    if eq:
+        if any(leading_eq(columns) for columns, _ in indexes):
+            return None
+        return Finding(table, [(c, 'ASC') for c in eq_columns], 'filter')
+
+    if access['range'] and not any(columns[0] == access['range'][0] for columns, _ in indexes):
+        return Finding(table, [(access['range'][0], 'ASC')], 'range')
+    return None
+
+
+def advise(schema: Schema, min_rows: float) -> List[Finding]:
+    accesses: List[Tuple[str, Dict[str, Any]]] = []
+    for location, statement in iter_statements():
+        for access in access_paths(statement, schema):
+            accesses.append((location, access))
+    for location, spec in iter_list_specs():
+        for access in spec_paths(spec):
+            accesses.append((location, access))
+
+    findings: Dict[Tuple[str, Tuple[str, ...]], Finding] = OrderedDict()
+    for location, access in accesses:
+        table = access['table']
+        if table in SMALL_TABLES or (schema.rows and 0 <= schema.rows.get(table, 0) < min_rows):
+            continue
+        # Точечный доступ по первичному ключу всегда покрыт
+        if 'id' in access['eq'] and 'id' not in access['join']:
+            continue
+        finding = check_path(schema, access)
+        if finding is None:
+            continue
+        finding = findings.setdefault(finding.key, finding)
+        if location not in finding.locations:
+            finding.locations.append(location)
+    return list(findings.values())
+
+
+def render_migration(findings: List[Finding]) -> str:
+    lines = ['-- Индексы для путей доступа из кода обработчиков (benchmarks/index_advisor.py)']
+    for finding in findings:
+        lines.append(f"-- {finding.reason}: {', '.join(finding.locations)}")
+        lines.append(finding.ddl())
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suggest missing indexes for SQL used by the backend handlers')
+    parser.add_argument('--offline', action='store_true', help='read indexes from db_migrations/ instead of a database')
+    parser.add_argument('--local-postgres', action='store_true', help='migrate a throwaway Postgres and inspect it')
+    parser.add_argument('--min-rows', type=float, default=1000,
+                        help='skip tables with fewer estimated rows (database mode; -1 = never skip)')
+    parser.add_argument('--write', help='write the suggested CREATE INDEX statements to this migration file')
+    args = parser.parse_args()
+
+    if args.offline:
+        schema = schema_from_migrations()
+        findings = advise(schema, args.min_rows)
+    elif args.local_postgres:
+        from bench_endpoints import local_postgres, apply_migrations, SCHEMA
+        from psycopg2.extensions import make_dsn
+
+        with local_postgres() as base_dsn:
+            dsn = make_dsn(base_dsn, options=f'-c search_path={SCHEMA},public')
+            apply_migrations(dsn)
+            # На пустой базе размеры таблиц не показательны
+            findings = advise(schema_from_database(dsn), -1)
+    else:
+        dsn = os.environ.get('DATABASE_URL')
+        if not dsn:
+            sys.exit('DATABASE_URL is not set (or use --offline / --local-postgres)')
+        findings = advise(schema_from_database(dsn), args.min_rows)
+
+    if not findings:
+        print('all access paths are covered by indexes')
+        return
+
+    for finding in findings:
+        print(f'{finding.ddl()}\n    {finding.reason}: {", ".join(finding.locations)}')
+
+    if args.write:
+        with open(args.write, 'w', encoding='utf-8') as f:
+            f.write(render_migration(findings))
+        print(f'\nwrote {len(findings)} indexes to {args.write}')
+
+
+if __name__ == '__main__':
+    main()
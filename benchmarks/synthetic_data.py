@@ -0,0 +1,256 @@
+'''
+Генератор синтетических данных для бенчмарков: справочники, заказы с маршрутами и остановками,
+договоры, пользователи и PDF-шаблоны (настоящие PDF, собранные без сторонних библиотек).
+
+Используется bench_endpoints.py и bench_pdf.py; строки вставляются пачками через generate_series,
+поэтому заполнение 100 000 заказов занимает секунды.
+'''
+import json
+from typing import Dict, Any, List, Optional, Sequence
+
+from psycopg2.extras import execute_values
+
+# Поля договора, которые generate-pdf подставляет в шаблон (prepare_form_data)
+CONTRACT_FIELDS = (
+    'contract_number', 'contract_date', 'cargo', 'loading_addresses', 'unloading_addresses',
+    'loading_date', 'unloading_date', 'payment_amount', 'driver_full_name', 'driver_phone',
+    'vehicle_registration_number', 'vehicle_trailer_number', 'temperature_mode', 'additional_conditions',
+    'customer_name', 'customer_inn', 'customer_kpp', 'customer_ogrn', 'customer_legal_address',
+    'customer_director', 'carrier_name', 'carrier_inn', 'carrier_kpp', 'carrier_ogrn',
+    'carrier_legal_address', 'carrier_director', 'loading_seller_name', 'loading_seller_inn',
+    'unloading_buyer_name', 'unloading_buyer_inn'
+)
+
+DEFAULT_SCALE: Dict[str, int] = {
+    'contractors': 2000,
+    'drivers': 500,
+    'vehicles': 500,
+    'users': 200,
+    'orders': 5000,
+    'consignees_per_order': 2,
+    'routes_per_order': 3,
+    'stops_per_route': 2,
+    'contracts': 20000,
+    'templates': 5,
+    'template_pages': 3
+}
+
+
+def _pdf_string(text: str) -> bytes:
+    '''Литеральная строка PDF: латиница как есть, остальное - UTF-16BE с BOM (для имён и значений полей)'''
+    try:
+        raw = text.encode('latin-1')
+    except UnicodeEncodeError:
+        raw = b'\xfe\xff' + text.encode('utf-16-be')
+    raw = raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return b'(' + raw + b')'
+
+
+def make_pdf(pages: int = 1, placeholders: Sequence[str] = CONTRACT_FIELDS, form_fields: Sequence[str] = ()) -> bytes:
+    '''
+    Собирает PDF-шаблон
+    Args: pages - число страниц A4
+          placeholders - имена полей, которые печатаются в тексте каждой страницы как {{name}}
+          form_fields - имена текстовых полей AcroForm на первой странице (можно кириллицей)
+    Returns: байты PDF
+    '''
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b'')
+    pages_id = add(b'')
+    font_id = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+
+    page_ids = []
+    field_ids = []
+    for number in range(pages):
+        lines = [f'Contract template, page {number + 1} of {pages}']
+        lines += [f'{name}: {{{{{name}}}}}' for name in placeholders]
+        stream = [b'BT /F1 10 Tf 40 800 Td 12 TL']
+        for line in lines:
+            stream.append(_pdf_string(line) + b' Tj T*')
+        stream.append(b'ET')
+        content = b'\n'.join(stream)
+        content_id = add(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+
+        annots = b''
+        if number == 0 and form_fields:
+            page_id = len(objects) + len(form_fields) + 1
+            for index, name in enumerate(form_fields):
+                top = 780 - index * 22
+                field_ids.append(add(
+                    b'<< /Type /Annot /Subtype /Widget /FT /Tx /F 4 /T ' + _pdf_string(name)
+                    + b' /Rect [300 %d 560 %d] /P %d 0 R /DA (/Helv 10 Tf 0 g) >>' % (top - 18, top, page_id)
+                ))
+            annots = b' /Annots [' + b' '.join(b'%d 0 R' % i for i in field_ids) + b']'
+
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R'
+            b' /Resources << /Font << /F1 %d 0 R /Helv %d 0 R >> >>%s >>'
+            % (pages_id, content_id, font_id, font_id, annots)
+        ))
+
+    acroform = b''
+    if field_ids:
+        acroform = (
+            b' /AcroForm << /Fields [' + b' '.join(b'%d 0 R' % i for i in field_ids) + b']'
+            b' /DA (/Helv 0 Tf 0 g) /DR << /Font << /Helv %d 0 R >> >> /NeedAppearances true >>' % font_id
+        )
+    objects[catalog_id - 1] = b'<< /Type /Catalog /Pages %d 0 R%s >>' % (pages_id, acroform)
+    objects[pages_id - 1] = (
+        b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % i for i in page_ids) + b'] /Count %d >>' % pages
+    )
+
+    out = bytearray(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+SEED_SQL = {
+    'contractors': '''
+        INSERT INTO contractors (name, inn, kpp, ogrn, director, legal_address, is_seller, is_buyer, is_carrier)
+        SELECT (ARRAY['ООО Ромашка', 'АО Северный Терминал', 'ООО ТрансЛогистик', 'ИП Кузнецов', 'ООО Агроимпорт'])[1 + g %% 5] || ' ' || g,
+               lpad(g::text, 10, '7'), lpad(g::text, 9, '0'), lpad(g::text, 13, '1'),
+               (ARRAY['Иванов И.И.', 'Петров П.П.', 'Сидорова А.В.'])[1 + g %% 3],
+               'г. Москва, ул. Промышленная, д. ' || (g %% 300),
+               g %% 3 = 0, g %% 3 = 1, g %% 3 = 2
+        FROM generate_series(1, %s) g
+    ''',
+    'drivers': '''
+        INSERT INTO drivers (
+            last_name, first_name, middle_name, phone, passport_series, passport_number,
+            passport_date, passport_issued, license_series, license_number, license_date, license_issued
+        )
+        SELECT 'Иванов' || g, 'Пётр', 'Сергеевич', '+7900' || lpad(g::text, 7, '0'), '4510', lpad(g::text, 6, '0'),
+               DATE '2015-01-01' + (g %% 3000), 'ОВД района ' || g, '77АА', lpad(g::text, 6, '0'),
+               DATE '2018-01-01' + (g %% 2000), 'ГИБДД ' || g
+        FROM generate_series(1, %s) g
+    ''',
+    'vehicles': '''
+        INSERT INTO vehicles (brand, registration_number, capacity, trailer_number, trailer_type)
+        SELECT 'Volvo FH', 'А' || lpad(g::text, 3, '0') || 'ВС77', 20 + (g %% 5), 'ЕА' || g || '77', 'Тент'
+        FROM generate_series(1, %s) g
+    ''',
+    'users': '''
+        INSERT INTO users (username, email, full_name, is_active)
+        SELECT 'bench_user_' || g, 'bench_user_' || g || '@example.com', 'Пользователь ' || g, g %% 10 <> 0
+        FROM generate_series(1, %s) g
+        ON CONFLICT DO NOTHING
+    ''',
+    'orders': '''
+        INSERT INTO orders (prefix, order_date, route_number, invoice, trak, weight, full_route)
+        SELECT (ARRAY['ТЛ', 'ЭКС', 'ИМП'])[1 + g %% 3], CURRENT_DATE - (g %% 365), 'R-' || g,
+               'INV-' || g, 'TRK-' || g, 1 + (g %% 40), 'Москва → Новороссийск'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    ''',
+    'consignees': '''
+        INSERT INTO order_consignees (order_id, contractor_id, name, note, position)
+        SELECT o.id, c.ids[1 + (o.id * 7 + p) %% c.n], 'Грузополучатель ' || p, NULL, p - 1
+        FROM unnest(%s::int[]) o(id)
+        CROSS JOIN generate_series(1, %s) p
+        CROSS JOIN (SELECT array_agg(id) AS ids, count(*)::int AS n FROM contractors) c
+    ''',
+    'routes': '''
+        INSERT INTO order_routes (order_id, from_address, to_address, vehicle_id, driver_name, loading_date, position)
+        SELECT o.id, 'г. Москва, склад ' || p, 'г. Новороссийск, терминал ' || p,
+               v.ids[1 + (o.id + p) %% v.n], 'Иванов Пётр Сергеевич', CURRENT_DATE - (o.id %% 30), p - 1
+        FROM unnest(%s::int[]) o(id)
+        CROSS JOIN generate_series(1, %s) p
+        CROSS JOIN (SELECT array_agg(id) AS ids, count(*)::int AS n FROM vehicles) v
+        RETURNING id
+    ''',
+    'stops': '''
+        INSERT INTO route_stops (route_id, stop_type, address, note, position)
+        SELECT r.id, (ARRAY['loading', 'unloading', 'customs'])[1 + p %% 3], 'г. Тверь, остановка ' || p, NULL, p - 1
+        FROM unnest(%s::int[]) r(id)
+        CROSS JOIN generate_series(1, %s) p
+    ''',
+    'contracts': '''
+        INSERT INTO contracts (
+            contract_number, contract_date, customer_id, carrier_id, loading_seller_id, unloading_buyer_id,
+            cargo, loading_addresses, unloading_addresses, loading_date, unloading_date, payment_amount,
+            temperature_mode, driver_full_name, driver_phone, vehicle_registration_number, vehicle_trailer_number
+        )
+        SELECT 'SYN-' || g, DATE '2023-01-01' + (g %% 700),
+               c.ids[1 + g %% c.n], c.ids[1 + (g * 7) %% c.n], c.ids[1 + (g * 11) %% c.n], c.ids[1 + (g * 13) %% c.n],
+               (ARRAY['Цемент М500', 'Щебень гранитный', 'Зерно пшеница', 'Металлопрокат', 'Пиломатериалы'])[1 + g %% 5],
+               jsonb_build_array('г. ' || (ARRAY['Москва', 'Новороссийск', 'Казань'])[1 + g %% 3] || ', ул. Складская, д. ' || (g %% 200)),
+               jsonb_build_array('г. ' || (ARRAY['Самара', 'Воронеж', 'Тверь'])[1 + g %% 3] || ', промзона, стр. ' || (g %% 50)),
+               '01.06.2024', '05.06.2024', 10000 + g %% 90000, '+2..+6 °C',
+               (ARRAY['Иванов Пётр Сергеевич', 'Смирнов Алексей Иванович', 'Кузнецов Олег Петрович'])[1 + g %% 3],
+               '+7900' || lpad((g %% 10000000)::text, 7, '0'),
+               'А' || lpad((g %% 1000)::text, 3, '0') || 'ВС77', 'ЕА' || (g %% 9000) || '77'
+        FROM generate_series(1, %s) g,
+             (SELECT array_agg(id) AS ids, count(*)::int AS n FROM contractors) c
+    '''
+}
+
+ANALYZE_TABLES = (
+    'contractors', 'drivers', 'vehicles', 'users', 'orders', 'order_consignees',
+    'order_routes', 'route_stops', 'contracts', 'templates'
+)
+
+
+def seed(cursor, scale: Optional[Dict[str, int]] = None, log=print) -> Dict[str, Any]:
+    '''
+    Заполняет базу синтетическими данными в текущей транзакции (коммит - на вызывающем)
+    Args: scale - переопределения DEFAULT_SCALE
+    Returns: счётчики вставленных строк по таблицам
+    '''
+    scale = {**DEFAULT_SCALE, **(scale or {})}
+    counts: Dict[str, Any] = {}
+
+    for table in ('contractors', 'drivers', 'vehicles', 'users'):
+        cursor.execute(SEED_SQL[table], (scale[table],))
+        counts[table] = cursor.rowcount
+
+    cursor.execute(SEED_SQL['orders'], (scale['orders'],))
+    order_ids = [row[0] for row in cursor.fetchall()]
+    counts['orders'] = len(order_ids)
+
+    cursor.execute(SEED_SQL['consignees'], (order_ids, scale['consignees_per_order']))
+    counts['order_consignees'] = cursor.rowcount
+
+    cursor.execute(SEED_SQL['routes'], (order_ids, scale['routes_per_order']))
+    route_ids = [row[0] for row in cursor.fetchall()]
+    counts['order_routes'] = len(route_ids)
+
+    cursor.execute(SEED_SQL['stops'], (route_ids, scale['stops_per_route']))
+    counts['route_stops'] = cursor.rowcount
+
+    cursor.execute(SEED_SQL['contracts'], (scale['contracts'],))
+    counts['contracts'] = cursor.rowcount
+
+    templates = []
+    for number in range(scale['templates']):
+        pages = max(1, scale['template_pages'] * (number + 1) // scale['templates'])
+        form_fields = CONTRACT_FIELDS[:10] if number % 2 else ()
+        templates.append((
+            f'Синтетический шаблон {number + 1}', f'synthetic_{number + 1}.pdf',
+            json.dumps([{'field': name} for name in form_fields]), make_pdf(pages, form_fields=form_fields)
+        ))
+    execute_values(
+        cursor,
+        'INSERT INTO templates (name, file_name, field_mappings, file_data) VALUES %s',
+        templates,
+        template='(%s, %s, %s::jsonb, %s)'
+    )
+    counts['templates'] = len(templates)
+
+    for table in ANALYZE_TABLES:
+        cursor.execute(f'ANALYZE {table}')
+
+    log(f"seeded: {', '.join(f'{table}={count}' for table, count in counts.items())}")
+    return counts
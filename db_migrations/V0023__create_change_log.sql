@@ -0,0 +1,35 @@
+-- Журнал изменений для инкрементальной синхронизации клиента (?resource=changes)
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    record_id INTEGER NOT NULL,
+    op VARCHAR(10) NOT NULL CHECK (op IN ('upsert', 'delete')),
+    changed_at TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log(changed_at);
+
+CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO change_log (table_name, record_id, op) VALUES (TG_TABLE_NAME, OLD.id, 'delete');
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO change_log (table_name, record_id, op) VALUES (TG_TABLE_NAME, NEW.id, 'upsert');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_orders_change_log AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION log_change();
+CREATE TRIGGER trg_contracts_change_log AFTER INSERT OR UPDATE OR DELETE ON contracts
+    FOR EACH ROW EXECUTE FUNCTION log_change();
+CREATE TRIGGER trg_contractors_change_log AFTER INSERT OR UPDATE OR DELETE ON contractors
+    FOR EACH ROW EXECUTE FUNCTION log_change();
+CREATE TRIGGER trg_drivers_change_log AFTER INSERT OR UPDATE OR DELETE ON drivers
+    FOR EACH ROW EXECUTE FUNCTION log_change();
+CREATE TRIGGER trg_vehicles_change_log AFTER INSERT OR UPDATE OR DELETE ON vehicles
+    FOR EACH ROW EXECUTE FUNCTION log_change();
+
+COMMENT ON TABLE change_log IS 'Журнал изменений orders, contracts, contractors, drivers, vehicles (upsert/delete) для выдачи дельт клиенту';
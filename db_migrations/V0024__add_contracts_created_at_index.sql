@@ -0,0 +1,2 @@
+-- Индекс для keyset-пагинации списка договоров по (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_contracts_created_at_id ON contracts(created_at DESC, id DESC);
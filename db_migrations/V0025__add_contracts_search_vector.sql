@@ -0,0 +1,15 @@
+-- Полнотекстовый поиск по договорам-заявкам (русская конфигурация)
+ALTER TABLE contracts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(contract_number, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(cargo, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(driver_full_name, '') || ' ' || coalesce(vehicle_registration_number, '')), 'C') ||
+    setweight(jsonb_to_tsvector('russian', coalesce(loading_addresses, '[]'::jsonb) || coalesce(unloading_addresses, '[]'::jsonb), '["string"]'), 'D')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_contracts_search_vector ON contracts USING gin(search_vector);
+
+-- Названия контрагентов в сгенерированную колонку попасть не могут (другая таблица),
+-- поэтому ищутся отдельно по своему индексу и присоединяются по customer_id/carrier_id/...
+CREATE INDEX IF NOT EXISTS idx_contractors_name_search ON contractors USING gin(to_tsvector('russian', name));
+
+COMMENT ON COLUMN contracts.search_vector IS 'Поисковый вектор: номер (A), груз (B), водитель и номер ТС (C), адреса погрузки/разгрузки (D)';
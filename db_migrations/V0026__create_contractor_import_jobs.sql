@@ -0,0 +1,28 @@
+-- Фоновый импорт контрагентов по списку ИНН с обогащением через DaData
+CREATE TABLE IF NOT EXISTS contractor_import_jobs (
+    id SERIAL PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done')),
+    is_seller BOOLEAN NOT NULL DEFAULT false,
+    is_buyer BOOLEAN NOT NULL DEFAULT false,
+    is_carrier BOOLEAN NOT NULL DEFAULT false,
+    total INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Одна строка на ИНН: состояние обработки хранится здесь, поэтому прерванный импорт продолжается с места остановки
+CREATE TABLE IF NOT EXISTS contractor_import_items (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES contractor_import_jobs(id) ON DELETE CASCADE,
+    inn VARCHAR(12) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'running', 'created', 'exists', 'not_found', 'failed')),
+    contractor_id INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (job_id, inn)
+);
+
+CREATE INDEX IF NOT EXISTS idx_contractor_import_items_job_status ON contractor_import_items(job_id, status);
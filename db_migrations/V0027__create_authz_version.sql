@@ -0,0 +1,25 @@
+-- Счётчик версии прав доступа: увеличивается при любом изменении ролей, прав и привязок пользователей,
+-- по нему функции сбрасывают закэшированные права (authz.py)
+CREATE TABLE IF NOT EXISTS authz_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO authz_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_authz_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE authz_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_roles_authz_version AFTER INSERT OR UPDATE OR DELETE ON roles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_authz_version();
+CREATE TRIGGER trg_role_permissions_authz_version AFTER INSERT OR UPDATE OR DELETE ON role_permissions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_authz_version();
+CREATE TRIGGER trg_user_roles_authz_version AFTER INSERT OR UPDATE OR DELETE ON user_roles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_authz_version();
+CREATE TRIGGER trg_users_authz_version AFTER UPDATE OF is_active, is_admin OR DELETE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_authz_version();
@@ -0,0 +1,13 @@
+-- Входящие update от Telegram: ключ update_id защищает от повторной доставки вебхука
+CREATE TABLE IF NOT EXISTS telegram_inbox (
+    update_id BIGINT PRIMARY KEY,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    claimed_at TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_telegram_inbox_pending ON telegram_inbox(update_id) WHERE status IN ('pending', 'processing');
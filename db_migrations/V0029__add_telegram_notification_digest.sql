@@ -0,0 +1,17 @@
+-- Режим дайджеста: события одного типа для одного получателя в пределах окна собираются в одно сообщение
+-- digest_window_seconds = 0 - отправка каждого события сразу, как раньше
+ALTER TABLE telegram_settings ADD COLUMN IF NOT EXISTS digest_window_seconds INTEGER NOT NULL DEFAULT 0
+    CHECK (digest_window_seconds >= 0);
+ALTER TABLE telegram_settings ADD COLUMN IF NOT EXISTS digest_text TEXT;
+
+-- Окно по умолчанию не включается (0): администратор задаёт его в настройках; заголовок готов заранее
+UPDATE telegram_settings
+SET digest_text = '📦 Новых заказов: {count}'
+WHERE event_type = 'order_created' AND digest_text IS NULL;
+
+-- Очередь уведомлений: отрисованное сообщение и получатель, sent-строки - история отправок для окна
+ALTER TABLE telegram_notification_queue ADD COLUMN IF NOT EXISTS chat_id BIGINT;
+ALTER TABLE telegram_notification_queue ADD COLUMN IF NOT EXISTS message TEXT;
+ALTER TABLE telegram_notification_queue ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_queue_recipient ON telegram_notification_queue(event_type, chat_id, status, sent_at);
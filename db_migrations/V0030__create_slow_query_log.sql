@@ -0,0 +1,17 @@
+-- Журнал медленных запросов режима диагностики (SLOW_QUERY_MS): текст запроса без значений,
+-- форма параметров и выборочно план EXPLAIN (ANALYZE, BUFFERS)
+CREATE TABLE IF NOT EXISTS slow_query_log (
+    id BIGSERIAL PRIMARY KEY,
+    fingerprint VARCHAR(32) NOT NULL,
+    statement TEXT NOT NULL,
+    params_shape JSONB,
+    resource VARCHAR(50),
+    method VARCHAR(10),
+    duration_ms DOUBLE PRECISION NOT NULL,
+    row_count INTEGER,
+    plan TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_query_log_created_at ON slow_query_log(created_at);
+CREATE INDEX IF NOT EXISTS idx_slow_query_log_fingerprint ON slow_query_log(fingerprint, created_at DESC);
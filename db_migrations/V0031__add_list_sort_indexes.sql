@@ -0,0 +1,15 @@
+-- Индексы для путей доступа из кода обработчиков (benchmarks/index_advisor.py)
+-- sort: backend/zalupa/contractors.py:29
+CREATE INDEX IF NOT EXISTS idx_contractors_created_at_id ON contractors(created_at DESC, id DESC);
+-- filter + sort: backend/zalupa/drivers.py:29
+CREATE INDEX IF NOT EXISTS idx_drivers_company_id_created_at ON drivers(company_id, created_at DESC);
+-- sort: backend/zalupa/vehicles.py:22
+CREATE INDEX IF NOT EXISTS idx_vehicles_created_at_id ON vehicles(created_at DESC, id DESC);
+-- filter + sort: backend/zalupa/vehicles.py:22
+CREATE INDEX IF NOT EXISTS idx_vehicles_company_id_created_at ON vehicles(company_id, created_at DESC);
+-- filter + sort: backend/zalupa/vehicles.py:22
+CREATE INDEX IF NOT EXISTS idx_vehicles_driver_id_created_at ON vehicles(driver_id, created_at DESC);
+
+-- Одноколоночные индексы стали префиксами составных
+DROP INDEX IF EXISTS idx_vehicles_company_id;
+DROP INDEX IF EXISTS idx_vehicles_driver_id;
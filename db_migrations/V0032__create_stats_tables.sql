@@ -0,0 +1,125 @@
+-- Сводные таблицы для дашборда (?resource=stats): строки по дням, поддерживаются триггерами на orders,
+-- contracts и order_routes. Представления *_source считают то же с нуля - для пересчёта и сверки (stats.py)
+
+CREATE TABLE IF NOT EXISTS stats_orders_daily (
+    day DATE NOT NULL,
+    prefix VARCHAR(10) NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    weight_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, prefix)
+);
+
+CREATE TABLE IF NOT EXISTS stats_contracts_daily (
+    day DATE NOT NULL,
+    party VARCHAR(10) NOT NULL CHECK (party IN ('customer', 'carrier')),
+    contractor_id INTEGER NOT NULL,
+    contracts_count INTEGER NOT NULL DEFAULT 0,
+    amount_total DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, party, contractor_id)
+);
+
+CREATE TABLE IF NOT EXISTS stats_routes_daily (
+    day DATE PRIMARY KEY,
+    routes_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE VIEW stats_orders_daily_source AS
+    SELECT order_date AS day, prefix, count(*)::int AS orders_count, COALESCE(sum(weight), 0)::decimal(14, 2) AS weight_total
+    FROM orders
+    GROUP BY order_date, prefix;
+
+CREATE OR REPLACE VIEW stats_contracts_daily_source AS
+    SELECT c.contract_date AS day, p.party, p.contractor_id,
+           count(*)::int AS contracts_count, COALESCE(sum(c.payment_amount), 0)::decimal(16, 2) AS amount_total
+    FROM contracts c
+    CROSS JOIN LATERAL (VALUES ('customer', c.customer_id), ('carrier', c.carrier_id)) p(party, contractor_id)
+    WHERE p.contractor_id IS NOT NULL
+    GROUP BY c.contract_date, p.party, p.contractor_id;
+
+CREATE OR REPLACE VIEW stats_routes_daily_source AS
+    SELECT loading_date AS day, count(*)::int AS routes_count
+    FROM order_routes
+    WHERE loading_date IS NOT NULL
+    GROUP BY loading_date;
+
+CREATE OR REPLACE FUNCTION stats_orders_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE stats_orders_daily
+        SET orders_count = orders_count - 1, weight_total = weight_total - COALESCE(OLD.weight, 0)
+        WHERE day = OLD.order_date AND prefix = OLD.prefix;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO stats_orders_daily (day, prefix, orders_count, weight_total)
+        VALUES (NEW.order_date, NEW.prefix, 1, COALESCE(NEW.weight, 0))
+        ON CONFLICT (day, prefix) DO UPDATE
+        SET orders_count = stats_orders_daily.orders_count + 1,
+            weight_total = stats_orders_daily.weight_total + EXCLUDED.weight_total;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_contracts_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE stats_contracts_daily s
+        SET contracts_count = s.contracts_count - 1, amount_total = s.amount_total - COALESCE(OLD.payment_amount, 0)
+        FROM (VALUES ('customer', OLD.customer_id), ('carrier', OLD.carrier_id)) p(party, contractor_id)
+        WHERE s.day = OLD.contract_date AND s.party = p.party AND s.contractor_id = p.contractor_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO stats_contracts_daily (day, party, contractor_id, contracts_count, amount_total)
+        SELECT NEW.contract_date, p.party, p.contractor_id, 1, COALESCE(NEW.payment_amount, 0)
+        FROM (VALUES ('customer', NEW.customer_id), ('carrier', NEW.carrier_id)) p(party, contractor_id)
+        WHERE p.contractor_id IS NOT NULL
+        ON CONFLICT (day, party, contractor_id) DO UPDATE
+        SET contracts_count = stats_contracts_daily.contracts_count + 1,
+            amount_total = stats_contracts_daily.amount_total + EXCLUDED.amount_total;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_routes_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.loading_date IS NOT NULL THEN
+            UPDATE stats_routes_daily SET routes_count = routes_count - 1 WHERE day = OLD.loading_date;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.loading_date IS NOT NULL THEN
+            INSERT INTO stats_routes_daily (day, routes_count) VALUES (NEW.loading_date, 1)
+            ON CONFLICT (day) DO UPDATE SET routes_count = stats_routes_daily.routes_count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_orders_stats AFTER INSERT OR DELETE OR UPDATE OF order_date, prefix, weight ON orders
+    FOR EACH ROW EXECUTE FUNCTION stats_orders_apply();
+CREATE TRIGGER trg_contracts_stats
+    AFTER INSERT OR DELETE OR UPDATE OF contract_date, customer_id, carrier_id, payment_amount ON contracts
+    FOR EACH ROW EXECUTE FUNCTION stats_contracts_apply();
+CREATE TRIGGER trg_order_routes_stats AFTER INSERT OR DELETE OR UPDATE OF loading_date ON order_routes
+    FOR EACH ROW EXECUTE FUNCTION stats_routes_apply();
+
+-- Начальное заполнение по существующим данным
+INSERT INTO stats_orders_daily (day, prefix, orders_count, weight_total)
+    SELECT day, prefix, orders_count, weight_total FROM stats_orders_daily_source
+    ON CONFLICT DO NOTHING;
+INSERT INTO stats_contracts_daily (day, party, contractor_id, contracts_count, amount_total)
+    SELECT day, party, contractor_id, contracts_count, amount_total FROM stats_contracts_daily_source
+    ON CONFLICT DO NOTHING;
+INSERT INTO stats_routes_daily (day, routes_count)
+    SELECT day, routes_count FROM stats_routes_daily_source
+    ON CONFLICT DO NOTHING;
+
+COMMENT ON TABLE stats_orders_daily IS 'Заказы и тоннаж по дням (order_date) и префиксам - для дашборда';
+COMMENT ON TABLE stats_contracts_daily IS 'Число и сумма договоров по дням (contract_date) для каждого заказчика и перевозчика';
+COMMENT ON TABLE stats_routes_daily IS 'Число маршрутов по дате погрузки (loading_date)';
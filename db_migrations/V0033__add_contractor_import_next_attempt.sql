@@ -0,0 +1,2 @@
+-- Повтор ИНН после ошибки DaData не раньше next_attempt_at (экспоненциальная пауза), а не сразу следующей пачкой
+ALTER TABLE contractor_import_items ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
@@ -0,0 +1,3 @@
+-- Ответы на update сохраняются в той же транзакции, что и изменения команды:
+-- повторная обработка только отправляет их заново, не выполняя команду второй раз
+ALTER TABLE telegram_inbox ADD COLUMN IF NOT EXISTS replies JSONB;
@@ -0,0 +1,16 @@
+-- Индексы для путей доступа из кода обработчиков (benchmarks/index_advisor.py)
+-- sort: backend/zalupa/invites.py:156
+CREATE INDEX IF NOT EXISTS idx_users_invite_created_at ON users(invite_created_at DESC);
+-- filter + sort: backend/zalupa/orders.py:178, backend/zalupa/orders.py:276, backend/zalupa/orders.py:80
+CREATE INDEX IF NOT EXISTS idx_order_consignees_order_id_position ON order_consignees(order_id, position);
+-- filter + sort: backend/zalupa/orders.py:195, backend/zalupa/orders.py:97
+CREATE INDEX IF NOT EXISTS idx_order_routes_order_id_position ON order_routes(order_id, position);
+-- filter + sort: backend/zalupa/orders.py:214, backend/zalupa/orders.py:116
+CREATE INDEX IF NOT EXISTS idx_route_stops_route_id_position ON route_stops(route_id, position);
+-- sort: backend/zalupa/users.py:133
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at DESC);
+
+-- Одноколоночные индексы стали префиксами составных
+DROP INDEX IF EXISTS idx_order_consignees_order_id;
+DROP INDEX IF EXISTS idx_order_routes_order_id;
+DROP INDEX IF EXISTS idx_route_stops_route_id;
@@ -0,0 +1,13 @@
+-- Порядок журнала по транзакциям: txid записывающей транзакции, лента отдаёт только записи с txid
+-- ниже xmin снимка (все такие транзакции завершены), курсор - (txid, id)
+ALTER TABLE change_log ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL DEFAULT txid_current();
+
+CREATE INDEX IF NOT EXISTS idx_change_log_txid_id ON change_log(txid, id);
+
+-- Граница очищенной части журнала: курсоры старее неё получают 410 и загружают данные заново
+CREATE TABLE IF NOT EXISTS change_log_horizon (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    txid BIGINT NOT NULL,
+    log_id BIGINT NOT NULL,
+    pruned_at TIMESTAMP
+);
@@ -0,0 +1,3 @@
+-- Сколько ответов из replies уже доставлено: повторная обработка отправляет только остальные,
+-- а update закрывается (done) после доставки всех
+ALTER TABLE telegram_inbox ADD COLUMN IF NOT EXISTS replies_sent INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,8 @@
+-- Заказы становятся защищённым ресурсом (от них зависит и сводка stats).
+-- Чтобы текущие пользователи не потеряли доступ, всем существующим ролям выдаются
+-- те же права на orders, что у них были на contracts
+INSERT INTO role_permissions (role_id, resource, can_create, can_read, can_update, can_remove)
+SELECT role_id, 'orders', can_create, can_read, can_update, can_remove
+FROM role_permissions
+WHERE resource = 'contracts'
+ON CONFLICT (role_id, resource) DO NOTHING;
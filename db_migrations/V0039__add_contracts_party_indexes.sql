@@ -0,0 +1,4 @@
+-- Поиск договоров собирает кандидатов по каждой стороне договора отдельной индексной выборкой;
+-- для customer_id и carrier_id индексы уже есть (V0021)
+CREATE INDEX IF NOT EXISTS idx_contracts_loading_seller_id ON contracts(loading_seller_id);
+CREATE INDEX IF NOT EXISTS idx_contracts_unloading_buyer_id ON contracts(unloading_buyer_id);
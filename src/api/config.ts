@@ -18,11 +18,38 @@ export const API_CONFIG = {
     users: FUNC_URLS.zalupa + '?resource=users',
     roles: FUNC_URLS.zalupa + '?resource=roles',
     invites: FUNC_URLS.zalupa + '?resource=invites',
+    stats: FUNC_URLS.zalupa + '?resource=stats',
     zalupa: FUNC_URLS.zalupa,
     // В будущем: drivers: `${BASE_URL}/drivers.php`
   }
 };
 
+// Токен read-your-writes: бэкенд возвращает его после записи, и пока он действует,
+// чтения этого клиента идут на основную базу, а не на реплику с отставанием
+const READ_TOKEN_HEADER = 'X-Read-Primary-Until';
+let readToken: string | null = null;
+
+export function readTokenHeaders(): Record<string, string> {
+  return readToken ? { [READ_TOKEN_HEADER]: readToken } : {};
+}
+
+export function rememberReadToken(response: Response) {
+  const token = response.headers.get(READ_TOKEN_HEADER);
+  if (token) {
+    readToken = token;
+  }
+}
+
+// Подписанный токен пользователя (выдаёт администратор через diagnostics&action=user_token):
+// бэкенд проверяет права по нему, а не по X-User-Id, который может подставить любой клиент
+const USER_TOKEN_HEADER = 'X-User-Token';
+const USER_TOKEN_KEY = 'userToken';
+
+export function userTokenHeaders(): Record<string, string> {
+  const token = localStorage.getItem(USER_TOKEN_KEY);
+  return token ? { [USER_TOKEN_HEADER]: token } : {};
+}
+
 // Хелпер для fetch с обработкой ошибок
 export async function apiRequest(url: string, options?: RequestInit) {
   try {
@@ -30,9 +57,12 @@ export async function apiRequest(url: string, options?: RequestInit) {
       ...options,
       headers: {
         'Content-Type': 'application/json',
+        ...readTokenHeaders(),
+        ...userTokenHeaders(),
         ...options?.headers,
       },
     });
+    rememberReadToken(response);
 
     const data = await response.json();
 
@@ -61,9 +61,9 @@ export async function createContract(contract: Contract): Promise<CreateContract
   });
 }
 
-// Получить все договоры-заявки
+// Получить все договоры-заявки (сокращённые записи для страницы списка)
 export async function getContracts(): Promise<GetContractsResponse> {
-  return apiRequest(API_CONFIG.ENDPOINTS.contracts, {
+  return apiRequest(`${API_CONFIG.ENDPOINTS.contracts}&view=summary`, {
     method: 'GET',
   });
 }
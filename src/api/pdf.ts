@@ -1,4 +1,5 @@
 import funcUrls from '../../backend/func2url.json';
+import { readTokenHeaders } from './config';
 
 const GENERATE_PDF_URL = funcUrls['generate-pdf'];
 
@@ -19,6 +20,7 @@ export async function generatePdf(request: GeneratePdfRequest): Promise<Generate
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...readTokenHeaders(),
     },
     body: JSON.stringify(request),
   });
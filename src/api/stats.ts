@@ -0,0 +1,38 @@
+// Stats API - показатели дашборда из сводных таблиц
+import { API_CONFIG, apiRequest } from './config';
+
+export interface DailyOrders {
+  day: string;
+  orders: number;
+  weight: number;
+}
+
+export interface PrefixTonnage {
+  prefix: string;
+  orders: number;
+  weight: number;
+}
+
+export interface PartyTotal {
+  contractorId: number;
+  name: string | null;
+  contracts: number;
+  amount: number;
+}
+
+export interface DashboardStats {
+  from: string;
+  to: string;
+  ordersPerDay: DailyOrders[];
+  tonnageByPrefix: PrefixTonnage[];
+  contractsByCustomer: PartyTotal[];
+  contractsByCarrier: PartyTotal[];
+  activeRoutesToday: number;
+}
+
+// Получить показатели за последние days дней
+export async function getDashboardStats(days = 30, top = 10): Promise<DashboardStats> {
+  return apiRequest(`${API_CONFIG.ENDPOINTS.stats}&days=${days}&top=${top}`, {
+    method: 'GET',
+  });
+}
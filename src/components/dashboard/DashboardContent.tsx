@@ -1,3 +1,4 @@
+import { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
 import { Button } from '@/components/ui/button';
@@ -6,6 +7,9 @@ import { ScrollArea } from '@/components/ui/scroll-area';
 import { Separator } from '@/components/ui/separator';
 import Icon from '@/components/ui/icon';
 import TopBar from '@/components/TopBar';
+import { getDashboardStats, DashboardStats } from '@/api/stats';
+
+const STATS_DAYS = 30;
 
 interface Order {
   id: string;
@@ -44,11 +48,36 @@ export default function DashboardContent({ onMenuClick, onRefresh }: DashboardCo
     { id: '4', type: 'alert', title: 'Требуется документ', message: 'ORD-2847 ожидает сертификат качества', time: '5 часов назад' },
   ];
 
+  const [dashboardStats, setDashboardStats] = useState<DashboardStats | null>(null);
+
+  useEffect(() => {
+    getDashboardStats(STATS_DAYS)
+      .then(setDashboardStats)
+      .catch(() => setDashboardStats(null));
+  }, []);
+
+  const formatNumber = (value: number) => value.toLocaleString('ru-RU', { maximumFractionDigits: 1 });
+
+  const totalOrders = dashboardStats?.ordersPerDay.reduce((sum, day) => sum + day.orders, 0) ?? 0;
+  const totalWeight = dashboardStats?.ordersPerDay.reduce((sum, day) => sum + day.weight, 0) ?? 0;
+  const topPrefix = dashboardStats?.tonnageByPrefix[0];
+  const topCustomer = dashboardStats?.contractsByCustomer[0];
+
   const stats = [
-    { label: 'Активных заказов', value: '124', icon: 'Package', trend: '+12%' },
-    { label: 'В пути', value: '87', icon: 'Truck', trend: '+8%' },
-    { label: 'Партнеров', value: '45', icon: 'Users', trend: '+3' },
-    { label: 'Доставлено за месяц', value: '1,247', icon: 'CheckCircle2', trend: '+18%' },
+    { label: `Заказов за ${STATS_DAYS} дней`, value: dashboardStats ? formatNumber(totalOrders) : '—', icon: 'Package', trend: null },
+    {
+      label: `Тоннаж за ${STATS_DAYS} дней`,
+      value: dashboardStats ? formatNumber(totalWeight) : '—',
+      icon: 'Weight',
+      trend: topPrefix ? `${topPrefix.prefix}: ${formatNumber(topPrefix.weight)}` : null
+    },
+    { label: 'Маршрутов сегодня', value: dashboardStats ? formatNumber(dashboardStats.activeRoutesToday) : '—', icon: 'Truck', trend: null },
+    {
+      label: 'Крупнейший заказчик',
+      value: topCustomer?.name || '—',
+      icon: 'Users',
+      trend: topCustomer ? `${formatNumber(topCustomer.amount)} ₽` : null
+    },
   ];
 
   const getStatusColor = (status: Order['status']) => {
@@ -97,10 +126,12 @@ export default function DashboardContent({ onMenuClick, onRefresh }: DashboardCo
               </CardHeader>
               <CardContent>
                 <div className="flex items-baseline gap-2">
-                  <div className="text-2xl font-bold">{stat.value}</div>
-                  <Badge variant="outline" className="bg-green-50 text-green-700 border-green-200">
-                    {stat.trend}
-                  </Badge>
+                  <div className="text-2xl font-bold truncate">{stat.value}</div>
+                  {stat.trend && (
+                    <Badge variant="outline" className="bg-green-50 text-green-700 border-green-200">
+                      {stat.trend}
+                    </Badge>
+                  )}
                 </div>
               </CardContent>
             </Card>
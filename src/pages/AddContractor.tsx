@@ -4,6 +4,7 @@ import { Button } from '@/components/ui/button';
 import TopBar from '@/components/TopBar';
 import { useToast } from '@/hooks/use-toast';
 import { Contractor } from './Contractors';
+import { rememberReadToken } from '@/api/config';
 import {
   AlertDialog,
   AlertDialogAction,
@@ -255,6 +256,7 @@ function AddContractor({ contractor, onBack, onMenuClick }: AddContractorProps)
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(contractorData)
         });
+        rememberReadToken(response);
 
         if (!response.ok) {
           const error = await response.json();
@@ -266,6 +268,7 @@ function AddContractor({ contractor, onBack, onMenuClick }: AddContractorProps)
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(contractorData)
         });
+        rememberReadToken(response);
 
         if (!response.ok) {
           const error = await response.json();
@@ -43,6 +43,7 @@ const RESOURCES = [
   { value: 'contractors', label: 'Контрагенты' },
   { value: 'drivers', label: 'Водители' },
   { value: 'vehicles', label: 'Автомобили' },
+  { value: 'orders', label: 'Заказы' },
   { value: 'roles', label: 'Роли' },
   { value: 'users', label: 'Пользователи' },
 ];
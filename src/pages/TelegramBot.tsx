@@ -314,6 +314,13 @@ export default function TelegramBot({ onMenuClick }: TelegramBotProps) {
           title: 'Успешно',
           description: 'Текст уведомления обновлён'
         });
+      } else {
+        const data = await response.json();
+        toast({
+          variant: 'destructive',
+          title: 'Ошибка',
+          description: data.error || 'Не удалось обновить текст'
+        });
       }
     } catch (error) {
       toast({